@@ -1,10 +1,12 @@
 import asyncio
 import json
-from google.generativeai import GenerativeModel
 from typing import Dict, List
-from dotenv import load_dotenv
-import google.generativeai as genai
-import os
+from models import AnalysisResults, ANALYSIS_AGENTS
+from events import notify_when_done
+from metrics import timed_agent
+from llm_providers import get_provider
+from prompts import GEMINI_AGENTS
+from selection import select_for_agent
 
 # Configure logging
 import logging
@@ -16,29 +18,29 @@ logger = logging.getLogger(__name__)
 # def set_model(m):
 #     global model
 #     model = m
-load_dotenv()
 
-# Configure Gemini
-api_key = os.getenv("GOOGLE_API_KEY")
-print(api_key)
-genai.configure(api_key=api_key)
-model = genai.GenerativeModel("gemini-2.5-flash")
-logger.info(f"Model configured: {model}")
+def _strip_code_fence(response_text: str) -> str:
+    response_text = response_text.strip()
+    if response_text.startswith('```json'):
+        response_text = response_text[7:]
+    if response_text.startswith('```'):
+        response_text = response_text[3:]
+    if response_text.endswith('```'):
+        response_text = response_text[:-3]
+    return response_text.strip()
 
 
-async def summarizer_agent(text: str) -> str:
+async def summarizer_agent(text: str, usage: Dict = None, on_token=None) -> str:
     try:
         logger.info("Summarizer agent started.")
-        prompt = f"""Create a concise summary of the following document in maximum 150 words. \nFocus on key points and main ideas.\n\nDocument:\n{text[:4000]}"""
-        response = await asyncio.to_thread(
-            model.generate_content,
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.3,
-                max_output_tokens=2000
-            )
-        )
-        summary_text = getattr(response, 'text', None)
+        document = select_for_agent(text, "summary", usage)
+        template, settings = GEMINI_AGENTS["summary"]
+        prompt = template.format(document=document)
+        gemini = get_provider("gemini")
+        if on_token is not None:
+            summary_text = await gemini.stream(prompt, on_token, usage=usage, **settings)
+        else:
+            summary_text = await gemini.generate(prompt, usage=usage, **settings)
         if summary_text and summary_text.strip():
             logger.info("Summarizer agent completed successfully.")
             return summary_text.strip()
@@ -54,25 +56,13 @@ async def summarizer_agent(text: str) -> str:
 
 
 
-async def entity_extractor_agent(text: str) -> Dict[str, List[str]]:
+async def entity_extractor_agent(text: str, usage: Dict = None) -> Dict[str, List[str]]:
     try:
         logger.info("Entity extractor agent started.")
-        prompt = f"""Extract the following entities from the text:\n- People (names of individuals)\n- Organizations (companies, institutions)\n- Dates (specific dates mentioned)\n- Locations (cities, countries, places)\n\nReturn ONLY a JSON object with these exact keys: people, organizations, dates, locations. \nEach value should be a list of strings. If no entities found for a category, return an empty list.\n\nDocument:\n{text[:4000]}\n\nResponse (JSON only):"""
-        response = await asyncio.to_thread(
-            model.generate_content,
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.1
-            )
-        )
-        response_text = response.text.strip()
-        if response_text.startswith('```json'):
-            response_text = response_text[7:]
-        if response_text.startswith('```'):
-            response_text = response_text[3:]
-        if response_text.endswith('```'):
-            response_text = response_text[:-3]
-        entities = json.loads(response_text.strip())
+        document = select_for_agent(text, "entities", usage)
+        template, settings = GEMINI_AGENTS["entities"]
+        response_text = await get_provider("gemini").generate(template.format(document=document), usage=usage, **settings)
+        entities = json.loads(_strip_code_fence(response_text))
         logger.info("Entity extractor agent completed successfully.")
         return {
             "people": entities.get("people", []),
@@ -89,25 +79,13 @@ async def entity_extractor_agent(text: str) -> Dict[str, List[str]]:
 
 
 
-async def sentiment_analyzer_agent(text: str) -> Dict[str, any]:
+async def sentiment_analyzer_agent(text: str, usage: Dict = None) -> Dict[str, any]:
     try:
         logger.info("Sentiment analyzer agent started.")
-        prompt = f"""Analyze the sentiment/tone of the following document and determine if it's positive, negative, or neutral. \nAlso provide a confidence score between 0 and 1.\n\nReturn ONLY a JSON object with these exact keys:\n- tone: one of \"positive\", \"negative\", or \"neutral\"\n- confidence: a float between 0 and 1\n\nDocument:\n{text[:4000]}\n\nResponse (JSON only):"""
-        response = await asyncio.to_thread(
-            model.generate_content,
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.1
-            )
-        )
-        response_text = response.text.strip()
-        if response_text.startswith('```json'):
-            response_text = response_text[7:]
-        if response_text.startswith('```'):
-            response_text = response_text[3:]
-        if response_text.endswith('```'):
-            response_text = response_text[:-3]
-        sentiment = json.loads(response_text.strip())
+        document = select_for_agent(text, "sentiment", usage)
+        template, settings = GEMINI_AGENTS["sentiment"]
+        response_text = await get_provider("gemini").generate(template.format(document=document), usage=usage, **settings)
+        sentiment = json.loads(_strip_code_fence(response_text))
         logger.info("Sentiment analyzer agent completed successfully.")
         return {
             "tone": sentiment.get("tone", "neutral"),
@@ -116,3 +94,59 @@ async def sentiment_analyzer_agent(text: str) -> Dict[str, any]:
     except Exception as e:
         logger.error(f"Sentiment analyzer agent failed: {str(e)}")
         raise Exception(f"Sentiment analyzer agent failed: {str(e)}")
+
+
+
+
+
+async def fused_analyzer_agent(text: str, usage: Dict = None):
+    # Single structured call for summary, entities and sentiment; falls back to the
+    # three separate agents if the response does not validate against AnalysisResults
+    try:
+        logger.info("Fused analyzer agent started.")
+        document = select_for_agent(text, "fused", usage)
+        template, settings = GEMINI_AGENTS["fused"]
+        response_text = await get_provider("gemini").generate(template.format(document=document), usage=usage, **settings)
+        results = AnalysisResults.model_validate_json(_strip_code_fence(response_text))
+        logger.info("Fused analyzer agent completed successfully.")
+        return results.summary.summary, results.entities.model_dump(), results.sentiment.model_dump()
+    except Exception as e:
+        logger.warning(f"Fused analyzer agent failed, falling back to separate agents: {str(e)}")
+        if usage is not None:
+            usage["fallback"] = True
+        return tuple(await asyncio.gather(
+            summarizer_agent(text, usage),
+            entity_extractor_agent(text, usage),
+            sentiment_analyzer_agent(text, usage),
+            return_exceptions=True
+        ))
+
+
+async def _summary_dict(summary_coroutine) -> Dict:
+    return {"summary": await summary_coroutine}
+
+
+async def run_gemini_agents(text: str, usage: Dict = None, mode: str = "multi", on_result=None, on_token=None,
+                            agents=ANALYSIS_AGENTS) -> list:
+    # Same contract as creaw_code.agents_and_run_crew: [summary_dict, entities, sentiment],
+    # where any slot may be the exception raised by that agent, or None if the agent was not in `agents`.
+    # on_result(agent, output) fires as each agent finishes; on_token(text) receives the summary as it streams.
+    if mode == "fused" and set(agents) == set(ANALYSIS_AGENTS):
+        summary, entities, sentiment = await timed_agent("fused", usage, fused_analyzer_agent(text, usage))
+        results = [summary if isinstance(summary, Exception) else {"summary": summary}, entities, sentiment]
+        if on_result is not None:
+            for agent, output in zip(ANALYSIS_AGENTS, results):
+                on_result(agent, output)
+        return results
+    runs = {
+        "summary": lambda: _summary_dict(summarizer_agent(text, usage, on_token)),
+        "entities": lambda: entity_extractor_agent(text, usage),
+        "sentiment": lambda: sentiment_analyzer_agent(text, usage)
+    }
+    selected = [name for name in ANALYSIS_AGENTS if name in agents]
+    outputs = await asyncio.gather(
+        *[notify_when_done(name, timed_agent(name, usage, runs[name]()), on_result) for name in selected],
+        return_exceptions=True
+    )
+    completed = dict(zip(selected, outputs))
+    return [completed.get(name) for name in ANALYSIS_AGENTS]
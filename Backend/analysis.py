@@ -0,0 +1,431 @@
+import asyncio
+import importlib
+import threading
+import time
+import weakref
+import os
+import local_analysis
+import prompts
+from models import ANALYSIS_AGENTS
+from chunking import needs_chunking, map_reduce_analysis, chunking_config, split_into_spans, align_chunks
+from selection import selection_config
+from cache import result_cache, chunk_cache, make_cache_key, config_fingerprint
+from metrics import analysis_metrics, observe_stage, timed_agent, jobs_in_flight, jobs_total
+from job_store import job_store
+from events import job_events
+from local_analysis import LOCAL_PREPASS, local_prepass
+from near_duplicates import near_duplicate_index, minhash_signature, NEAR_DUPLICATE_DETECTION
+from llm_providers import get_provider
+
+# Configure logging
+import logging
+logger = logging.getLogger(__name__)
+
+# Which agents run the analysis: "crew" (CrewAI + Groq) or "gemini" (Gemini agents)
+ANALYSIS_PIPELINE = os.getenv("ANALYSIS_PIPELINE", "crew")
+# Load the pipeline and its provider in the background at startup instead of on the first analysis
+PIPELINE_WARM_UP = os.getenv("PIPELINE_WARM_UP", "true").lower() == "true"
+
+# Pipeline name -> (module, LLM provider). Modules are imported on first use: CrewAI and the
+# provider SDKs take seconds to load, which would otherwise be paid by every process at import.
+PIPELINES = {
+    "crew": ("creaw_code", "groq"),
+    "gemini": ("agents", "gemini")
+}
+_pipeline_modules = {}
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline(name: str = None):
+    # The pipeline's module, imported (and its provider created) on first call
+    name = name or ANALYSIS_PIPELINE
+    module = _pipeline_modules.get(name)
+    if module is None:
+        if name not in PIPELINES:
+            raise ValueError(f"Unknown analysis pipeline: {name}")
+        with _pipeline_lock:
+            module = _pipeline_modules.get(name)
+            if module is None:
+                started = time.perf_counter()
+                module_name, provider = PIPELINES[name]
+                module = importlib.import_module(module_name)
+                get_provider(provider)
+                _pipeline_modules[name] = module
+                logger.info(f"Analysis pipeline {name} loaded in {time.perf_counter() - started:.2f}s")
+    return module
+
+
+async def load_pipeline(name: str = None):
+    # get_pipeline without blocking the event loop while the pipeline imports
+    module = _pipeline_modules.get(name or ANALYSIS_PIPELINE)
+    if module is not None:
+        return module
+    return await asyncio.to_thread(get_pipeline, name)
+
+
+async def warm_up_pipeline():
+    # Startup hook: load the configured pipeline and open its provider client ahead of the first job.
+    # Failures (e.g. a missing API key) are logged; the first analysis retries the load.
+    try:
+        module = await load_pipeline()
+        await get_provider(pipeline_provider()).warm_up()
+        if hasattr(module, "prebuild_crews"):
+            await asyncio.to_thread(module.prebuild_crews)
+    except Exception as e:
+        logger.error(f"Pipeline warm-up failed: {str(e)}")
+
+
+def crew_pool_stats() -> dict:
+    # Pooled crew counters; empty until the crew pipeline has been loaded
+    module = _pipeline_modules.get("crew")
+    return module.crew_pool_stats() if module is not None else {}
+
+
+def pipeline_config(mode: str) -> dict:
+    if mode == "local":
+        return local_analysis.analysis_config()
+    # From prompts.py rather than the pipeline module, so an enqueue-only API process never imports CrewAI or an SDK
+    config = prompts.analysis_config(ANALYSIS_PIPELINE, mode)
+    # Agents see only the budgeted selection of the text, so the budgets shape the result too
+    config["selection"] = selection_config()
+    if LOCAL_PREPASS:
+        config["local_prepass"] = local_analysis.prepass_config()
+    return config
+
+
+def cache_config(text: str, mode: str) -> dict:
+    # Everything besides the text that determines a job's result, i.e. what the cache key covers
+    config = pipeline_config(mode)
+    if needs_chunking(text) and mode != "local":
+        config["chunking"] = chunking_config()
+    return config
+
+
+def _index_document(text: str, cache_key: str, mode: str, job_id: str, document_name: str):
+    # Make this document's cached result findable by later near-duplicate uploads
+    config_key = config_fingerprint(cache_config(text, mode))
+    near_duplicate_index.add(minhash_signature(text), cache_key, config_key, job_id, document_name)
+
+
+def pipeline_provider() -> str:
+    # The LLM provider the configured pipeline talks to
+    return PIPELINES[ANALYSIS_PIPELINE][1]
+
+
+def _pipeline(mode: str, selected=ANALYSIS_AGENTS):
+    # Returns (run(text, usage, on_result, on_token), summarize(text, usage)) for the configured pipeline and mode.
+    # Only agents in `selected` run; the other result slots come back as None.
+    # Only the Gemini pipeline streams summary tokens; crews report each agent's output when it finishes.
+    if mode == "local":
+        return (lambda text, usage, on_result=None, on_token=None:
+                local_analysis.run_local_analysis(text, usage, on_result),
+                None)
+    if ANALYSIS_PIPELINE == "gemini":
+        agents = get_pipeline("gemini")
+        return (lambda text, usage, on_result=None, on_token=None:
+                agents.run_gemini_agents(text, usage, mode, on_result, on_token, selected),
+                agents.summarizer_agent)
+    creaw_code = get_pipeline("crew")
+    if mode == "fused" and set(selected) == set(ANALYSIS_AGENTS):
+        return (lambda text, usage, on_result=None, on_token=None: creaw_code.run_fused_crew(text, usage, on_result),
+                creaw_code.summarize_with_crew)
+    return (lambda text, usage, on_result=None, on_token=None:
+            creaw_code.agents_and_run_crew(text, usage, on_result, selected),
+            creaw_code.summarize_with_crew)
+
+
+async def _chunk_spans(text: str, previous_job_id: str = None) -> list:
+    # Chunks of a long document; a new version of an earlier job keeps that version's unchanged chunks
+    if previous_job_id:
+        previous = await job_store.aget(previous_job_id)
+        previous_text = await job_store.aget_text(previous_job_id)
+        if previous is not None and previous_text:
+            spans = previous.get("chunk_spans") or split_into_spans(previous_text)
+            return align_chunks(previous_text, spans, text)
+        logger.warning(f"Previous version {previous_job_id} is gone, chunking the document afresh")
+    return split_into_spans(text)
+
+
+async def _cached_chunk(analyze_chunk, chunk: str, config: dict, usage: dict, reuse: bool) -> list:
+    # A chunk analyzed before with the same configuration is not sent to the agents again
+    key = make_cache_key(chunk, config)
+    cached = await chunk_cache.aget(key) if reuse else None
+    if cached is not None:
+        usage["chunks_reused"] = usage.get("chunks_reused", 0) + 1
+        return cached
+    result = await analyze_chunk(chunk)
+    if not any(isinstance(slot, Exception) for slot in result):
+        await chunk_cache.aset(key, result)
+    return result
+
+
+async def _cached_summary(summarize, partial_summaries: str, config: dict, usage: dict, reuse: bool) -> str:
+    key = make_cache_key(partial_summaries, {**config, "step": "summary_reduce"})
+    cached = await chunk_cache.aget(key) if reuse else None
+    if cached is not None:
+        usage["summaries_reused"] = usage.get("summaries_reused", 0) + 1
+        return cached["summary"]
+    summary = await timed_agent("summary_reduce", usage, summarize(partial_summaries, usage))
+    await chunk_cache.aset(key, {"summary": summary})
+    return summary
+
+
+def _agent_result_event(agent: str, result) -> dict:
+    if isinstance(result, Exception):
+        return {"agent": agent, "error": str(result)}
+    return {"agent": agent, "result": result["summary"] if agent == "summary" else result}
+
+
+UPLOAD_TIMINGS = ("upload_read_seconds", "extraction_seconds")
+CARRIED_FIELDS = ("batch_id", "size_bytes", "content_sha256", "previous_job_id", "version")
+
+
+def _timings(timings: dict, usage: dict) -> dict:
+    # Stage timings for the job record; per-agent LLM latency and tokens move out of usage into timings["agents"]
+    return {**timings, "agents": usage.pop("stages", {})}
+
+
+AGENT_LABELS = {"summary": "Summarizer", "entities": "Entity Extractor", "sentiment": "Sentiment Analyzer"}
+
+
+async def _run_agents(job_id: str, text: str, mode: str, selected: tuple, usage: dict,
+                      previous_job_id: str = None, reuse_chunks: bool = True):
+    # Runs the selected agents over the document. Returns ([summary, entities, sentiment], chunk_spans),
+    # each slot being the agent's output, the exception it raised, or None for an agent that did not run;
+    # chunk_spans is None unless the document was analyzed chunk by chunk.
+    run_pipeline, summarize = _pipeline(mode, selected)
+    if needs_chunking(text) and mode != "local":
+        # Long documents are analyzed per chunk and reduced into one result. Chunks and partial summaries
+        # seen before (typically the unchanged parts of a new version) come from the chunk cache.
+        chunk_spans = await _chunk_spans(text, previous_job_id)
+        usage.setdefault("chunks_reused", 0)
+        chunk_config = {**pipeline_config(mode), "agents": list(selected)}
+        results = await map_reduce_analysis(
+            text,
+            lambda chunk: _cached_chunk(lambda chunk: run_pipeline(chunk, usage), chunk, chunk_config, usage,
+                                        reuse_chunks),
+            lambda partial_summaries: _cached_summary(summarize, partial_summaries, chunk_config, usage,
+                                                      reuse_chunks),
+            usage,
+            chunks=[text[start:end] for start, end in chunk_spans]
+        )
+        # The reduce reports agents that no chunk ran as failed
+        return [result if agent in selected else None for agent, result in zip(ANALYSIS_AGENTS, results)], chunk_spans
+    if previous_job_id:
+        # Below the chunking threshold there are no chunks to reuse: the whole version goes to the agents
+        logger.info(f"Job {job_id} is below the chunking threshold, analyzing the new version in full")
+        usage["chunks_reused"] = 0
+    results = await run_pipeline(
+        text,
+        usage,
+        lambda agent, result: job_events.publish(job_id, "agent_result", _agent_result_event(agent, result)),
+        lambda token: job_events.publish(job_id, "summary_token", {"text": token})
+    )
+    return list(results), None
+
+
+def _agent_statuses(results: list, stages: dict, usage: dict = None) -> dict:
+    # Per-agent status ("completed", "failed" or "not_requested") and time spent, for the job record.
+    # A chunked summary whose reduce steps partly failed is completed with a warning.
+    statuses = {}
+    reduce_fallbacks = (usage or {}).get("summary_reduce_fallbacks", 0)
+    for agent, result in zip(ANALYSIS_AGENTS, results):
+        if isinstance(result, Exception):
+            status = {"status": "failed", "error": str(result)}
+        else:
+            status = {"status": "not_requested" if result is None else "completed"}
+            if agent == "summary" and result is not None and reduce_fallbacks:
+                status["warning"] = (f"{reduce_fallbacks} summary reduce steps failed; "
+                                     f"the summary includes uncombined partial summaries")
+        if agent in stages:
+            status["seconds"] = stages[agent]["seconds"]
+        statuses[agent] = status
+    return statuses
+
+
+def _job_results(results: list) -> dict:
+    # A failed or skipped agent's slot is left empty rather than filled with made-up defaults
+    summary_result, entities_result, sentiment_result = [result if isinstance(result, dict) else None
+                                                         for result in results]
+    return {
+        "summary": summary_result["summary"] if summary_result is not None else None,
+        "entities": entities_result,
+        "sentiment": sentiment_result
+    }
+
+
+def _agent_failures(statuses: dict) -> list:
+    # Failed agents and degraded results; either makes the job "partial"
+    return [f"{AGENT_LABELS[agent]}: {status.get('error') or status['warning']}" for agent, status in statuses.items()
+            if status["status"] == "failed" or status.get("warning")]
+
+
+async def run_multi_agent_analysis(job_id: str, text: str, document_name: str, cache_key: str = None, mode: str = "multi",
+                                   reuse_chunks: bool = True, analyses=ANALYSIS_AGENTS):
+    start_time = time.time()
+    usage = {}
+    previous = await job_store.aget(job_id) or {}
+    queued_at = previous.get("queued_at")
+    # Batch membership and upload metadata survive the record rewrites below
+    carried_fields = {key: previous[key] for key in CARRIED_FIELDS if previous.get(key)}
+    queue_wait = round(start_time - queued_at, 3) if queued_at else 0.0
+    # Upload read and extraction times were recorded by /upload or /batch
+    timings = {key: value for key, value in previous.get("timings", {}).items() if key in UPLOAD_TIMINGS}
+    timings["queue_wait_seconds"] = queue_wait
+    observe_stage("queue_wait", queue_wait)
+    # The local analyzers are cheap enough to always produce every result
+    requested = ANALYSIS_AGENTS if mode == "local" else tuple(agent for agent in ANALYSIS_AGENTS if agent in analyses)
+    jobs_in_flight.inc()
+    try:
+        if mode != "local":
+            await load_pipeline()
+        await job_store.aupdate(job_id, status="processing", queue_wait_seconds=queue_wait)
+        job_events.publish(job_id, "status", {"status": "processing"})
+
+        # Agents the local analyzers answered confidently are not sent to the LLM
+        local_results = {}
+        if LOCAL_PREPASS and mode != "local":
+            started = time.perf_counter()
+            local_results = await asyncio.to_thread(local_prepass, text, usage=usage)
+            local_results = {agent: result for agent, result in local_results.items() if agent in requested}
+            timings["local_prepass_seconds"] = round(time.perf_counter() - started, 4)
+            observe_stage("local_prepass", timings["local_prepass_seconds"])
+        for agent, result in local_results.items():
+            job_events.publish(job_id, "agent_result", _agent_result_event(agent, result))
+
+        # Only the requested agents run; the others can be computed later through /results
+        selected = tuple(agent for agent in requested if agent not in local_results)
+        analysis_started = time.perf_counter()
+        results, chunk_spans = (await _run_agents(job_id, text, mode, selected, usage, previous.get("previous_job_id"),
+                                                  reuse_chunks)
+                                if selected else ([None] * len(ANALYSIS_AGENTS), None))
+        timings["analysis_seconds"] = round(time.perf_counter() - analysis_started, 4)
+        observe_stage("analysis", timings["analysis_seconds"])
+
+        post_processing_started = time.perf_counter()
+        results = [local_results.get(agent, result) for agent, result in zip(ANALYSIS_AGENTS, results)]
+        ran = [result for result in results if result is not None]
+        if all(isinstance(result, Exception) for result in ran):
+            raise Exception(f"All agents failed; first error: {str(ran[0])}")
+        processing_time = time.time() - start_time
+        job = {
+            "job_id": job_id,
+            "status": "completed",
+            "document_name": document_name,
+            "results": _job_results(results),
+            "processing_time_seconds": round(processing_time, 2),
+            "queue_wait_seconds": queue_wait,
+            "mode": mode,
+            "usage": usage,
+            **carried_fields
+        }
+        if chunk_spans is not None:
+            # Lets a later version of this document find the chunks it shares with this one
+            job["chunk_spans"] = chunk_spans
+        analysis_metrics.record(mode, processing_time, usage)
+        job["agents"] = _agent_statuses(results, usage.get("stages", {}), usage)
+        failures = _agent_failures(job["agents"])
+        # Only complete results are cached: the cache key does not cover which analyses were requested
+        complete = all(status["status"] == "completed" for status in job["agents"].values())
+        if failures:
+            # Such jobs finish as "partial"; the failed analyses can be re-run through /results
+            job["status"] = "partial"
+            job["agent_failures"] = failures
+        elif cache_key and complete:
+            await result_cache.aset(cache_key, job["results"])
+        # Assembling the record and caching it; the job store write itself is not included
+        timings["post_processing_seconds"] = round(time.perf_counter() - post_processing_started, 4)
+        observe_stage("post_processing", timings["post_processing_seconds"])
+        job["timings"] = _timings(timings, usage)
+        await job_store.areplace(job_id, job)
+        jobs_total.inc(mode=mode, status=job["status"])
+        job_events.publish(job_id, "status", {"status": job["status"]})
+        if complete and cache_key and NEAR_DUPLICATE_DETECTION:
+            try:
+                await asyncio.to_thread(_index_document, text, cache_key, mode, job_id, document_name)
+            except Exception as e:
+                logger.error(f"Near-duplicate indexing failed for job_id {job_id}: {str(e)}")
+    except Exception as e:
+        await job_store.areplace(job_id, {
+            "job_id": job_id,
+            "status": "failed",
+            "document_name": document_name,
+            "error": str(e),
+            "processing_time_seconds": round(time.time() - start_time, 2),
+            "usage": usage,
+            "queue_wait_seconds": queue_wait,
+            "timings": _timings(timings, usage),
+            **carried_fields
+        })
+        jobs_total.inc(mode=mode, status="failed")
+        job_events.publish(job_id, "status", {"status": "failed"})
+    finally:
+        jobs_in_flight.dec()
+
+
+# One lock per job, so concurrent /results requests for a missing analysis share a single run
+_on_demand_locks = weakref.WeakValueDictionary()
+
+
+def missing_analyses(job: dict, analyses) -> tuple:
+    # Requested analyses a finished job lacks: not requested when it ran, failed or degraded
+    results = job.get("results") or {}
+    agents = job.get("agents") or {}
+    return tuple(agent for agent in ANALYSIS_AGENTS if agent in analyses
+                 and (results.get(agent) is None or agents.get(agent, {}).get("warning")))
+
+
+async def run_on_demand(job_id: str, analyses) -> dict:
+    """Compute analyses a finished job is missing (not requested, failed or degraded) and memoize them on the job.
+
+    Queued by /results?analyses=... on the scheduler or, in worker mode, a worker. Returns the updated job
+    record. Analyses that fail again are reported in the job's agent statuses and retried the next time they
+    are asked for.
+    """
+    lock = _on_demand_locks.setdefault(job_id, asyncio.Lock())
+    async with lock:
+        job = await job_store.aget(job_id)
+        if job is None or job["status"] not in ("completed", "partial"):
+            return job
+        missing = missing_analyses(job, analyses)
+        text = await job_store.aget_text(job_id)
+        if not missing or not text:
+            if job.pop("pending_analyses", None) is not None:
+                await job_store.areplace(job_id, job)
+            return job
+        results = job.get("results") or {}
+        mode = job.get("mode", "multi")
+        usage = {}
+        started = time.perf_counter()
+        try:
+            if mode != "local":
+                await load_pipeline()
+            outputs, _ = await _run_agents(job_id, text, mode, missing, usage, job.get("previous_job_id"))
+        except Exception as e:
+            # Reported as failed agent statuses below, like an agent that failed during the analysis
+            logger.error(f"On-demand analyses for job_id {job_id} failed: {str(e)}")
+            outputs = [e] * len(ANALYSIS_AGENTS)
+        seconds = round(time.perf_counter() - started, 4)
+        logger.info(f"On-demand analyses {', '.join(missing)} for job_id {job_id} took {seconds}s")
+
+        outputs = [output if agent in missing else None for agent, output in zip(ANALYSIS_AGENTS, outputs)]
+        computed = _job_results(outputs)
+        job["results"] = {agent: computed[agent] if agent in missing and computed[agent] is not None
+                          else results.get(agent) for agent in ANALYSIS_AGENTS}
+        statuses = _agent_statuses(outputs, usage.pop("stages", {}), usage)
+        job["agents"] = {**job.get("agents", {}), **{agent: statuses[agent] for agent in missing}}
+        for key, value in usage.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                job.setdefault("usage", {})[key] = round(job["usage"].get(key, 0) + value, 4)
+        failures = _agent_failures(job["agents"])
+        job["status"] = "partial" if failures else "completed"
+        job["agent_failures"] = failures
+        job.pop("pending_analyses", None)
+        if not failures:
+            job.pop("agent_failures")
+            if all(value is not None for value in job["results"].values()):
+                await result_cache.aset(make_cache_key(text, cache_config(text, mode)), job["results"])
+        await job_store.areplace(job_id, job)
+        # Closes the run's agent_result events, which also drops them from the stream history
+        job_events.publish(job_id, "status", {"status": job["status"]})
+        return job
@@ -0,0 +1,89 @@
+"""Per-document crew overhead and batch throughput of the crew pipeline against the local mock LLM.
+
+Starts bench_mock_llm.py, then runs the same documents through the pooled crews, `--concurrency` documents
+at a time, twice:
+with CREW_POOL_SIZE=0 (a new Agent/Task/Crew per agent and document, as before pooling) and with the
+crew pools. Run with --latency-ms 0 --tokens-per-second 0 to isolate the framework overhead.
+
+Run with: python bench_crew.py --docs 200 --concurrency 16 --mode multi --latency-ms 0 --tokens-per-second 0
+"""
+import argparse
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import time
+
+from bench_service import HERE, PARAGRAPH, _free_port, _wait_until_up
+import bench_mock_llm
+
+
+async def run_crew_for_documents(creaw_code, texts: list, mode: str, usages: list, concurrency: int) -> list:
+    # Runs every text through the pooled crews, `concurrency` documents at a time.
+    # Returns one [summary, entities, sentiment] per text, or the exception its analysis raised.
+    run = creaw_code.run_fused_crew if mode == "fused" else creaw_code.agents_and_run_crew
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(text, usage):
+        async with semaphore:
+            return await run(text, usage)
+
+    return await asyncio.gather(*[bounded(text, usage) for text, usage in zip(texts, usages)],
+                                return_exceptions=True)
+
+
+async def _run(creaw_code, texts: list, mode: str, concurrency: int, pool_size: int) -> dict:
+    for pool in creaw_code.crew_pools.values():
+        pool.size = pool_size
+        pool._idle.clear()
+    built_before = sum(pool.created for pool in creaw_code.crew_pools.values())
+    usages = [{} for _ in texts]
+    started = time.perf_counter()
+    outputs = await run_crew_for_documents(creaw_code, texts, mode, usages, concurrency)
+    elapsed = time.perf_counter() - started
+    return {"pool_size": pool_size, "docs": len(texts), "mode": mode, "concurrency": concurrency,
+            "failed": sum(isinstance(output, Exception) for output in outputs),
+            "seconds": round(elapsed, 2), "docs_per_second": round(len(texts) / elapsed, 1),
+            "ms_per_doc": round(elapsed * 1000 / len(texts) * concurrency, 1),
+            "crews_built": sum(pool.created for pool in creaw_code.crew_pools.values()) - built_before,
+            "llm_calls": sum(usage.get("llm_calls", 0) for usage in usages)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mode", choices=("multi", "fused"), default="multi")
+    parser.add_argument("--pool-size", type=int, default=16)
+    bench_mock_llm.add_arguments(parser)
+    args = parser.parse_args()
+
+    http_port, grpc_port = _free_port(), _free_port()
+    os.environ.update({"GROQ_BASE_URL": f"http://127.0.0.1:{http_port}",
+                       "GROQ_API_KEY": os.environ.get("GROQ_API_KEY", "bench"),
+                       "GROQ_REQUESTS_PER_MINUTE": os.environ.get("GROQ_REQUESTS_PER_MINUTE", "1000000"),
+                       "GROQ_MAX_CONCURRENCY": os.environ.get("GROQ_MAX_CONCURRENCY", str(args.concurrency * 3)),
+                       "LITELLM_LOCAL_MODEL_COST_MAP": "True", "CREWAI_DISABLE_TELEMETRY": "true",
+                       "OTEL_SDK_DISABLED": "true"})
+    mock = subprocess.Popen([sys.executable, os.path.join(HERE, "bench_mock_llm.py"), f"--http-port={http_port}",
+                             f"--grpc-port={grpc_port}", f"--latency-ms={args.latency_ms}",
+                             f"--jitter-ms={args.jitter_ms}", f"--error-rate={args.error_rate}",
+                             f"--tokens-per-second={args.tokens_per_second}", f"--seed={args.seed}"],
+                            cwd=HERE, stdout=subprocess.DEVNULL)
+    try:
+        asyncio.run(_wait_until_up(f"http://127.0.0.1:{http_port}/stats"))
+        import creaw_code
+        logging.getLogger().setLevel(logging.WARNING)
+        texts = [f"Document {i}. " + PARAGRAPH.format(date=f"2023-01-{i % 28 + 1:02d}") for i in range(args.docs)]
+        # Warm-up run so imports and the provider client are not charged to the first measurement
+        asyncio.run(_run(creaw_code, texts[:args.concurrency], args.mode, args.concurrency, args.pool_size))
+        for pool_size in (0, args.pool_size):
+            print(asyncio.run(_run(creaw_code, texts, args.mode, args.concurrency, pool_size)))
+    finally:
+        mock.terminate()
+        mock.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""PDF extraction benchmarks.
+
+--measure lag compares event-loop latency while ingesting large PDFs with the old
+inline extraction (blocking the loop) and the worker-pool path used by /upload.
+--measure cost times both paths per PDF size (the pool splits large PDFs into page ranges).
+Run with: python bench_extraction.py --pages 300 --docs 4
+     or: python bench_extraction.py --measure cost --pages 1 10 50 200 500
+"""
+import argparse
+import asyncio
+import io
+import logging
+import statistics
+import time
+
+import numpy as np
+
+from PyPDF2 import PageObject, PdfWriter
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from utils import extract_text_from_pdf, extract_text_from_pdf_async, get_extraction_pool, shutdown_extraction_pool
+
+
+def make_synthetic_pdf(pages: int, lines_per_page: int = 40) -> bytes:
+    writer = PdfWriter()
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica")
+    })
+    font_ref = writer._add_object(font)
+    for n in range(pages):
+        page = PageObject.create_blank_page(None, 612, 792)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font_ref})
+        })
+        ops = ["BT", "/F1 10 Tf", "12 TL", "72 740 Td"]
+        for i in range(lines_per_page):
+            ops.append(f"(Page {n} line {i}: Acme Corp signed the agreement with John Smith in London on 2023-01-15.) '")
+        ops.append("ET")
+        stream = DecodedStreamObject()
+        stream.set_data("\n".join(ops).encode("latin-1"))
+        page[NameObject("/Contents")] = writer._add_object(stream)
+        writer.add_page(page)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+async def _probe_loop_lag(stop: asyncio.Event, lags: list, interval: float = 0.005):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def _run(mode: str, documents: list) -> dict:
+    stop = asyncio.Event()
+    lags = []
+    probe = asyncio.create_task(_probe_loop_lag(stop, lags))
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    if mode == "inline":
+        async def ingest(content):
+            return extract_text_from_pdf(content)
+    else:
+        ingest = extract_text_from_pdf_async
+    await asyncio.gather(*[ingest(content) for content in documents])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+    lags_ms = sorted(lag * 1000 for lag in lags)
+    return {
+        "mode": mode,
+        "wall_seconds": round(elapsed, 2),
+        "lag_p50_ms": round(statistics.median(lags_ms), 2),
+        "lag_p99_ms": round(lags_ms[int(len(lags_ms) * 0.99) - 1], 2),
+        "lag_max_ms": round(lags_ms[-1], 2),
+        "probe_samples": len(lags_ms)
+    }
+
+
+def _timings(run, repeats: int) -> np.ndarray:
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - started)
+    return np.array(samples) * 1000
+
+
+def bench_cost(pages: int, repeats: int) -> list:
+    content = make_synthetic_pdf(pages)
+    characters = len(extract_text_from_pdf(content))
+    reports = []
+    for label, run in (("inline", lambda: extract_text_from_pdf(content)),
+                       ("pool", lambda: asyncio.run(extract_text_from_pdf_async(content)))):
+        samples = _timings(run, repeats)
+        p50 = float(np.percentile(samples, 50))
+        reports.append({
+            "mode": label,
+            "pages": pages,
+            "pdf_kb": round(len(content) / 1024, 1),
+            "characters": characters,
+            "p50_ms": round(p50, 2),
+            "p95_ms": round(float(np.percentile(samples, 95)), 2),
+            "pages_per_second": round(pages / (p50 / 1000), 1),
+            "mb_per_second": round(len(content) / 1024 / 1024 / (p50 / 1000), 2)
+        })
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--measure", choices=("lag", "cost"), default="lag")
+    parser.add_argument("--pages", type=int, nargs="+", default=None,
+                        help="Pages per PDF (default 300 for lag, 1 10 50 200 500 for cost)")
+    parser.add_argument("--docs", type=int, default=4, help="Concurrent PDFs per lag run")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per size for cost")
+    args = parser.parse_args()
+    pages = args.pages or ([300] if args.measure == "lag" else [1, 10, 50, 200, 500])
+    # Extraction logs every call at INFO
+    logging.getLogger("utils").setLevel(logging.WARNING)
+
+    # Warm the pool so process start-up is not charged to the first run
+    get_extraction_pool().submit(int).result()
+    try:
+        for count in pages:
+            if args.measure == "cost":
+                for report in bench_cost(count, args.repeats):
+                    print(report)
+                continue
+            print(f"Generating {args.docs} synthetic PDFs of {count} pages...")
+            documents = [make_synthetic_pdf(count) for _ in range(args.docs)]
+            for mode in ("inline", "pool"):
+                print({"pages": count, **asyncio.run(_run(mode, documents))})
+    finally:
+        shutdown_extraction_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Throughput of concurrent status updates and result reads for each JobStore backend, and the memory
+(or database size) the stored jobs take, as reported by JobStore.stats().
+
+Run with: python bench_job_store.py --jobs 2000 --threads 8 --ops 20000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from job_store import InMemoryJobStore, SqliteJobStore
+
+RESULTS = {
+    "summary": "A short summary of the document. " * 5,
+    "entities": {"people": ["John Smith"], "organizations": ["Acme Corp"], "dates": ["2023-01-15"], "locations": ["London"]},
+    "sentiment": {"tone": "positive", "confidence": 0.9}
+}
+
+
+def _populate(store, jobs: int, text: str) -> list:
+    job_ids = [f"job-{i}" for i in range(jobs)]
+    for job_id in job_ids:
+        store.create({"job_id": job_id, "status": "uploaded", "document_name": "doc.txt"}, text)
+    return job_ids
+
+
+def _run(label: str, operation, job_ids: list, threads: int, ops: int) -> dict:
+    per_thread = ops // threads
+
+    def worker(seed: int):
+        rng = random.Random(seed)
+        for _ in range(per_thread):
+            operation(rng.choice(job_ids))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, range(threads)))
+    elapsed = time.perf_counter() - started
+    return {"operation": label, "ops": per_thread * threads, "seconds": round(elapsed, 3),
+            "ops_per_second": round(per_thread * threads / elapsed)}
+
+
+def bench(store, name: str, args) -> None:
+    text = "lorem ipsum dolor sit amet " * (args.text_kb * 40)
+    job_ids = _populate(store, args.jobs, text)
+    print(f"--- {name} ({args.jobs} jobs, {args.text_kb} KB text each, {args.threads} threads)")
+    print({"operation": "stored", **store.stats()})
+    print(_run("status_update", lambda job_id: store.update(job_id, status="processing"),
+               job_ids, args.threads, args.ops))
+    for job_id in job_ids:
+        store.replace(job_id, {"job_id": job_id, "status": "completed", "document_name": "doc.txt", "results": RESULTS})
+    print(_run("result_read", store.get, job_ids, args.threads, args.ops))
+    print({"operation": "completed", **store.stats()})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=20000)
+    parser.add_argument("--text-kb", type=int, default=50)
+    args = parser.parse_args()
+
+    bench(InMemoryJobStore(), "memory", args)
+    with tempfile.TemporaryDirectory() as tmp:
+        bench(SqliteJobStore(os.path.join(tmp, "jobs.db")), "sqlite", args)
+
+
+if __name__ == "__main__":
+    main()
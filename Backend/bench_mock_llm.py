@@ -0,0 +1,207 @@
+"""Local stand-in for the Groq and Gemini APIs, for benchmarks and offline runs.
+
+Serves Groq's OpenAI-compatible chat API over HTTP and Gemini's GenerativeService over plaintext gRPC,
+answering each analysis prompt with canned JSON after a configurable delay. Point the service at it with
+GROQ_BASE_URL=http://127.0.0.1:<http-port> and GEMINI_API_ENDPOINT=127.0.0.1:<grpc-port>.
+
+Run with: python bench_mock_llm.py --latency-ms 300 --jitter-ms 100 --error-rate 0.01 --tokens-per-second 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import google.ai.generativelanguage as glm
+import grpc
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+GEMINI_SERVICE = "google.ai.generativelanguage.v1beta.GenerativeService"
+WORDS = ("the agreement covers delivery terms pricing and the obligations of both parties "
+         "during the contract period including payment schedules and termination rights").split()
+STREAM_CHUNK_WORDS = 5
+
+
+class MockLLM:
+    """Canned answers with simulated latency, jitter, output token throughput and failures."""
+
+    def __init__(self, latency_ms: float, jitter_ms: float, error_rate: float, tokens_per_second: float,
+                 summary_words: int, seed: int = 0):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.tokens_per_second = tokens_per_second
+        self.summary_words = summary_words
+        self.rng = random.Random(seed)
+        self.stats = {"requests": 0, "errors": 0, "in_flight": 0, "max_in_flight": 0, "started_at": time.time()}
+
+    def answer(self, prompt: str) -> str:
+        # Same keys the crew and Gemini prompts ask for; the fused prompt is checked first
+        summary = " ".join(self.rng.choice(WORDS) for _ in range(self.summary_words)).capitalize() + "."
+        entities = {"people": ["John Smith"], "organizations": ["Acme Corp"], "dates": ["2023-01-15"],
+                    "locations": ["London"]}
+        sentiment = {"tone": "positive", "confidence": 0.82}
+        if "exactly these keys" in prompt:
+            return json.dumps({"summary": {"summary": summary}, "entities": entities, "sentiment": sentiment})
+        if "people, organizations, dates, locations" in prompt:
+            return json.dumps(entities)
+        if "tone" in prompt and "confidence" in prompt:
+            return json.dumps(sentiment)
+        return summary
+
+    def output_delay(self, text: str) -> float:
+        return (len(text) / 4) / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    async def begin(self) -> bool:
+        # Waits out the first-token latency; returns False when this request should fail
+        self.stats["requests"] += 1
+        self.stats["in_flight"] += 1
+        self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+        await asyncio.sleep(max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter)))
+        if self.rng.random() < self.error_rate:
+            self.stats["errors"] += 1
+            self.stats["in_flight"] -= 1
+            return False
+        return True
+
+    def end(self):
+        self.stats["in_flight"] -= 1
+
+    def chunks(self, text: str):
+        words = text.split(" ")
+        for i in range(0, len(words), STREAM_CHUNK_WORDS):
+            yield " ".join(words[i:i + STREAM_CHUNK_WORDS]) + (" " if i + STREAM_CHUNK_WORDS < len(words) else "")
+
+
+def create_http_app(mock: MockLLM) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt = "\n".join(message.get("content") or "" for message in body["messages"]
+                           if isinstance(message.get("content"), str))
+        if not await mock.begin():
+            return JSONResponse(status_code=503, content={"error": {"message": "mock upstream error"}})
+        answer = mock.answer(prompt)
+        # CrewAI agents parse a ReAct-style reply; summaries are returned as the Summary JSON shape
+        if not answer.startswith("{"):
+            answer = json.dumps({"summary": answer})
+        content = f"Thought: I now know the final answer\nFinal Answer: {answer}"
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                 "total_tokens": (len(prompt) + len(content)) // 4}
+        created = int(time.time())
+        if body.get("stream"):
+            async def events():
+                try:
+                    for chunk in mock.chunks(content):
+                        await asyncio.sleep(mock.output_delay(chunk))
+                        delta = {"id": "mock", "object": "chat.completion.chunk", "created": created,
+                                 "model": body["model"],
+                                 "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": None}]}
+                        yield f"data: {json.dumps(delta)}\n\n"
+                    yield "data: [DONE]\n\n"
+                finally:
+                    mock.end()
+            return StreamingResponse(events(), media_type="text/event-stream")
+        await asyncio.sleep(mock.output_delay(content))
+        mock.end()
+        return {"id": "mock", "object": "chat.completion", "created": created, "model": body["model"],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": usage}
+
+    @app.get("/stats")
+    async def stats():
+        return mock.stats
+
+    return app
+
+
+def _gemini_response(text: str, prompt: str) -> glm.GenerateContentResponse:
+    return glm.GenerateContentResponse(
+        candidates=[glm.Candidate(content=glm.Content(parts=[glm.Part(text=text)], role="model"),
+                                  finish_reason=glm.Candidate.FinishReason.STOP, index=0)],
+        usage_metadata=glm.GenerateContentResponse.UsageMetadata(
+            prompt_token_count=len(prompt) // 4, candidates_token_count=len(text) // 4,
+            total_token_count=(len(prompt) + len(text)) // 4)
+    )
+
+
+def _prompt(request: glm.GenerateContentRequest) -> str:
+    return "\n".join(part.text for content in request.contents for part in content.parts)
+
+
+def create_grpc_server(mock: MockLLM, port: int) -> grpc.aio.Server:
+    async def generate_content(request, context):
+        prompt = _prompt(request)
+        if not await mock.begin():
+            await context.abort(grpc.StatusCode.UNAVAILABLE, "mock upstream error")
+        answer = mock.answer(prompt)
+        await asyncio.sleep(mock.output_delay(answer))
+        mock.end()
+        return _gemini_response(answer, prompt)
+
+    async def stream_generate_content(request, context):
+        prompt = _prompt(request)
+        if not await mock.begin():
+            await context.abort(grpc.StatusCode.UNAVAILABLE, "mock upstream error")
+        try:
+            for chunk in mock.chunks(mock.answer(prompt)):
+                await asyncio.sleep(mock.output_delay(chunk))
+                yield _gemini_response(chunk, prompt)
+        finally:
+            mock.end()
+
+    handler = grpc.method_handlers_generic_handler(GEMINI_SERVICE, {
+        "GenerateContent": grpc.unary_unary_rpc_method_handler(
+            generate_content,
+            request_deserializer=glm.GenerateContentRequest.deserialize,
+            response_serializer=glm.GenerateContentResponse.serialize),
+        "StreamGenerateContent": grpc.unary_stream_rpc_method_handler(
+            stream_generate_content,
+            request_deserializer=glm.GenerateContentRequest.deserialize,
+            response_serializer=glm.GenerateContentResponse.serialize)
+    })
+    server = grpc.aio.server()
+    server.add_generic_rpc_handlers((handler,))
+    server.add_insecure_port(f"127.0.0.1:{port}")
+    return server
+
+
+async def serve(args):
+    mock = MockLLM(args.latency_ms, args.jitter_ms, args.error_rate, args.tokens_per_second, args.summary_words,
+                   args.seed)
+    grpc_server = create_grpc_server(mock, args.grpc_port)
+    await grpc_server.start()
+    http_server = uvicorn.Server(uvicorn.Config(create_http_app(mock), host="127.0.0.1", port=args.http_port,
+                                                log_level="warning"))
+    print(f"Mock LLM listening: Groq http://127.0.0.1:{args.http_port}, Gemini grpc 127.0.0.1:{args.grpc_port}",
+          flush=True)
+    try:
+        await http_server.serve()
+    finally:
+        await grpc_server.stop(None)
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency-ms", type=float, default=300, help="time to first token")
+    parser.add_argument("--jitter-ms", type=float, default=100, help="uniform +/- jitter on the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests failing with 503/UNAVAILABLE")
+    parser.add_argument("--tokens-per-second", type=float, default=200, help="output token throughput (0 = instant)")
+    parser.add_argument("--summary-words", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--http-port", type=int, default=8790)
+    parser.add_argument("--grpc-port", type=int, default=8791)
+    add_arguments(parser)
+    asyncio.run(serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Signature, insert and lookup cost of the near-duplicate index as it grows.
+
+Run with: python bench_near_duplicates.py --documents 200000 --lookups 500
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from near_duplicates import NearDuplicateIndex, minhash_signature, MINHASH_PERMUTATIONS
+
+VOCABULARY = [f"term{i}" for i in range(5000)]
+
+
+def _document(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+
+def _edit(rng: random.Random, text: str, edits: int) -> str:
+    words = text.split()
+    for _ in range(edits):
+        words[rng.randrange(len(words))] = rng.choice(VOCABULARY)
+    return " ".join(words)
+
+
+def _percentiles(samples: list) -> dict:
+    values = np.array(samples) * 1000
+    return {f"p{p}_ms": round(float(np.percentile(values, p)), 3) for p in (50, 95, 99)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--words", type=int, default=2000)
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    text = _document(rng, args.words)
+    started = time.perf_counter()
+    for _ in range(20):
+        minhash_signature(text)
+    print({"operation": "signature", "words": args.words,
+           "ms_per_document": round((time.perf_counter() - started) / 20 * 1000, 3)})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = NearDuplicateIndex(os.path.join(tmp, "index.db"))
+        # Random signatures stand in for unrelated documents; a few real ones are the near-duplicate targets
+        targets = [_document(rng, args.words) for _ in range(10)]
+        started = time.perf_counter()
+        for i in range(args.documents):
+            signature = np.array([rng.getrandbits(32) for _ in range(MINHASH_PERMUTATIONS)], dtype=np.uint64)
+            index.add(signature, f"key-{i}", "config")
+        for i, target in enumerate(targets):
+            index.add(minhash_signature(target), f"target-{i}", "config")
+        elapsed = time.perf_counter() - started
+        print({"operation": "add", "documents": args.documents,
+               "adds_per_second": round((args.documents + len(targets)) / elapsed)})
+
+        for label, make_query in (("lookup_near_duplicate", lambda: _edit(rng, rng.choice(targets), 20)),
+                                  ("lookup_unrelated", lambda: _document(rng, args.words))):
+            queries = [minhash_signature(make_query()) for _ in range(args.lookups)]
+            samples, found = [], 0
+            for signature in queries:
+                started = time.perf_counter()
+                found += index.find(signature, 0.8) is not None
+                samples.append(time.perf_counter() - started)
+            print({"operation": label, "index_size": args.documents + len(targets), "found": found,
+                   "lookups": args.lookups, **_percentiles(samples)})
+
+
+if __name__ == "__main__":
+    main()
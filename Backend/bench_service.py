@@ -0,0 +1,182 @@
+"""End-to-end throughput of the API against the local mock LLM (no network or API keys needed).
+
+Starts bench_mock_llm.py and the API (uvicorn main:app) as subprocesses, points both the crew (Groq)
+and Gemini pipelines at the mock, then drives /upload -> /analyze -> /results at the given concurrency.
+Reports p50/p95/p99 job latency, jobs per second and the API process's peak RSS.
+
+Run with: python bench_service.py --jobs 200 --concurrency 16 --pipeline crew --latency-ms 300 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+import bench_mock_llm
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TERMINAL_STATUSES = ("completed", "partial", "failed")
+PARAGRAPH = ("On {date} Acme Corp and Globex Ltd signed a supply agreement in London covering delivery terms, "
+             "pricing and the obligations of both parties. John Smith negotiated on behalf of Acme and described "
+             "the outcome as a strong result for both companies. ")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _document(index: int, size_kb: int) -> bytes:
+    # Every document is unique, so the result cache never short-circuits an analysis
+    text = f"Document {index}. "
+    while len(text) < size_kb * 1024:
+        text += PARAGRAPH.format(date=f"2023-{index % 12 + 1:02d}-{len(text) % 28 + 1:02d}")
+    return text.encode("utf-8")
+
+
+def _peak_rss_mb(pid: int):
+    # VmHWM is the process's resident-set high-water mark (Linux only)
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+async def _wait_until_up(url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+async def _run_job(client: httpx.AsyncClient, index: int, args) -> dict:
+    started = time.perf_counter()
+    upload = await client.post("/upload", files={"file": (f"doc-{index}.txt", _document(index, args.doc_kb),
+                                                          "text/plain")})
+    upload.raise_for_status()
+    job_id = upload.json()["job_id"]
+    while True:
+        analyze = await client.post("/analyze", json={"job_id": job_id, "mode": args.mode})
+        if analyze.status_code not in (429, 503):
+            break
+        # Queue full or provider circuit open: back off as the API asks
+        await asyncio.sleep(float(analyze.headers.get("retry-after", 1)))
+    analyze.raise_for_status()
+    while True:
+        result = (await client.get(f"/results/{job_id}")).json()
+        if result["status"] in TERMINAL_STATUSES:
+            return {"status": result["status"], "latency": time.perf_counter() - started}
+        await asyncio.sleep(args.poll_interval)
+
+
+async def _drive(base_url: str, args) -> dict:
+    semaphore = asyncio.Semaphore(args.concurrency)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+        async def bounded(index):
+            async with semaphore:
+                try:
+                    return await _run_job(client, index, args)
+                except Exception as e:
+                    return {"status": f"error: {e}", "latency": None}
+
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*[bounded(i) for i in range(args.jobs)])
+        elapsed = time.perf_counter() - started
+
+    latencies = np.array([outcome["latency"] for outcome in outcomes if outcome["latency"] is not None]) * 1000
+    statuses = {}
+    for outcome in outcomes:
+        statuses[outcome["status"]] = statuses.get(outcome["status"], 0) + 1
+    report = {"jobs": args.jobs, "concurrency": args.concurrency, "statuses": statuses,
+              "seconds": round(elapsed, 2), "jobs_per_second": round(args.jobs / elapsed, 2)}
+    if len(latencies):
+        report.update({f"p{p}_ms": round(float(np.percentile(latencies, p)), 1) for p in (50, 95, 99)})
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--pipeline", choices=("crew", "gemini"), default="crew")
+    parser.add_argument("--mode", choices=("multi", "fused", "local"), default="multi")
+    parser.add_argument("--doc-kb", type=int, default=4, help="size of each uploaded document")
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--analysis-workers", type=int, default=None, help="ANALYSIS_WORKERS for the API")
+    bench_mock_llm.add_arguments(parser)
+    args = parser.parse_args()
+
+    http_port, grpc_port, api_port = _free_port(), _free_port(), _free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "GROQ_BASE_URL": f"http://127.0.0.1:{http_port}",
+            "GEMINI_API_ENDPOINT": f"127.0.0.1:{grpc_port}",
+            "GROQ_API_KEY": os.environ.get("GROQ_API_KEY", "bench"),
+            "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY", "bench"),
+            "ANALYSIS_PIPELINE": args.pipeline,
+            # The mock has no rate limits; measure the service, not the production quotas
+            "GROQ_REQUESTS_PER_MINUTE": os.environ.get("GROQ_REQUESTS_PER_MINUTE", "1000000"),
+            "GEMINI_REQUESTS_PER_MINUTE": os.environ.get("GEMINI_REQUESTS_PER_MINUTE", "1000000"),
+            # Offline: keep LiteLLM from fetching its model price list and CrewAI from exporting telemetry,
+            # which otherwise stalls crews on network timeouts
+            "LITELLM_LOCAL_MODEL_COST_MAP": "True",
+            "CREWAI_DISABLE_TELEMETRY": "true",
+            "OTEL_SDK_DISABLED": "true"
+        }
+        if args.analysis_workers:
+            env["ANALYSIS_WORKERS"] = str(args.analysis_workers)
+        mock_args = [f"--latency-ms={args.latency_ms}", f"--jitter-ms={args.jitter_ms}",
+                     f"--error-rate={args.error_rate}", f"--tokens-per-second={args.tokens_per_second}",
+                     f"--summary-words={args.summary_words}", f"--seed={args.seed}"]
+        mock = subprocess.Popen([sys.executable, os.path.join(HERE, "bench_mock_llm.py"),
+                                 f"--http-port={http_port}", f"--grpc-port={grpc_port}", *mock_args],
+                                cwd=HERE, env=env)
+        # The API runs in the temp dir, so its relative cache/ and data/ paths start empty
+        api_log = open(os.path.join(tmp, "api.log"), "w")
+        api = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                                "--port", str(api_port), "--log-level", "warning"],
+                               cwd=tmp, env={**env, "PYTHONPATH": HERE}, stdout=subprocess.DEVNULL, stderr=api_log)
+        try:
+            asyncio.run(_wait_until_up(f"http://127.0.0.1:{http_port}/stats"))
+            try:
+                asyncio.run(_wait_until_up(f"http://127.0.0.1:{api_port}/health"))
+            except RuntimeError:
+                with open(api_log.name) as log:
+                    print(log.read()[-4000:])
+                raise
+            report = asyncio.run(_drive(f"http://127.0.0.1:{api_port}", args))
+            report["pipeline"] = args.pipeline
+            report["mode"] = args.mode
+            report["peak_rss_mb"] = _peak_rss_mb(api.pid)
+            report["llm_requests"] = httpx.get(f"http://127.0.0.1:{http_port}/stats").json()
+            report["analysis_metrics"] = httpx.get(f"http://127.0.0.1:{api_port}/analysis/metrics").json()
+            print(report)
+        finally:
+            api.terminate()
+            mock.terminate()
+            api.wait()
+            mock.wait()
+            api_log.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Cold-start cost of the API: module import time and time until /health answers.
+
+Imports main in fresh interpreters (-X importtime), reporting the median import time and the slowest
+modules imported directly by the app. Then starts uvicorn main:app and times the first /health response
+and the end of the background pipeline warm-up (the provider appearing in /providers/stats).
+Exits with status 1 when the median import exceeds --max-import-seconds, so CI catches import-time
+regressions such as a heavy SDK imported at module level.
+
+Run with: python bench_startup.py --repeats 5 --max-import-seconds 2
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from bench_service import HERE, _free_port
+
+APP_MODULES = {os.path.splitext(name)[0] for name in os.listdir(HERE) if name.endswith(".py")}
+
+
+def _import_once(env: dict, cwd: str):
+    # Returns (seconds, {module: cumulative microseconds}) for one cold import of main
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=cwd, env=env,
+                            capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - started
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            modules[name.strip()] = max(modules.get(name.strip(), 0), int(cumulative))
+    return elapsed, modules
+
+
+def _time_until(check, timeout: float) -> float:
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            if check():
+                return round(time.perf_counter() - started, 2)
+        except httpx.TransportError:
+            pass
+        time.sleep(0.02)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="slowest app-level imports to list")
+    parser.add_argument("--max-import-seconds", type=float, default=None)
+    parser.add_argument("--pipeline", choices=("crew", "gemini"), default="crew")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "PYTHONPATH": HERE, "ANALYSIS_PIPELINE": args.pipeline,
+               "GROQ_API_KEY": os.environ.get("GROQ_API_KEY", "bench"),
+               "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY", "bench"),
+               "LITELLM_LOCAL_MODEL_COST_MAP": "True", "CREWAI_DISABLE_TELEMETRY": "true",
+               "OTEL_SDK_DISABLED": "true"}
+        samples, modules = [], {}
+        for _ in range(args.repeats):
+            elapsed, modules = _import_once(env, tmp)
+            samples.append(elapsed)
+        import_seconds = statistics.median(samples)
+        # Third-party packages pulled in by the app's own modules, by cumulative import time
+        slowest = sorted(((name, us) for name, us in modules.items()
+                          if name.split(".")[0] not in APP_MODULES), key=lambda item: -item[1])
+        top_level = []
+        for name, us in slowest:
+            if not any(name.startswith(parent + ".") for parent, _ in top_level):
+                top_level.append((name, us))
+            if len(top_level) >= args.top:
+                break
+        print({"operation": "import main", "repeats": args.repeats, "median_seconds": round(import_seconds, 3),
+               "slowest_imports_ms": {name: round(us / 1000) for name, us in top_level}})
+
+        port = _free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        provider = "gemini" if args.pipeline == "gemini" else "groq"
+        started = time.perf_counter()
+        api = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                                "--port", str(port), "--log-level", "warning"],
+                               cwd=tmp, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            health = _time_until(lambda: httpx.get(f"{base_url}/health").status_code == 200, 120)
+            warm = _time_until(lambda: provider in httpx.get(f"{base_url}/providers/stats").json(), 120)
+            print({"operation": "uvicorn start", "pipeline": args.pipeline, "health_seconds": health,
+                   "warm_up_seconds": round(health + warm, 2) if health is not None and warm is not None else None,
+                   "total_seconds": round(time.perf_counter() - started, 2)})
+        finally:
+            api.terminate()
+            api.wait()
+
+    if args.max_import_seconds is not None and import_seconds > args.max_import_seconds:
+        print(f"Import of main took {import_seconds:.2f}s, over the {args.max_import_seconds}s limit")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
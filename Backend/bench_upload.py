@@ -0,0 +1,79 @@
+"""Upload throughput and API memory for large documents.
+
+Starts the API (uvicorn main:app) as a subprocess and posts text or PDF documents of the given sizes to
+/upload, several at once. Uploads are streamed to a spooled file, so the API's peak RSS should grow
+with concurrency, not with document size. Extracted text is capped with ANALYSIS_CHAR_BUDGET so the
+job store's copy of the text does not dominate the measurement.
+
+Run with: python bench_upload.py --sizes-mb 1 10 100 --concurrency 4 --kind txt
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from bench_extraction import make_synthetic_pdf
+from bench_service import HERE, PARAGRAPH, _free_port, _peak_rss_mb, _wait_until_up
+
+
+def _document(kind: str, size_mb: float) -> bytes:
+    if kind == "pdf":
+        # make_synthetic_pdf pages are ~4KB each
+        return make_synthetic_pdf(max(1, int(size_mb * 1024 * 1024 / 4096)))
+    paragraph = PARAGRAPH.format(date="2023-01-15").encode("utf-8")
+    return paragraph * (int(size_mb * 1024 * 1024) // len(paragraph) + 1)
+
+
+async def _upload_all(base_url: str, name: str, content: bytes, concurrency: int) -> dict:
+    async with httpx.AsyncClient(base_url=base_url, timeout=600) as client:
+        async def upload(i):
+            response = await client.post("/upload", files={"file": (f"{i}-{name}", content)})
+            return response.status_code
+
+        started = time.perf_counter()
+        statuses = await asyncio.gather(*[upload(i) for i in range(concurrency)])
+        elapsed = time.perf_counter() - started
+    return {"statuses": sorted(set(statuses)), "seconds": round(elapsed, 2),
+            "mb_per_second": round(len(content) * concurrency / 1024 / 1024 / elapsed, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--kind", choices=("txt", "pdf"), default="txt")
+    args = parser.parse_args()
+
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "PYTHONPATH": HERE, "NEAR_DUPLICATE_DETECTION": "false",
+               "ANALYSIS_CHAR_BUDGET": os.environ.get("ANALYSIS_CHAR_BUDGET", "200000"),
+               "UPLOAD_MAX_MB": str(int(max(args.sizes_mb)) + 1),
+               "GROQ_API_KEY": os.environ.get("GROQ_API_KEY", "bench"),
+               "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY", "bench")}
+        # A fresh API per size, so each peak RSS reading covers only that size
+        for size_mb in args.sizes_mb:
+            content = _document(args.kind, size_mb)
+            api = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                                    "--port", str(port), "--log-level", "warning"],
+                                   cwd=tmp, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                asyncio.run(_wait_until_up(f"http://127.0.0.1:{port}/health"))
+                idle_rss = _peak_rss_mb(api.pid)
+                report = asyncio.run(_upload_all(f"http://127.0.0.1:{port}", f"doc.{args.kind}", content,
+                                                 args.concurrency))
+                print({"kind": args.kind, "size_mb": round(len(content) / 1024 / 1024, 1),
+                       "concurrency": args.concurrency, **report,
+                       "idle_rss_mb": idle_rss, "peak_rss_mb": _peak_rss_mb(api.pid)})
+            finally:
+                api.terminate()
+                api.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+# Configure logging
+import logging
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "cache/results.db")
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Per-chunk agent outputs and partial summaries of long documents, reused by later versions
+CHUNK_CACHE_PATH = os.getenv("CHUNK_CACHE_PATH", "cache/chunks.db")
+CHUNK_CACHE_MAX_BYTES = int(os.getenv("CHUNK_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# The running size total is recounted from the table every this many writes, picking up entries
+# written or evicted by other processes sharing the file
+CACHE_RECOUNT_INTERVAL = 256
+
+
+def make_cache_key(text: str, config: Dict) -> str:
+    # The key covers the exact document text plus everything that shapes the
+    # output (model, prompts, agent roles), so a prompt change never serves stale results.
+    digest = hashlib.sha256()
+    digest.update(json.dumps(config, sort_keys=True).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def config_fingerprint(config: Dict) -> str:
+    # Identifies a pipeline configuration on its own, e.g. to match results across similar documents
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Persistent SQLite cache of analysis results with TTL and size-based LRU eviction.
+
+    Calls block on SQLite; async code uses aget/aset, which run them on a worker thread.
+    """
+
+    def __init__(self, path: str = RESULT_CACHE_PATH, ttl_seconds: int = RESULT_CACHE_TTL_SECONDS,
+                 max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_last_access ON results(last_access)")
+        self._conn.commit()
+        self._total_bytes = self._count_bytes()
+        self._writes = 0
+        logger.info(f"Result cache opened at {path} (ttl={ttl_seconds}s, max_bytes={max_bytes})")
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at, size FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                    self._conn.commit()
+                    self._total_bytes -= row[2]
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Dict):
+        payload = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, now)
+            )
+            self._total_bytes += len(payload) - (previous[0] if previous else 0)
+            self._writes += 1
+            if self._writes % CACHE_RECOUNT_INTERVAL == 0:
+                self._total_bytes = self._count_bytes()
+            self._evict(now)
+            self._conn.commit()
+
+    async def aget(self, key: str) -> Optional[Dict]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: Dict):
+        await asyncio.to_thread(self.set, key, value)
+
+    def _count_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def _evict(self, now: float):
+        # Expired entries are also dropped when read, so the TTL purge only runs every CACHE_RECOUNT_INTERVAL writes
+        if self._writes % CACHE_RECOUNT_INTERVAL == 1:
+            expired = self._conn.execute(
+                "DELETE FROM results WHERE created_at < ?", (now - self.ttl_seconds,)
+            ).rowcount
+            if expired:
+                self.evictions += expired
+                self._total_bytes = self._count_bytes()
+        # Drop least recently used entries until we are back under the ceiling
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute("SELECT key, size FROM results ORDER BY last_access ASC LIMIT 64").fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+            for key, size in rows:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._total_bytes -= size
+                self.evictions += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            size = self._total_bytes
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+
+result_cache = ResultCache()
+chunk_cache = ResultCache(CHUNK_CACHE_PATH, max_bytes=CHUNK_CACHE_MAX_BYTES)
@@ -0,0 +1,189 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from utils import CHARS_PER_TOKEN
+
+# Configure logging
+import logging
+logger = logging.getLogger(__name__)
+
+# Documents longer than this (approximate tokens) are analyzed chunk by chunk
+CHUNKING_THRESHOLD_TOKENS = int(os.getenv("CHUNKING_THRESHOLD_TOKENS", "6000"))
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "1500"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "150"))
+# Maximum number of chunks (or summary groups) analyzed at the same time
+CHUNK_CONCURRENCY = int(os.getenv("CHUNK_CONCURRENCY", "4"))
+# How many partial summaries are combined per reduce step (at least 2, or the reduce never converges)
+SUMMARY_FANOUT = max(2, int(os.getenv("SUMMARY_FANOUT", "5")))
+
+ENTITY_KEYS = ("people", "organizations", "dates", "locations")
+
+
+def needs_chunking(text: str) -> bool:
+    return len(text) > CHUNKING_THRESHOLD_TOKENS * CHARS_PER_TOKEN
+
+
+def chunking_config() -> Dict:
+    return {
+        "chunk_tokens": CHUNK_TOKENS,
+        "overlap_tokens": CHUNK_OVERLAP_TOKENS,
+        "summary_fanout": SUMMARY_FANOUT
+    }
+
+
+def split_into_spans(text: str, chunk_tokens: int = CHUNK_TOKENS,
+                     overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> List[Tuple[int, int]]:
+    # (start, end) offsets of each chunk in text
+    size = chunk_tokens * CHARS_PER_TOKEN
+    overlap = overlap_tokens * CHARS_PER_TOKEN
+    spans = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            # Prefer to cut at a line break, then at a space, in the second half of the window
+            cut = text.rfind("\n", start + size // 2, end)
+            if cut == -1:
+                cut = text.rfind(" ", start + size // 2, end)
+            if cut != -1:
+                end = cut
+        spans.append((start, end))
+        if end >= len(text):
+            break
+        next_start = max(end - overlap, start + 1)
+        # Don't start the next chunk in the middle of a word
+        space = text.find(" ", next_start, end)
+        start = space + 1 if space != -1 else next_start
+    return spans
+
+
+def split_into_chunks(text: str, chunk_tokens: int = CHUNK_TOKENS,
+                      overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> List[str]:
+    return [text[start:end] for start, end in split_into_spans(text, chunk_tokens, overlap_tokens)]
+
+
+def align_chunks(previous_text: str, previous_spans: List[Tuple[int, int]], text: str) -> List[Tuple[int, int]]:
+    """Chunk a new version of a document so that its unchanged parts reuse the previous version's chunks.
+
+    Every previous chunk found verbatim in the new text (in order) is kept as is, so its cached
+    analysis still applies; only the text between kept chunks, i.e. the edited regions, is split afresh.
+    Returns (start, end) spans in the new text.
+    """
+    kept = []
+    search_from = 0
+    for start, end in previous_spans:
+        position = text.find(previous_text[start:end], search_from)
+        if position != -1:
+            kept.append((position, position + end - start))
+            search_from = position + 1
+    spans = []
+    covered = 0
+    for start, end in kept + [(len(text), len(text))]:
+        if start > covered and text[covered:start].strip():
+            spans.extend((covered + gap_start, covered + gap_end)
+                         for gap_start, gap_end in split_into_spans(text[covered:start]))
+        if end > start:
+            spans.append((start, end))
+        covered = max(covered, end)
+    return spans
+
+
+def merge_entities(entity_results: List[Dict]) -> Dict[str, List[str]]:
+    merged = {key: [] for key in ENTITY_KEYS}
+    seen = {key: set() for key in ENTITY_KEYS}
+    for entities in entity_results:
+        for key in ENTITY_KEYS:
+            for value in entities.get(key, []):
+                normalized = " ".join(str(value).split()).casefold()
+                if normalized and normalized not in seen[key]:
+                    seen[key].add(normalized)
+                    merged[key].append(" ".join(str(value).split()))
+    return merged
+
+
+def aggregate_sentiment(sentiments: List[Dict], weights: List[int]) -> Dict:
+    # Each chunk votes for its tone with weight confidence * chunk length
+    tone_weights = {}
+    total = 0.0
+    for sentiment, weight in zip(sentiments, weights):
+        tone = str(sentiment.get("tone", "neutral")).lower()
+        tone_weights[tone] = tone_weights.get(tone, 0.0) + float(sentiment.get("confidence", 0.0)) * weight
+        total += weight
+    if not tone_weights or total == 0:
+        return {"tone": "neutral", "confidence": 0.0}
+    tone = max(tone_weights, key=tone_weights.get)
+    return {"tone": tone, "confidence": round(tone_weights[tone] / total, 3)}
+
+
+async def _bounded_gather(coroutine_factories: List[Callable[[], Awaitable]], limit: int) -> List:
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(factory):
+        async with semaphore:
+            return await factory()
+
+    return await asyncio.gather(*[run(factory) for factory in coroutine_factories], return_exceptions=True)
+
+
+async def reduce_summaries(summaries: List[str], summarize: Callable[[str], Awaitable[str]],
+                           fanout: int = SUMMARY_FANOUT, concurrency: int = CHUNK_CONCURRENCY,
+                           usage: Dict = None) -> str:
+    # Combine partial summaries in groups until a single summary remains
+    fanout = max(2, fanout)
+    while len(summaries) > 1:
+        groups = ["\n\n".join(summaries[i:i + fanout]) for i in range(0, len(summaries), fanout)]
+        results = await _bounded_gather([lambda group=group: summarize(group) for group in groups], concurrency)
+        # A failed group keeps its concatenated input so no content is lost; the job reports the
+        # fallback (usage["summary_reduce_fallbacks"]) so the summary is not presented as a clean one
+        failed = [result for result in results if isinstance(result, Exception)]
+        if failed:
+            logger.warning(f"{len(failed)} of {len(groups)} summary groups failed to combine "
+                           f"(first error: {str(failed[0])}); keeping their partial summaries.")
+            if usage is not None:
+                usage["summary_reduce_fallbacks"] = usage.get("summary_reduce_fallbacks", 0) + len(failed)
+        summaries = [result if not isinstance(result, Exception) else group
+                     for result, group in zip(results, groups)]
+    return summaries[0] if summaries else ""
+
+
+async def map_reduce_analysis(text: str, analyze_chunk: Callable[[str], Awaitable[list]],
+                              summarize: Callable[[str], Awaitable[str]], usage: Dict = None,
+                              concurrency: int = CHUNK_CONCURRENCY, chunks: List[str] = None) -> list:
+    """Analyze a long document chunk by chunk and reduce to one [summary, entities, sentiment] result.
+
+    analyze_chunk has the same contract as agents_and_run_crew: it returns
+    [summary_dict, entities_dict, sentiment_dict] where any slot may be an exception,
+    or None for an agent that was not run. `chunks` overrides the default split (see align_chunks).
+    """
+    chunks = chunks or split_into_chunks(text)
+    logger.info(f"Map-reduce analysis over {len(chunks)} chunks (concurrency={concurrency}).")
+    chunk_results = await _bounded_gather([lambda chunk=chunk: analyze_chunk(chunk) for chunk in chunks], concurrency)
+
+    summaries, entity_results, sentiments, weights = [], [], [], []
+    failures = 0
+    for chunk, result in zip(chunks, chunk_results):
+        if isinstance(result, Exception):
+            failures += 1
+            continue
+        summary_result, entities_result, sentiment_result = result
+        if isinstance(summary_result, dict) and summary_result.get("summary"):
+            summaries.append(summary_result["summary"])
+        if isinstance(entities_result, dict):
+            entity_results.append(entities_result)
+        if isinstance(sentiment_result, dict):
+            sentiments.append(sentiment_result)
+            weights.append(len(chunk))
+        failures += sum(isinstance(slot, Exception) for slot in result)
+    if usage is not None:
+        usage["chunks"] = len(chunks)
+        usage["chunk_failures"] = failures
+    if not summaries and not entity_results and not sentiments:
+        raise Exception(f"All {len(chunks)} chunks failed analysis")
+
+    summary_result = ({"summary": await reduce_summaries(summaries, summarize, concurrency=concurrency, usage=usage)}
+                      if summaries else Exception("No chunk produced a summary"))
+    entities_result = merge_entities(entity_results) if entity_results else Exception("No chunk produced entities")
+    sentiment_result = (aggregate_sentiment(sentiments, weights)
+                        if sentiments else Exception("No chunk produced a sentiment"))
+    return [summary_result, entities_result, sentiment_result]
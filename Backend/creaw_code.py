@@ -1,174 +1,208 @@
-import time
-from crewai import Agent, Task, Crew, LLM
-from pydantic import BaseModel
+import asyncio
+from typing import Any
+from crewai import Agent, Task, Crew
+from crewai.llms.base_llm import BaseLLM
+from pydantic import Field
+from models import AnalysisResults, ANALYSIS_AGENTS
+from events import notify_when_done
+from metrics import timed_agent
+from llm_providers import get_provider, provider_loop
+from prompts import AGENT_CONFIGS, CREW_TEMPLATES, CREW_MODEL, CREW_TEMPERATURE
+from selection import select_for_agent
 from dotenv import load_dotenv
 import os
-import json
-import uuid
+import threading
 
-load_dotenv()
-os.environ["GROQ_API_KEY"] = os.getenv("GROQ_API_KEY")
-
-
-class Summary(BaseModel):
-    summary: str
-
-# Define Pydantic models for structured output
-class Entities(BaseModel):
-    people: list[str] = []
-    organizations: list[str] = []
-    dates: list[str] = []
-    locations: list[str] = []
-
-class Sentiment(BaseModel):
-    tone: str = "neutral"
-    confidence: float = 0.0
-
-# class AnalysisResults(BaseModel):
-#     summary: Summary
-#     entities: Entities
-#     sentiment: Sentiment
-
-# Initialize LLM
-llm = LLM(
-    model="groq/llama-3.3-70b-versatile",
-    temperature=0.7
-)
-
-
-
-# Example text to analyze
-# text_to_analyze = "Gemini is a powerful AI model developed by Google. Sundar Pichai announced its release in 2023. The model is capable of understanding natural language and generating human-like responses."
-async def agents_and_run_crew(text_to_analyze):
-    # start_time = time.time()
-
-    # Create CrewAI agents for summarization, entity extraction, and sentiment analysis
-    summarizer_agent = Agent(
-        role='Summarizer',
-        goal='Summarize the given document text and return only the summary as a string.',
-        backstory='Expert at condensing information into concise summaries.',
-        llm=llm,
-        verbose=True
-    )
-
-    entity_extractor_agent = Agent(
-        role='Entity Extractor',
-        goal='Extract entities (people, organizations, dates, locations) from the document text and return a JSON object with keys: people, organizations, dates, locations.',
-        backstory='Skilled at identifying and categorizing entities in text.',
-        llm=llm,
-        verbose=True
-    )
-
-    sentiment_analyzer_agent = Agent(
-        role='Sentiment Analyzer',
-        goal='Analyze the sentiment of the document text and return a JSON object with keys: tone and confidence.',
-        backstory='Specialist in detecting tone and sentiment in written content.',
-        llm=llm,
-        verbose=True
-    )
-
-
-# final_analyzer_agent = Agent(
-#     role='Final Analysis Coordinator',
-#     goal='Combine and synthesize outputs from all previous agents into a comprehensive final report',
-#     backstory='You are an expert at synthesizing information from multiple sources. You excel at taking diverse data points - summaries, entity extractions, and sentiment analyses - and weaving them into cohesive, actionable insights.',
-#     llm=llm,
-#     verbose=True
-# )
-
-    # Define tasks for each agent
-    summary_task = Task(
-        description=f'Summarize the following document:\n\n{text_to_analyze}',
-        expected_output="A concise summary of the document.",
-        agent=summarizer_agent,
-        output_pydantic=Summary
-    )
-
-    entity_task = Task(
-        description=f'Extract all entities (people, organizations, dates, locations) from the following document and return a JSON object with keys: people, organizations, dates, locations.\n\n{text_to_analyze}',
-        expected_output="A JSON object of entities found in the document.",
-        agent=entity_extractor_agent,
-        output_pydantic=Entities
-    )
-
-    sentiment_task = Task(
-        description=f'Analyze the sentiment of the following document and return a JSON object with keys: tone and confidence.\n\n{text_to_analyze}',
-        expected_output="A JSON object with the overall sentiment and tone of the document.",
-        agent=sentiment_analyzer_agent,
-        output_pydantic=Sentiment
-    )
+# Configure logging
+import logging
+logger = logging.getLogger(__name__)
 
+load_dotenv()
 
-    # final_task = Task(
-    #     description="Combine all previous results into one output",
-    #     expected_output="Combined analysis with summary, entities, and sentiment",
-    #     agent=final_analyzer_agent,
-    #     output_pydantic=AnalysisResults,
-    #     context=[summary_task, entity_task, sentiment_task]  # Access all previous tasks
-    # )
-
-    # Create crew to manage agents and task workflow
-    # crew = Crew(
-    #     agents=[summarizer_agent, entity_extractor_agent, sentiment_analyzer_agent],
-    #     tasks=[summary_task, entity_task, sentiment_task, final_task],
-    #     verbose=True
-    # )
-    crew = Crew(
-        agents=[summarizer_agent, entity_extractor_agent, sentiment_analyzer_agent],
-        tasks=[summary_task, entity_task, sentiment_task],
-        verbose=True
+LLM_MODEL = CREW_MODEL
+LLM_TEMPERATURE = CREW_TEMPERATURE
+# Idle prebuilt crews kept per task template (0 builds a fresh crew for every run)
+CREW_POOL_SIZE = int(os.getenv("CREW_POOL_SIZE", "16"))
+
+
+class ProviderLLM(BaseLLM):
+    """CrewAI LLM that sends every call through a shared LLMProvider (pooled client, concurrency limit)."""
+
+    llm_provider: Any = Field(exclude=True)
+    # The job's usage dict; retries and rate-limit waits are reported there directly,
+    # token counts reach it through the crew output
+    job_usage: Any = Field(default=None, exclude=True)
+
+    async def acall(self, messages, tools=None, callbacks=None, available_functions=None,
+                    from_task=None, from_agent=None, response_model=None):
+        usage = {}
+        try:
+            text = await self.llm_provider.generate(messages, temperature=self.temperature,
+                                                    stop=self.stop_sequences or None, usage=usage)
+        finally:
+            if self.job_usage is not None:
+                for key in ("retries", "rate_limit_wait_seconds"):
+                    self.job_usage[key] = round(self.job_usage.get(key, 0) + usage.get(key, 0), 3)
+        self._track_token_usage_internal({
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "completion_tokens": usage.get("completion_tokens", 0),
+            "total_tokens": usage.get("total_tokens", 0)
+        })
+        return self._apply_stop_words(text)
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        # Only reached from a synchronous Crew.kickoff. The call runs on the provider loop, so this works whether
+        # or not the calling thread has an event loop running (asyncio.run would raise on one).
+        future = asyncio.run_coroutine_threadsafe(
+            self.acall(messages, tools, callbacks, available_functions, from_task, from_agent, response_model),
+            provider_loop()
+        )
+        return future.result()
+
+    def bind_job(self, usage: dict = None):
+        # Pooled crews serve one job at a time: report to that job's usage and restart the token count
+        self.job_usage = usage
+        self._token_usage = {key: 0 for key in self._token_usage}
+
+    def supports_stop_words(self) -> bool:
+        return self._supports_stop_words_implementation()
+
+
+def crew_llm(usage: dict = None) -> ProviderLLM:
+    # One LLM object per agent, so each crew's token usage counts only its own calls
+    return ProviderLLM(model=LLM_MODEL, temperature=LLM_TEMPERATURE, llm_provider=get_provider("groq"),
+                       job_usage=usage)
+
+
+def _record_usage(usage: dict, crew_output):
+    token_usage = getattr(crew_output, "token_usage", None)
+    usage["llm_calls"] = usage.get("llm_calls", 0) + 1
+    for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        usage[key] = usage.get(key, 0) + (getattr(token_usage, key, 0) or 0)
+
+
+class CrewPool:
+    """Prebuilt single-task crews for one template in CREW_TEMPLATES, reused across documents.
+
+    The task description keeps the prompt's {text} placeholder and each kickoff interpolates the
+    document into it. A crew holds per-run state (task output, LLM token counts), so every kickoff
+    checks one out exclusively; at most CREW_POOL_SIZE idle crews are kept per template.
+    """
+
+    def __init__(self, name: str, size: int = CREW_POOL_SIZE):
+        self.name = name
+        self.size = size
+        self._idle = []
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def _build(self) -> Crew:
+        agent_config, prompt, expected_output, output_model = CREW_TEMPLATES[self.name]
+        agent = Agent(
+            **AGENT_CONFIGS[agent_config],
+            llm=crew_llm(),
+            verbose=True
+        )
+        task = Task(
+            description=prompt,
+            expected_output=expected_output,
+            agent=agent,
+            output_pydantic=output_model
+        )
+        with self._lock:
+            self.created += 1
+        return Crew(agents=[agent], tasks=[task], verbose=True)
+
+    def acquire(self) -> Crew:
+        with self._lock:
+            if self._idle:
+                self.reused += 1
+                return self._idle.pop()
+        return self._build()
+
+    def release(self, crew: Crew):
+        crew.agents[0].llm.bind_job(None)
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(crew)
+
+    def prebuild(self, count: int = 1):
+        for _ in range(count - len(self._idle)):
+            self.release(self._build())
+
+    def stats(self) -> dict:
+        return {"idle": len(self._idle), "created": self.created, "reused": self.reused}
+
+
+crew_pools = {name: CrewPool(name) for name in CREW_TEMPLATES}
+
+
+def crew_pool_stats() -> dict:
+    return {name: pool.stats() for name, pool in crew_pools.items()}
+
+
+def prebuild_crews(count: int = 1):
+    # Warm-up hook: build `count` idle crews per template ahead of the first job
+    for pool in crew_pools.values():
+        pool.prebuild(count)
+
+
+async def _run_single_task_crew(name: str, text: str, usage: dict = None) -> dict:
+    pool = crew_pools[name]
+    crew = pool.acquire()
+    crew.agents[0].llm.bind_job(usage)
+    # akickoff runs the agent natively on the event loop; the LLM call goes through the provider
+    crew_output = await crew.akickoff(inputs={"text": select_for_agent(text, name, usage)})
+    task = crew.tasks[0]
+    # Crews that failed mid-run are dropped rather than returned to the pool
+    if task.output is None or task.output.pydantic is None:
+        raise ValueError(f"The {name} crew returned no structured output")
+    output = task.output.pydantic.model_dump()
+    pool.release(crew)
+    if usage is not None:
+        _record_usage(usage, crew_output)
+    return output
+
+
+async def agents_and_run_crew(text_to_analyze, usage: dict = None, on_result=None, agents=ANALYSIS_AGENTS):
+    # Run the pooled summarization, entity extraction, and sentiment analysis crews;
+    # agents not listed in `agents` are not run and their result slot is None.
+    # The three tasks are independent, so each runs in its own single-task crew and
+    # the crews are kicked off concurrently. Latency is bounded by the slowest agent
+    # instead of the sum of all three.
+    # on_result(agent, output) is called as each crew finishes, for streaming to clients
+    selected = [name for name in ANALYSIS_AGENTS if name in agents]
+    outputs = await asyncio.gather(
+        *[notify_when_done(name, timed_agent(name, usage, _run_single_task_crew(name, text_to_analyze, usage)), on_result)
+          for name in selected],
+        return_exceptions=True
     )
-
-    # Run the crew and collect results
-    # result = crew.kickoff()
-    # print("\n--- Raw Results ---")
-    # print(result)
-
-    print("--------------------------------------------------------------------------------------------------------------------")
-
-    # result = crew.kickoff()
-    # print(result.pydantic)  # All outputs combined
-
-    # Run the crew
-    result = crew.kickoff()
-
-    # Access individual task outputs
-    summary_output = summary_task.output.pydantic.dict() if summary_task.output else {}
-    entities_output = entity_task.output.pydantic.dict() if entity_task.output else {}
-    sentiment_output = sentiment_task.output.pydantic.dict() if sentiment_task.output else {}
-    # final_output = final_task.output.pydantic.dict() if final_task.output else {}
-
-    # jobs_store = {}
-    result1 = [summary_output, entities_output, sentiment_output]
-
-    # Simulate realistic job_id and document_name
-    # job_id = str(uuid.uuid4())
-    # document_name = "sample_document.txt"
-
-
-    # summary, entities, sentiment = extract_structured_results(result1)
-    # processing_time = time.time() - start_time
-    # processing_time_in_seconds = round(processing_time, 2)
-
-    # # Flatten summary if it's a dict
-    # if isinstance(summary, dict) and "summary" in summary:
-    #     summary = summary["summary"]
-
-    # jobs_store[job_id] = {
-    #     "job_id": job_id,
-    #     "status": "completed",
-    #     "document_name": document_name,
-    #     "results": {
-    #         "summary": summary,
-    #         "entities": entities,
-    #         "sentiment": sentiment
-    #     },
-    #     "processing_time_seconds": round(processing_time, 2)
-    # }
-
-
-
-    # print("\n✅ --- Stored Job Results ---")
-    # print(json.dumps(jobs_store, indent=2))
-    return result1
-
+    completed = dict(zip(selected, outputs))
+    return [completed.get(name) for name in ANALYSIS_AGENTS]
+
+
+async def run_fused_crew(text_to_analyze, usage: dict = None, on_result=None):
+    # One structured call returns summary, entities and sentiment together, so the
+    # document is sent once instead of three times. Falls back to per-agent crews
+    # if the response does not validate against AnalysisResults.
+    try:
+        output = await timed_agent("fused", usage, _run_single_task_crew("fused", text_to_analyze, usage))
+        results = AnalysisResults(**output)
+        outputs = [results.summary.model_dump(), results.entities.model_dump(), results.sentiment.model_dump()]
+        if on_result is not None:
+            for agent, agent_output in zip(("summary", "entities", "sentiment"), outputs):
+                on_result(agent, agent_output)
+        return outputs
+    except Exception as e:
+        logger.warning(f"Fused analysis failed, falling back to per-agent crews: {str(e)}")
+        if usage is not None:
+            usage["fallback"] = True
+        return await agents_and_run_crew(text_to_analyze, usage, on_result)
+
+
+async def summarize_with_crew(text_to_summarize, usage: dict = None) -> str:
+    # Standalone summarizer run, used to combine partial summaries of long documents
+    output = await _run_single_task_crew("summary", text_to_summarize, usage)
+    return output["summary"]
@@ -0,0 +1,83 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+# Configure logging
+import logging
+logger = logging.getLogger(__name__)
+
+# Events kept per running job so a stream opened mid-analysis can catch up
+EVENT_HISTORY_LIMIT = 2000
+TERMINAL_STATUSES = ("completed", "partial", "failed")
+
+
+class JobEventBus:
+    """In-process fan-out of job events (status changes, agent results, summary tokens) to stream subscribers.
+
+    publish() is safe to call from any thread; delivery happens on the loop passed to bind().
+    Until bind() is called (e.g. in worker processes) publishing is a no-op.
+    """
+
+    def __init__(self, history_limit: int = EVENT_HISTORY_LIMIT):
+        self.history_limit = history_limit
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._history: Dict[str, List[tuple]] = {}
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._loop_thread = threading.get_ident()
+
+    def publish(self, job_id: str, event: str, data: Dict):
+        if self._loop is None:
+            return
+        if threading.get_ident() == self._loop_thread:
+            self._deliver(job_id, event, data)
+        else:
+            self._loop.call_soon_threadsafe(self._deliver, job_id, event, data)
+
+    def _deliver(self, job_id: str, event: str, data: Dict):
+        if event == "status" and data.get("status") in TERMINAL_STATUSES:
+            # Finished jobs are served from the job store, so their history is no longer needed
+            self._history.pop(job_id, None)
+        else:
+            history = self._history.setdefault(job_id, [])
+            if len(history) < self.history_limit:
+                history.append((event, data))
+        for queue in self._subscribers.get(job_id, ()):
+            queue.put_nowait((event, data))
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        for item in self._history.get(job_id, ()):
+            queue.put_nowait(item)
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(job_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[job_id]
+
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+async def notify_when_done(agent: str, coroutine: Awaitable,
+                           on_result: Optional[Callable[[str, Any], None]]) -> Any:
+    # Report an agent's result (or the exception it raised) the moment it finishes
+    try:
+        result = await coroutine
+    except Exception as e:
+        if on_result is not None:
+            on_result(agent, e)
+        raise
+    if on_result is not None:
+        on_result(agent, result)
+    return result
+
+
+job_events = JobEventBus()
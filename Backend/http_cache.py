@@ -0,0 +1,105 @@
+import gzip
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # the standard library encoder is used instead
+    orjson = None
+
+# Configure logging
+import logging
+logger = logging.getLogger(__name__)
+
+# Serialized result bodies at least this large are also kept gzip-compressed
+RESULTS_GZIP_MIN_BYTES = int(os.getenv("RESULTS_GZIP_MIN_BYTES", "1024"))
+# Serialized bodies of final job records kept in memory, least recently used evicted first
+RESULTS_RESPONSE_CACHE_SIZE = int(os.getenv("RESULTS_RESPONSE_CACHE_SIZE", "1024"))
+
+
+def dumps(value) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def job_etag(job_id: str, revision: int) -> str:
+    # Weak: the gzip and identity encodings of one revision share the tag
+    return f'W/"{job_id}-{revision}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:]
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    for coding in (accept_encoding or "").split(","):
+        name, _, quality = coding.partition(";")
+        if name.strip().lower() == "gzip":
+            quality = quality.strip().removeprefix("q=")
+            try:
+                return not quality or float(quality) > 0
+            except ValueError:
+                return True
+    return False
+
+
+def encode_body(value, gzip_min_bytes: int = RESULTS_GZIP_MIN_BYTES) -> Tuple[bytes, Optional[bytes]]:
+    # (JSON body, gzip-compressed body or None when the body is too small to be worth compressing)
+    body = dumps(value)
+    return body, gzip.compress(body, compresslevel=6) if len(body) >= gzip_min_bytes else None
+
+
+class SerializedResponses:
+    """Bounded LRU of encoded response entries keyed by ETag.
+
+    Only final job records are stored: their body for a given revision never changes, so it is
+    encoded (and compressed) once and every later read is a dictionary lookup.
+    """
+
+    def __init__(self, max_entries: int = RESULTS_RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, etag: str) -> Optional[tuple]:
+        with self._lock:
+            entry = self._entries.get(etag)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(etag)
+            self.hits += 1
+            return entry
+
+    def put(self, etag: str, entry: tuple):
+        if self.max_entries > 0:
+            with self._lock:
+                self._entries[etag] = entry
+                self._entries.move_to_end(etag)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "encoder": "orjson" if orjson is not None else "json"
+        }
+
+
+serialized_results = SerializedResponses()
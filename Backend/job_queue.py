@@ -0,0 +1,142 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from job_store import JOB_STORE_PATH
+from scheduler import PRIORITIES, QueueFullError, ANALYSIS_QUEUE_SIZE
+
+# Configure logging
+import logging
+logger = logging.getLogger(__name__)
+
+# A claimed job whose lease is not renewed in time (its worker died or hung) is handed out again.
+# Running jobs renew their lease from a heartbeat, so the lease only needs to outlast a few missed beats.
+WORKER_LEASE_SECONDS = int(os.getenv("WORKER_LEASE_SECONDS", "900"))
+# Rough per-job service time used for Retry-After until real timings are available
+DEFAULT_SERVICE_SECONDS = 30
+
+
+class SqliteJobQueue:
+    """Durable analysis queue shared by API processes (producers) and worker processes (consumers).
+
+    Lives in the same SQLite file as the SQLite job store.
+    """
+
+    def __init__(self, path: str = JOB_STORE_PATH, max_size: int = ANALYSIS_QUEUE_SIZE,
+                 lease_seconds: int = WORKER_LEASE_SECONDS):
+        self.path = path
+        self.max_size = max_size
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_queue ("
+            " job_id TEXT PRIMARY KEY,"
+            " priority INTEGER NOT NULL,"
+            " enqueued_at REAL NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " claimed_by TEXT,"
+            " claimed_at REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_job_queue_order ON job_queue(claimed_by, priority, enqueued_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, job_id: str, payload: Dict, priority: str = "normal"):
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            depth = conn.execute("SELECT COUNT(*) FROM job_queue WHERE claimed_by IS NULL").fetchone()[0]
+            if depth >= self.max_size:
+                raise QueueFullError(self.retry_after_seconds(depth))
+            conn.execute(
+                "INSERT INTO job_queue (job_id, priority, enqueued_at, payload) VALUES (?, ?, ?, ?)",
+                (job_id, PRIORITIES[priority], time.time(), json.dumps(payload))
+            )
+
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers can never claim the same row
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT job_id, payload FROM job_queue"
+                " WHERE claimed_by IS NULL OR claimed_at < ?"
+                " ORDER BY priority, enqueued_at LIMIT 1",
+                (now - self.lease_seconds,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE job_queue SET claimed_by = ?, claimed_at = ? WHERE job_id = ?",
+                (worker_id, now, row[0])
+            )
+        return {"job_id": row[0], **json.loads(row[1])}
+
+    def renew(self, job_id: str, worker_id: str) -> bool:
+        # Extends the lease of a job this worker is running; False once another worker has claimed it
+        cursor = self._conn().execute(
+            "UPDATE job_queue SET claimed_at = ? WHERE job_id = ? AND claimed_by = ?",
+            (time.time(), job_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: str, worker_id: Optional[str] = None):
+        # With worker_id, only a claim this worker still holds is removed
+        if worker_id is None:
+            self._conn().execute("DELETE FROM job_queue WHERE job_id = ?", (job_id,))
+        else:
+            self._conn().execute("DELETE FROM job_queue WHERE job_id = ? AND claimed_by = ?", (job_id, worker_id))
+
+    def position(self, job_id: str) -> Optional[int]:
+        row = self._conn().execute(
+            "SELECT priority, enqueued_at FROM job_queue WHERE job_id = ? AND claimed_by IS NULL", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        ahead = self._conn().execute(
+            "SELECT COUNT(*) FROM job_queue WHERE claimed_by IS NULL"
+            " AND (priority < ? OR (priority = ? AND enqueued_at < ?))",
+            (row[0], row[0], row[1])
+        ).fetchone()[0]
+        return ahead + 1
+
+    def estimated_wait_seconds(self, job_id: str) -> Optional[float]:
+        # Worker service times are not visible to the API process
+        return None
+
+    def retry_after_seconds(self, depth: Optional[int] = None) -> int:
+        if depth is None:
+            depth = self._conn().execute("SELECT COUNT(*) FROM job_queue WHERE claimed_by IS NULL").fetchone()[0]
+        workers = max(1, self._active_workers())
+        return max(1, depth * DEFAULT_SERVICE_SECONDS // workers)
+
+    def _active_workers(self) -> int:
+        return self._conn().execute(
+            "SELECT COUNT(DISTINCT claimed_by) FROM job_queue WHERE claimed_by IS NOT NULL AND claimed_at >= ?",
+            (time.time() - self.lease_seconds,)
+        ).fetchone()[0]
+
+    def stats(self) -> Dict:
+        queued, in_progress = self._conn().execute(
+            "SELECT COALESCE(SUM(claimed_by IS NULL), 0), COALESCE(SUM(claimed_by IS NOT NULL), 0) FROM job_queue"
+        ).fetchone()
+        return {
+            "execution": "worker",
+            "queue_depth": queued,
+            "queue_capacity": self.max_size,
+            "in_progress": in_progress,
+            "busy_workers": self._active_workers()
+        }
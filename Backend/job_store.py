@@ -0,0 +1,550 @@
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # the standard library encoder is used instead
+    orjson = None
+
+from metrics import job_store_evictions_total
+
+# Configure logging
+import logging
+logger = logging.getLogger(__name__)
+
+JOB_STORE_BACKEND = os.getenv("JOB_STORE_BACKEND", "memory")
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "data/jobs.db")
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", str(24 * 3600)))
+JOB_SWEEP_INTERVAL_SECONDS = int(os.getenv("JOB_SWEEP_INTERVAL_SECONDS", "300"))
+# Memory ceiling of the in-memory store in bytes (0 = unbounded) and the zlib level of stored text (0 = off)
+JOB_STORE_MAX_BYTES = int(os.getenv("JOB_STORE_MAX_BYTES", str(512 * 1024 * 1024)))
+JOB_TEXT_COMPRESSION_LEVEL = int(os.getenv("JOB_TEXT_COMPRESSION_LEVEL", "1"))
+
+# Jobs in these states are never swept, however old they are
+ACTIVE_STATUSES = ("processing",)
+# ... and these are never evicted to stay under JOB_STORE_MAX_BYTES: their text is still to be analyzed
+PINNED_STATUSES = ("queued", "processing")
+# Uploaded jobs are not evicted either until they have waited this long for /analyze (batch members
+# waiting for the batch feeder are kept regardless)
+JOB_UPLOAD_PIN_SECONDS = int(os.getenv("JOB_UPLOAD_PIN_SECONDS", "3600"))
+# Per-entry bookkeeping beyond the record and text bytes: the slots object, its key and the OrderedDict slot
+ENTRY_OVERHEAD_BYTES = 200
+
+
+def _dumps(record: Dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(record, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(record, separators=(",", ":")).encode("utf-8")
+
+
+def _loads(record: bytes) -> Dict:
+    return orjson.loads(record) if orjson is not None else json.loads(record)
+
+
+class JobStore:
+    """Storage for job metadata/results, with document text kept separately.
+
+    get() never returns the document text; use get_text() when it is actually needed.
+    Every write bumps the record's "revision", which clients use to revalidate cached results.
+    """
+
+    def create(self, job: Dict, text: str):
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def get_text(self, job_id: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def get_revision(self, job_id: str) -> Optional[Tuple[int, str]]:
+        # (revision, status) without loading the record
+        raise NotImplementedError
+
+    def update(self, job_id: str, **fields):
+        # Merge fields into the existing record
+        raise NotImplementedError
+
+    def replace(self, job_id: str, job: Dict):
+        # Overwrite the record (the document text is kept)
+        raise NotImplementedError
+
+    def sweep(self, ttl_seconds: int = JOB_TTL_SECONDS) -> int:
+        # Delete finished or abandoned jobs not touched within ttl_seconds
+        raise NotImplementedError
+
+    # Batches group jobs created by one /batch request; a job joins a batch via its "batch_id" field
+
+    def create_batch(self, batch: Dict):
+        raise NotImplementedError
+
+    def get_batch(self, batch_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def batch_jobs(self, batch_id: str, offset: int = 0, limit: int = 50) -> List[Dict]:
+        # Jobs of a batch in creation order
+        raise NotImplementedError
+
+    def batch_status_counts(self, batch_id: str) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        # Job count, bytes used and eviction counters
+        raise NotImplementedError
+
+    def __contains__(self, job_id: str) -> bool:
+        return self.get(job_id) is not None
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    # Async counterparts for code on the event loop. Backends that block on I/O (SQLite can wait up to
+    # its busy timeout for a lock) run the call in a thread; the in-memory store answers inline.
+    blocking = False
+
+    async def _call(self, method, *args, **kwargs):
+        if self.blocking:
+            return await asyncio.to_thread(method, *args, **kwargs)
+        return method(*args, **kwargs)
+
+    async def acreate(self, job: Dict, text: str):
+        await self._call(self.create, job, text)
+
+    async def aget(self, job_id: str) -> Optional[Dict]:
+        return await self._call(self.get, job_id)
+
+    async def aget_text(self, job_id: str) -> Optional[str]:
+        return await self._call(self.get_text, job_id)
+
+    async def aget_revision(self, job_id: str) -> Optional[Tuple[int, str]]:
+        return await self._call(self.get_revision, job_id)
+
+    async def aupdate(self, job_id: str, **fields):
+        await self._call(self.update, job_id, **fields)
+
+    async def areplace(self, job_id: str, job: Dict):
+        await self._call(self.replace, job_id, job)
+
+    async def acreate_batch(self, batch: Dict):
+        await self._call(self.create_batch, batch)
+
+    async def aget_batch(self, batch_id: str) -> Optional[Dict]:
+        return await self._call(self.get_batch, batch_id)
+
+    async def abatch_jobs(self, batch_id: str, offset: int = 0, limit: int = 50) -> List[Dict]:
+        return await self._call(self.batch_jobs, batch_id, offset, limit)
+
+    async def abatch_status_counts(self, batch_id: str) -> Dict[str, int]:
+        return await self._call(self.batch_status_counts, batch_id)
+
+    async def astats(self) -> Dict:
+        return await self._call(self.stats)
+
+
+class _StoredJob:
+    """One in-memory job: the record as compact JSON bytes and the document text compressed.
+
+    status, revision and batch_id are kept decoded so revalidation, batch counts and eviction
+    never deserialize the record.
+    """
+
+    __slots__ = ("status", "revision", "batch_id", "record", "text", "text_bytes", "updated_at", "size")
+
+    def __init__(self, status: str, revision: int, batch_id: Optional[str], record: bytes,
+                 text: Optional[bytes], text_bytes: int, updated_at: float):
+        self.status = status
+        self.revision = revision
+        self.batch_id = batch_id
+        self.record = record
+        self.text = text
+        self.text_bytes = text_bytes
+        self.updated_at = updated_at
+        self.size = 0
+
+
+class InMemoryJobStore(JobStore):
+    """Single-process job store bounded by JOB_STORE_MAX_BYTES.
+
+    Entries are kept in least-recently-used order; when the accounted size exceeds the ceiling,
+    the least recently used jobs that are not queued, processing or recently uploaded are evicted.
+    """
+
+    def __init__(self, max_bytes: int = JOB_STORE_MAX_BYTES,
+                 text_compression_level: int = JOB_TEXT_COMPRESSION_LEVEL,
+                 upload_pin_seconds: int = JOB_UPLOAD_PIN_SECONDS):
+        self.max_bytes = max_bytes
+        self.upload_pin_seconds = upload_pin_seconds
+        self.text_compression_level = text_compression_level
+        self._entries: "OrderedDict[str, _StoredJob]" = OrderedDict()
+        self._batches: Dict[str, Dict] = {}
+        self._batch_job_ids: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._record_bytes = 0
+        self._text_stored_bytes = 0
+        self._text_bytes = 0
+        self.evictions = {"lru": 0, "ttl": 0}
+
+    def _encode_text(self, text: Optional[str]) -> Tuple[Optional[bytes], int]:
+        if text is None:
+            return None, 0
+        encoded = text.encode("utf-8")
+        if self.text_compression_level > 0:
+            return zlib.compress(encoded, self.text_compression_level), len(encoded)
+        return encoded, len(encoded)
+
+    def _account(self, job_id: str, entry: _StoredJob, sign: int):
+        # sys.getsizeof includes the bytes objects' headers; the constant covers the entry object,
+        # its key and the OrderedDict slot
+        if sign > 0:
+            entry.size = (ENTRY_OVERHEAD_BYTES + sys.getsizeof(job_id) + sys.getsizeof(entry.record)
+                          + (sys.getsizeof(entry.text) if entry.text is not None else 0))
+        self._bytes += sign * entry.size
+        self._record_bytes += sign * len(entry.record)
+        if entry.text is not None:
+            self._text_stored_bytes += sign * len(entry.text)
+            self._text_bytes += sign * entry.text_bytes
+
+    def _store(self, job_id: str, entry: _StoredJob):
+        # Inserts or replaces an entry as the most recently used, then evicts down to the ceiling
+        previous = self._entries.get(job_id)
+        if previous is not None:
+            self._account(job_id, previous, -1)
+        self._entries[job_id] = entry
+        self._entries.move_to_end(job_id)
+        self._account(job_id, entry, 1)
+        if self.max_bytes and self._bytes > self.max_bytes:
+            self._evict_lru(keep=job_id)
+
+    def _evictable(self, entry: _StoredJob, now: float) -> bool:
+        if entry.status in PINNED_STATUSES:
+            return False
+        if entry.status == "uploaded":
+            # A batch member is submitted by the batch feeder later; a plain upload awaits its /analyze call
+            return entry.batch_id not in self._batches and now - entry.updated_at >= self.upload_pin_seconds
+        return True
+
+    def _evict_lru(self, keep: str):
+        excess = self._bytes - self.max_bytes
+        evicted = []
+        now = time.time()
+        for job_id, entry in self._entries.items():
+            if excess <= 0:
+                break
+            if job_id != keep and self._evictable(entry, now):
+                evicted.append(job_id)
+                excess -= entry.size
+        for job_id in evicted:
+            self._remove(job_id)
+        if evicted:
+            self.evictions["lru"] += len(evicted)
+            job_store_evictions_total.inc(len(evicted), reason="lru")
+            logger.info(f"Job store over {self.max_bytes} bytes; evicted {len(evicted)} least recently used jobs.")
+
+    def _remove(self, job_id: str):
+        self._account(job_id, self._entries.pop(job_id), -1)
+
+    def _touch(self, job_id: str) -> Optional[_StoredJob]:
+        with self._lock:
+            entry = self._entries.get(job_id)
+            if entry is not None:
+                self._entries.move_to_end(job_id)
+            return entry
+
+    def create(self, job: Dict, text: str):
+        record = {**job, "revision": 1}
+        encoded, text_bytes = self._encode_text(text)
+        entry = _StoredJob(job["status"], 1, job.get("batch_id"), _dumps(record), encoded, text_bytes, time.time())
+        with self._lock:
+            self._store(job["job_id"], entry)
+            if job.get("batch_id") in self._batch_job_ids:
+                self._batch_job_ids[job["batch_id"]].append(job["job_id"])
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        entry = self._touch(job_id)
+        return _loads(entry.record) if entry is not None else None
+
+    def get_text(self, job_id: str) -> Optional[str]:
+        entry = self._touch(job_id)
+        if entry is None or entry.text is None:
+            return None
+        text = zlib.decompress(entry.text) if self.text_compression_level > 0 else entry.text
+        return text.decode("utf-8")
+
+    def get_revision(self, job_id: str) -> Optional[Tuple[int, str]]:
+        entry = self._touch(job_id)
+        return (entry.revision, entry.status) if entry is not None else None
+
+    def _write(self, job_id: str, fields: Dict, merge: bool):
+        with self._lock:
+            previous = self._entries.get(job_id)
+            if previous is None:
+                if merge:
+                    return
+                text, text_bytes, batch_id, revision = None, 0, fields.get("batch_id"), 1
+            else:
+                text, text_bytes, batch_id, revision = (previous.text, previous.text_bytes, previous.batch_id,
+                                                        previous.revision + 1)
+            record = {**_loads(previous.record), **fields} if merge else dict(fields)
+            record["revision"] = revision
+            entry = _StoredJob(record["status"], revision, batch_id, _dumps(record), text, text_bytes, time.time())
+            self._store(job_id, entry)
+
+    def update(self, job_id: str, **fields):
+        self._write(job_id, fields, merge=True)
+
+    def replace(self, job_id: str, job: Dict):
+        self._write(job_id, job, merge=False)
+
+    def sweep(self, ttl_seconds: int = JOB_TTL_SECONDS) -> int:
+        cutoff = time.time() - ttl_seconds
+        with self._lock:
+            expired = [job_id for job_id, entry in self._entries.items()
+                       if entry.updated_at < cutoff and entry.status not in ACTIVE_STATUSES]
+            for job_id in expired:
+                self._remove(job_id)
+            for batch_id, batch in list(self._batches.items()):
+                if batch["created_at"] < cutoff and not any(job_id in self._entries
+                                                            for job_id in self._batch_job_ids[batch_id]):
+                    del self._batches[batch_id]
+                    del self._batch_job_ids[batch_id]
+            if expired:
+                self.evictions["ttl"] += len(expired)
+                job_store_evictions_total.inc(len(expired), reason="ttl")
+        return len(expired)
+
+    def create_batch(self, batch: Dict):
+        with self._lock:
+            self._batches[batch["batch_id"]] = dict(batch)
+            self._batch_job_ids[batch["batch_id"]] = []
+
+    def get_batch(self, batch_id: str) -> Optional[Dict]:
+        batch = self._batches.get(batch_id)
+        return dict(batch) if batch is not None else None
+
+    def batch_jobs(self, batch_id: str, offset: int = 0, limit: int = 50) -> List[Dict]:
+        with self._lock:
+            job_ids = self._batch_job_ids.get(batch_id, [])[offset:offset + limit]
+            records = [entry.record for entry in map(self._entries.get, job_ids) if entry is not None]
+        return [_loads(record) for record in records]
+
+    def batch_status_counts(self, batch_id: str) -> Dict[str, int]:
+        counts = {}
+        with self._lock:
+            for job_id in self._batch_job_ids.get(batch_id, []):
+                entry = self._entries.get(job_id)
+                if entry is not None:
+                    counts[entry.status] = counts.get(entry.status, 0) + 1
+        return counts
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "jobs": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "record_bytes": self._record_bytes,
+                "text_bytes": self._text_bytes,
+                "text_stored_bytes": self._text_stored_bytes,
+                "text_compression_ratio": round(self._text_bytes / self._text_stored_bytes, 2)
+                if self._text_stored_bytes else None,
+                "evictions": dict(self.evictions)
+            }
+
+    def __contains__(self, job_id: str) -> bool:
+        return job_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SqliteJobStore(JobStore):
+    """SQLite (WAL) job store that can be shared by several processes on one host."""
+
+    blocking = True
+
+    def __init__(self, path: str = JOB_STORE_PATH):
+        self.path = path
+        self.evictions = {"ttl": 0}
+        # One connection per thread; WAL lets readers proceed while a writer commits
+        self._local = threading.local()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " data TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        # Stores created before batches existed lack the batch_id column
+        columns = [column[1] for column in conn.execute("PRAGMA table_info(jobs)")]
+        if "batch_id" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN batch_id TEXT")
+        # ... and the revision column, kept next to the copy in data so conditional reads skip the record
+        if "revision" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_updated ON jobs(status, updated_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_updated ON jobs(updated_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs(batch_id, status)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS batches ("
+            " batch_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        # Document text lives in its own table so result reads never page it in
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " job_id TEXT PRIMARY KEY,"
+            " text TEXT NOT NULL)"
+        )
+        logger.info(f"SQLite job store opened at {path}")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, job: Dict, text: str):
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN")
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, status, data, updated_at, batch_id, revision)"
+                " VALUES (?, ?, ?, ?, ?, 1)",
+                (job["job_id"], job["status"], json.dumps({**job, "revision": 1}), time.time(), job.get("batch_id"))
+            )
+            conn.execute("INSERT OR REPLACE INTO documents (job_id, text) VALUES (?, ?)", (job["job_id"], text))
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        row = self._conn().execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_text(self, job_id: str) -> Optional[str]:
+        row = self._conn().execute("SELECT text FROM documents WHERE job_id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def get_revision(self, job_id: str) -> Optional[Tuple[int, str]]:
+        row = self._conn().execute("SELECT revision, status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return tuple(row) if row else None
+
+    def update(self, job_id: str, **fields):
+        # One json_set path per field merges in place, so a status update is a single indexed UPDATE.
+        # (json_patch would delete fields set to None instead of storing null, unlike the in-memory store.)
+        assignments = "".join(", ?, json(?)" for _ in fields)
+        values = [value for key, field in fields.items() for value in (f'$."{key}"', json.dumps(field))]
+        self._conn().execute(
+            f"UPDATE jobs SET data = json_set(data{assignments}, '$.revision', revision + 1),"
+            " status = COALESCE(?, status), updated_at = ?, revision = revision + 1 WHERE job_id = ?",
+            (*values, fields.get("status"), time.time(), job_id)
+        )
+
+    def replace(self, job_id: str, job: Dict):
+        self._conn().execute(
+            "UPDATE jobs SET data = json_set(?, '$.revision', revision + 1), status = ?, updated_at = ?,"
+            " revision = revision + 1 WHERE job_id = ?",
+            (json.dumps(job), job["status"], time.time(), job_id)
+        )
+
+    def sweep(self, ttl_seconds: int = JOB_TTL_SECONDS) -> int:
+        cutoff = time.time() - ttl_seconds
+        placeholders = ",".join("?" for _ in ACTIVE_STATUSES)
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                f"DELETE FROM documents WHERE job_id IN (SELECT job_id FROM jobs"
+                f" WHERE updated_at < ? AND status NOT IN ({placeholders}))",
+                (cutoff, *ACTIVE_STATUSES)
+            )
+            deleted = conn.execute(
+                f"DELETE FROM jobs WHERE updated_at < ? AND status NOT IN ({placeholders})",
+                (cutoff, *ACTIVE_STATUSES)
+            ).rowcount
+            conn.execute(
+                "DELETE FROM batches WHERE created_at < ?"
+                " AND NOT EXISTS (SELECT 1 FROM jobs WHERE jobs.batch_id = batches.batch_id)",
+                (cutoff,)
+            )
+        if deleted:
+            self.evictions["ttl"] += deleted
+            job_store_evictions_total.inc(deleted, reason="ttl")
+        return deleted
+
+    def create_batch(self, batch: Dict):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO batches (batch_id, data, created_at) VALUES (?, ?, ?)",
+            (batch["batch_id"], json.dumps(batch), batch["created_at"])
+        )
+
+    def get_batch(self, batch_id: str) -> Optional[Dict]:
+        row = self._conn().execute("SELECT data FROM batches WHERE batch_id = ?", (batch_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def batch_jobs(self, batch_id: str, offset: int = 0, limit: int = 50) -> List[Dict]:
+        rows = self._conn().execute(
+            "SELECT data FROM jobs WHERE batch_id = ? ORDER BY rowid LIMIT ? OFFSET ?",
+            (batch_id, limit, offset)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def batch_status_counts(self, batch_id: str) -> Dict[str, int]:
+        rows = self._conn().execute(
+            "SELECT status, COUNT(*) FROM jobs WHERE batch_id = ? GROUP BY status", (batch_id,)
+        ).fetchall()
+        return dict(rows)
+
+    def stats(self) -> Dict:
+        conn = self._conn()
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "jobs": len(self),
+            "bytes": page_count * page_size,
+            "evictions": dict(self.evictions)
+        }
+
+    def __contains__(self, job_id: str) -> bool:
+        return self._conn().execute("SELECT 1 FROM jobs WHERE job_id = ?", (job_id,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+
+def create_job_store(backend: str = JOB_STORE_BACKEND) -> JobStore:
+    if backend == "sqlite":
+        return SqliteJobStore()
+    if backend == "memory":
+        return InMemoryJobStore()
+    raise ValueError(f"Unknown JOB_STORE_BACKEND: {backend}")
+
+
+async def run_ttl_sweeper(store: JobStore, interval_seconds: int = JOB_SWEEP_INTERVAL_SECONDS,
+                          ttl_seconds: int = JOB_TTL_SECONDS):
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            removed = await asyncio.to_thread(store.sweep, ttl_seconds)
+            if removed:
+                logger.info(f"TTL sweeper removed {removed} expired jobs.")
+        except Exception as e:
+            logger.error(f"TTL sweep failed: {str(e)}")
+
+
+job_store = create_job_store()
@@ -0,0 +1,405 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from dotenv import load_dotenv
+from metrics import add_to_agent, llm_request_seconds
+from resilience import (TokenBucket, CircuitBreaker, backoff_delay, parse_duration,
+                        LLM_MAX_RETRIES)
+
+# Configure logging
+import logging
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+# Maximum in-flight requests per provider; extra calls wait for a slot
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "8"))
+# Starting request rate per provider; lowered automatically on 429s and restored on success
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+GROQ_REQUESTS_PER_MINUTE = float(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30"))
+LLM_REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "120"))
+# host:port of a plaintext gRPC server standing in for Gemini (e.g. bench_mock_llm.py); unset in production.
+# Groq's equivalent is the SDK's own GROQ_BASE_URL.
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+
+# A prompt is either plain text or chat messages ({"role": ..., "content": ...})
+Prompt = Union[str, List[Dict]]
+
+
+def record_usage(usage: Optional[Dict], prompt_tokens: int, completion_tokens: int, total_tokens: int):
+    add_to_agent(llm_calls=1, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    if usage is None:
+        return
+    usage["llm_calls"] = usage.get("llm_calls", 0) + 1
+    usage["prompt_tokens"] = usage.get("prompt_tokens", 0) + (prompt_tokens or 0)
+    usage["completion_tokens"] = usage.get("completion_tokens", 0) + (completion_tokens or 0)
+    usage["total_tokens"] = usage.get("total_tokens", 0) + (total_tokens or 0)
+
+
+_provider_loop: Optional[asyncio.AbstractEventLoop] = None
+_provider_loop_lock = threading.Lock()
+
+
+def provider_loop() -> asyncio.AbstractEventLoop:
+    # All provider requests run on one background event loop. Callers arrive from the API loop,
+    # worker loops and the per-agent loops CrewAI creates in its own threads; routing them here
+    # lets every caller share one connection pool and one concurrency limit per provider.
+    global _provider_loop
+    if _provider_loop is None:
+        with _provider_loop_lock:
+            if _provider_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-provider-loop", daemon=True).start()
+                _provider_loop = loop
+    return _provider_loop
+
+
+class LLMProvider:
+    """Async access to one LLM provider through a shared, pooled client.
+
+    Every call passes the provider's circuit breaker and requests-per-minute limiter, then waits
+    for one of max_concurrency slots. Rate-limited (429) and unavailable (5xx, connection)
+    errors are retried with jittered exponential backoff.
+    """
+
+    name = "base"
+
+    def __init__(self, model: str, max_concurrency: int, requests_per_minute: float):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.limiter = TokenBucket(requests_per_minute)
+        self.circuit = CircuitBreaker(f"{self.name}/{model}")
+        self.max_retries = LLM_MAX_RETRIES
+        # Created on the provider loop, which owns the pooled connections
+        self._client = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.in_flight = 0
+        self.waiting = 0
+        self._total_wait = 0.0
+
+    def _create_client(self):
+        raise NotImplementedError
+
+    def _classify(self, error: Exception) -> Tuple[str, Optional[float]]:
+        # Returns ("rate_limited" | "unavailable" | "fatal", retry_after_seconds)
+        code = getattr(error, "status_code", None) or getattr(error, "code", None)
+        if code == 429:
+            return "rate_limited", None
+        if isinstance(error, asyncio.TimeoutError) or code in (500, 502, 503, 504):
+            return "unavailable", None
+        return "fatal", None
+
+    async def _attempt(self, request: Callable):
+        self.waiting += 1
+        started = time.perf_counter()
+        async with self._semaphore:
+            self.waiting -= 1
+            self.in_flight += 1
+            self.calls += 1
+            self._total_wait += time.perf_counter() - started
+            try:
+                return await request(self._client)
+            finally:
+                self.in_flight -= 1
+
+    def _ensure_client(self):
+        # Runs on the provider loop
+        if self._client is None:
+            self._client = self._create_client()
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def warm_up(self):
+        # Creates the pooled client ahead of the first request
+        async def create():
+            self._ensure_client()
+        await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(create(), provider_loop()))
+
+    async def _run(self, request: Callable, call_stats: Dict):
+        self._ensure_client()
+        attempt = 0
+        while True:
+            # The probe slot is only taken after the limiter wait, right before the request, so a probe
+            # cannot be left behind by a call cancelled while it waits
+            self.circuit.check()
+            call_stats["limiter_wait"] += await self.limiter.acquire()
+            probe = self.circuit.before_call()
+            try:
+                result = await self._attempt(request)
+            except Exception as e:
+                kind, retry_after = self._classify(e)
+                if kind == "rate_limited":
+                    self.rate_limited += 1
+                    self.limiter.on_rate_limited(retry_after)
+                    self.circuit.release()
+                elif kind == "unavailable":
+                    self.circuit.record_failure()
+                else:
+                    self.circuit.release()
+                if kind == "fatal" or attempt >= self.max_retries or self.circuit.is_open():
+                    self.failures += 1
+                    raise
+                delay = max(backoff_delay(attempt), retry_after or 0)
+                logger.warning(f"{self.name} call failed ({kind}: {str(e)}); retry {attempt + 1} in {delay:.1f}s")
+                attempt += 1
+                self.retries += 1
+                call_stats["retries"] += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Cancelled (e.g. the job timed out): nothing was learned about the provider
+                if probe:
+                    self.circuit.release()
+                raise
+            self.circuit.record_success()
+            self.limiter.on_success()
+            return result
+
+    async def _call(self, request: Callable, usage: Dict = None):
+        # request(client) is awaited on the provider loop; the caller's loop just waits for the result.
+        # Retries and limiter waits are added to the job's usage whether or not the call succeeds.
+        call_stats = {"retries": 0, "limiter_wait": 0.0}
+        started = time.perf_counter()
+        future = asyncio.run_coroutine_threadsafe(self._run(request, call_stats), provider_loop())
+        try:
+            return await asyncio.wrap_future(future)
+        finally:
+            elapsed = time.perf_counter() - started
+            llm_request_seconds.observe(elapsed, provider=self.name)
+            # Attributed to the agent this call runs under, if any
+            add_to_agent(llm_seconds=elapsed, retries=call_stats["retries"],
+                         rate_limit_wait_seconds=call_stats["limiter_wait"])
+            if usage is not None:
+                usage["retries"] = usage.get("retries", 0) + call_stats["retries"]
+                usage["rate_limit_wait_seconds"] = round(
+                    usage.get("rate_limit_wait_seconds", 0.0) + call_stats["limiter_wait"], 3)
+
+    async def generate(self, prompt: Prompt, temperature: float = None, max_output_tokens: int = None,
+                       json_mode: bool = False, stop: List[str] = None, usage: Dict = None) -> str:
+        raise NotImplementedError
+
+    async def stream(self, prompt: Prompt, on_token: Callable[[str], None], temperature: float = None,
+                     max_output_tokens: int = None, usage: Dict = None) -> str:
+        # Calls on_token with each piece of text as it arrives and returns the full text. Only the Gemini
+        # summarizer streams; crew agents answer through CrewAI's structured output, which arrives whole.
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        return {
+            "model": self.model,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "calls": self.calls,
+            "failures": self.failures,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "avg_slot_wait_seconds": round(self._total_wait / self.calls, 4) if self.calls else 0.0,
+            "rate_limit": self.limiter.stats(),
+            "circuit": self.circuit.stats()
+        }
+
+
+class GeminiProvider(LLMProvider):
+    """Gemini over the SDK's native async (gRPC) client."""
+
+    name = "gemini"
+
+    def __init__(self, model: str = GEMINI_MODEL, max_concurrency: int = GEMINI_MAX_CONCURRENCY,
+                 requests_per_minute: float = GEMINI_REQUESTS_PER_MINUTE):
+        super().__init__(model, max_concurrency, requests_per_minute)
+        # Provider SDKs are imported when the provider is first created, not with this module
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        self._genai = genai
+
+    def _create_client(self):
+        # The model keeps its async client (and gRPC channel) for reuse across calls
+        model = self._genai.GenerativeModel(self.model)
+        if GEMINI_API_ENDPOINT:
+            import google.ai.generativelanguage as glm
+            import grpc
+            from google.ai.generativelanguage_v1beta.services.generative_service.transports import (
+                GenerativeServiceGrpcAsyncIOTransport
+            )
+            transport = GenerativeServiceGrpcAsyncIOTransport(channel=grpc.aio.insecure_channel(GEMINI_API_ENDPOINT))
+            model._async_client = glm.GenerativeServiceAsyncClient(transport=transport)
+        return model
+
+    @staticmethod
+    def _contents(prompt: Prompt):
+        if isinstance(prompt, str):
+            return prompt
+        # System messages have no role of their own here; they are folded into the user turn
+        contents, system = [], []
+        for message in prompt:
+            if message["role"] == "system":
+                system.append(message["content"])
+                continue
+            role = "model" if message["role"] == "assistant" else "user"
+            contents.append({"role": role, "parts": [message["content"]]})
+        if system:
+            if contents and contents[0]["role"] == "user":
+                contents[0]["parts"].insert(0, "\n\n".join(system))
+            else:
+                contents.insert(0, {"role": "user", "parts": ["\n\n".join(system)]})
+        return contents
+
+    @staticmethod
+    def _request_options() -> Dict:
+        # The SDK's own retry (up to 600s on 503s) is off: retries, backoff and the circuit breaker live in _run
+        return {"timeout": LLM_REQUEST_TIMEOUT_SECONDS, "retry": None}
+
+    @staticmethod
+    def _record(usage: Dict, response):
+        metadata = getattr(response, "usage_metadata", None)
+        record_usage(usage, getattr(metadata, "prompt_token_count", 0),
+                     getattr(metadata, "candidates_token_count", 0),
+                     getattr(metadata, "total_token_count", 0))
+
+    def _config(self, temperature, max_output_tokens, json_mode=False, stop=None):
+        return self._genai.types.GenerationConfig(
+            temperature=temperature,
+            max_output_tokens=max_output_tokens,
+            response_mime_type="application/json" if json_mode else None,
+            stop_sequences=stop or None
+        )
+
+    async def generate(self, prompt: Prompt, temperature: float = None, max_output_tokens: int = None,
+                       json_mode: bool = False, stop: List[str] = None, usage: Dict = None) -> str:
+        response = await self._call(lambda model: model.generate_content_async(
+            self._contents(prompt),
+            generation_config=self._config(temperature, max_output_tokens, json_mode, stop),
+            request_options=self._request_options()
+        ), usage)
+        self._record(usage, response)
+        return getattr(response, "text", "") or ""
+
+    async def stream(self, prompt: Prompt, on_token: Callable[[str], None], temperature: float = None,
+                     max_output_tokens: int = None, usage: Dict = None) -> str:
+        async def request(model):
+            response = await model.generate_content_async(
+                self._contents(prompt),
+                generation_config=self._config(temperature, max_output_tokens),
+                request_options=self._request_options(),
+                stream=True
+            )
+            parts = []
+            async for chunk in response:
+                chunk_text = getattr(chunk, "text", None)
+                if chunk_text:
+                    parts.append(chunk_text)
+                    on_token(chunk_text)
+            return response, "".join(parts)
+
+        response, text = await self._call(request, usage)
+        self._record(usage, response)
+        return text
+
+
+class GroqProvider(LLMProvider):
+    """Groq's OpenAI-compatible chat API over a pooled httpx connection pool."""
+
+    name = "groq"
+
+    def __init__(self, model: str = GROQ_MODEL, max_concurrency: int = GROQ_MAX_CONCURRENCY,
+                 requests_per_minute: float = GROQ_REQUESTS_PER_MINUTE):
+        super().__init__(model, max_concurrency, requests_per_minute)
+        self.api_key = os.getenv("GROQ_API_KEY")
+        import groq
+        self._groq = groq
+
+    def _create_client(self):
+        import httpx
+        # Keep one keep-alive connection per concurrency slot
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=self.max_concurrency,
+                                max_keepalive_connections=self.max_concurrency),
+            timeout=LLM_REQUEST_TIMEOUT_SECONDS
+        )
+        # Retries are handled by LLMProvider, not the SDK
+        return self._groq.AsyncGroq(api_key=self.api_key, http_client=http_client, max_retries=0)
+
+    def _classify(self, error: Exception) -> Tuple[str, Optional[float]]:
+        if isinstance(error, self._groq.RateLimitError):
+            return "rate_limited", parse_duration(error.response.headers.get("retry-after"))
+        if isinstance(error, self._groq.APIConnectionError):
+            return "unavailable", None
+        if isinstance(error, self._groq.APIStatusError):
+            return ("unavailable" if error.status_code >= 500 else "fatal"), None
+        return super()._classify(error)
+
+    def _track_headers(self, headers):
+        self.limiter.update_from_headers(headers.get("x-ratelimit-remaining-requests"),
+                                         headers.get("x-ratelimit-reset-requests"))
+
+    @staticmethod
+    def _messages(prompt: Prompt) -> List[Dict]:
+        if isinstance(prompt, str):
+            return [{"role": "user", "content": prompt}]
+        return [{"role": message["role"], "content": message["content"]} for message in prompt]
+
+    @staticmethod
+    def _record(usage: Dict, token_usage):
+        record_usage(usage, getattr(token_usage, "prompt_tokens", 0),
+                     getattr(token_usage, "completion_tokens", 0),
+                     getattr(token_usage, "total_tokens", 0))
+
+    async def generate(self, prompt: Prompt, temperature: float = None, max_output_tokens: int = None,
+                       json_mode: bool = False, stop: List[str] = None, usage: Dict = None) -> str:
+        kwargs = {"model": self.model, "messages": self._messages(prompt)}
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+        if max_output_tokens is not None:
+            kwargs["max_tokens"] = max_output_tokens
+        if json_mode:
+            kwargs["response_format"] = {"type": "json_object"}
+        if stop:
+            # Groq accepts at most four stop sequences
+            kwargs["stop"] = stop[:4]
+        async def request(client):
+            raw = await client.chat.completions.with_raw_response.create(**kwargs)
+            self._track_headers(raw.headers)
+            return await raw.parse()
+
+        response = await self._call(request, usage)
+        self._record(usage, response.usage)
+        return response.choices[0].message.content or ""
+
+
+PROVIDER_CLASSES = {
+    "gemini": GeminiProvider,
+    "groq": GroqProvider,
+}
+
+_providers: Dict[str, LLMProvider] = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(name: str) -> LLMProvider:
+    # One shared instance per provider, created on first use
+    provider = _providers.get(name)
+    if provider is None:
+        if name not in PROVIDER_CLASSES:
+            raise ValueError(f"Unknown LLM provider: {name}")
+        with _providers_lock:
+            provider = _providers.get(name)
+            if provider is None:
+                provider = PROVIDER_CLASSES[name]()
+                _providers[name] = provider
+                logger.info(f"LLM provider {name} initialized (model={provider.model}, "
+                            f"max_concurrency={provider.max_concurrency})")
+    return provider
+
+
+def provider_stats() -> Dict:
+    return {name: provider.stats() for name, provider in _providers.items()}
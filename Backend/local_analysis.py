@@ -0,0 +1,280 @@
+import asyncio
+import os
+import re
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from chunking import needs_chunking
+from models import ANALYSIS_AGENTS
+from selection import centroid_scores, split_sentences
+
+# Configure logging
+import logging
+logger = logging.getLogger(__name__)
+
+# Run the local analyzers before the LLM pipeline and skip agents whose local result is confident enough
+LOCAL_PREPASS = os.getenv("LOCAL_PREPASS", "false").lower() == "true"
+LOCAL_CONFIDENCE_THRESHOLD = float(os.getenv("LOCAL_CONFIDENCE_THRESHOLD", "0.8"))
+# Sentences in the extractive summary produced by the "local" mode
+LOCAL_SUMMARY_SENTENCES = int(os.getenv("LOCAL_SUMMARY_SENTENCES", "3"))
+# Bump when the rules or word lists below change, so cached local results are not reused
+LOCAL_ANALYZER_VERSION = 1
+
+MONTHS = ("January|February|March|April|May|June|July|August|September|October|November|December"
+          "|Jan|Feb|Mar|Apr|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec")
+_DATE_PATTERN = re.compile(
+    r"\b(?:"
+    r"\d{4}-\d{2}-\d{2}"
+    r"|\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}"
+    rf"|(?:{MONTHS})\.?\s+\d{{1,2}}(?:st|nd|rd|th)?,?\s+\d{{4}}"
+    rf"|\d{{1,2}}(?:st|nd|rd|th)?\s+(?:of\s+)?(?:{MONTHS})\.?,?\s+\d{{4}}"
+    rf"|(?:{MONTHS})\.?\s+\d{{4}}"
+    r"|Q[1-4]\s+\d{4}"
+    r"|(?:19|20)\d{2}"
+    r")\b"
+)
+
+# A run of capitalized words (allowing "of", "and", "&" inside), e.g. "Bank of America"
+_NAME = r"[A-Z][\w&'.-]*(?:\s+(?:(?:of|and|for|the|&)\s+)?[A-Z][\w&'.-]*)*"
+ORGANIZATION_SUFFIXES = (
+    "Inc|Inc.|Incorporated|Corp|Corp.|Corporation|Co.|Company|Ltd|Ltd.|Limited|LLC|LLP|PLC|plc|GmbH|AG|SA|S.A.|NV|"
+    "Group|Holdings|Partners|Bank|Capital|Technologies|Systems|Labs|Foundation|Institute|University|College|"
+    "Association|Agency|Ministry|Department|Council|Commission|Authority|Committee|Hospital|School"
+)
+_ORGANIZATION_PATTERN = re.compile(
+    rf"\b(?:{_NAME})\s+(?:{ORGANIZATION_SUFFIXES})(?![\w])"
+    rf"|\b(?:University|Bank|Ministry|Department|Institute|Council) of(?:\s+the)?\s+{_NAME}"
+)
+_PERSON_PATTERN = re.compile(
+    r"\b(?:Mr|Mrs|Ms|Miss|Dr|Prof|Professor|Sir|Dame|President|Senator|Governor|Judge|CEO|Chairman|Chairwoman)\.?"
+    r"\s+([A-Z][a-z]+(?:\s+[A-Z]\.)?(?:\s+[A-Z][a-z'-]+){0,2})"
+)
+_CAPITALIZED_PATTERN = re.compile(r"\b[A-Z][\w&'-]*(?:\s+[A-Z][\w&'-]*)*")
+_WORD_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+ORGANIZATIONS = frozenset("""
+Google Alphabet Microsoft Apple Amazon Meta Facebook Netflix Tesla Nvidia Intel IBM Oracle Samsung Sony
+OpenAI Anthropic DeepMind Twitter LinkedIn Uber Airbnb Spotify Adobe Salesforce Cisco Siemens Toyota
+Volkswagen BMW Boeing Airbus Walmart Pfizer Moderna NASA FBI CIA NATO UNESCO UNICEF WHO IMF OPEC
+""".split()) | {"United Nations", "European Union", "World Bank", "World Health Organization",
+               "Federal Reserve", "European Central Bank", "Goldman Sachs", "Morgan Stanley", "JPMorgan Chase"}
+
+LOCATIONS = frozenset("""
+Afghanistan Albania Algeria Argentina Armenia Australia Austria Bangladesh Belgium Bolivia Brazil Bulgaria
+Cambodia Cameroon Canada Chile China Colombia Croatia Cuba Cyprus Denmark Ecuador Egypt England Estonia
+Ethiopia Finland France Georgia Germany Ghana Greece Hungary Iceland India Indonesia Iran Iraq Ireland
+Israel Italy Jamaica Japan Jordan Kazakhstan Kenya Korea Kuwait Latvia Lebanon Lithuania Luxembourg
+Malaysia Mexico Morocco Nepal Netherlands Nigeria Norway Pakistan Peru Philippines Poland Portugal Qatar
+Romania Russia Scotland Serbia Singapore Slovakia Slovenia Somalia Spain Sweden Switzerland Syria Taiwan
+Tanzania Thailand Tunisia Turkey Uganda Ukraine Uruguay Venezuela Vietnam Wales Yemen Zambia Zimbabwe
+Africa Asia Europe Antarctica Oceania America
+Alabama Alaska Arizona Arkansas California Colorado Connecticut Delaware Florida Hawaii Idaho Illinois
+Indiana Iowa Kansas Kentucky Louisiana Maine Maryland Massachusetts Michigan Minnesota Mississippi Missouri
+Montana Nebraska Nevada Ohio Oklahoma Oregon Pennsylvania Tennessee Texas Utah Vermont Virginia Washington
+Wisconsin Wyoming
+London Paris Berlin Madrid Rome Lisbon Vienna Prague Warsaw Budapest Amsterdam Brussels Dublin Stockholm
+Oslo Copenhagen Helsinki Athens Istanbul Moscow Kyiv Cairo Lagos Nairobi Johannesburg Dubai Riyadh Tehran
+Mumbai Delhi Bangalore Bengaluru Chennai Kolkata Hyderabad Karachi Lahore Dhaka Beijing Shanghai Shenzhen
+Tokyo Osaka Seoul Bangkok Jakarta Manila Sydney Melbourne Toronto Vancouver Montreal Chicago Boston Seattle
+Houston Dallas Atlanta Miami Denver Phoenix Detroit Philadelphia Bogota Lima Santiago Zurich Geneva
+Munich Frankfurt Hamburg Milan Barcelona Edinburgh Manchester
+""".split()) | {"United States", "United Kingdom", "New Zealand", "South Africa", "South Korea", "North Korea",
+               "Saudi Arabia", "Sri Lanka", "Hong Kong", "New York", "Los Angeles", "San Francisco",
+               "Silicon Valley", "Washington D.C.", "New Delhi", "Rio de Janeiro", "Buenos Aires", "Cape Town",
+               "Abu Dhabi", "Las Vegas", "San Diego", "New Jersey", "North America", "South America",
+               "Latin America", "Middle East", "Southeast Asia"}
+_LOCATION_PATTERN = re.compile(
+    r"\b(?:" + "|".join(re.escape(name) for name in sorted(LOCATIONS, key=len, reverse=True)) + r")\b"
+)
+_KNOWN_ORGANIZATION_PATTERN = re.compile(
+    r"\b(?:" + "|".join(re.escape(name) for name in sorted(ORGANIZATIONS, key=len, reverse=True)) + r")\b"
+)
+
+# Capitalized words that are not entities on their own; they never count against entity confidence
+COMMON_CAPITALIZED = frozenset("""
+I The A An This That These Those It Its We Our He She They Their His Her You Your In On At For From By With
+As If But And Or So However Although When While After Before Also Then There Here What Which Who How Why
+Monday Tuesday Wednesday Thursday Friday Saturday Sunday Mr Mrs Ms Dr Prof Page Table Figure Section
+Chapter Introduction Summary Conclusion Abstract Note Overall Today Yesterday Tomorrow OK
+""".split()) | frozenset(MONTHS.split("|"))
+
+# Word valences in [-3, 3]
+SENTIMENT_LEXICON = {
+    **dict.fromkeys("""
+    good great excellent outstanding amazing wonderful fantastic superb brilliant exceptional impressive
+    love loved loves delighted pleased happy glad thrilled excited enjoy enjoyed
+    """.split(), 2.5),
+    **dict.fromkeys("""
+    success successful win wins won strong stronger strongest growth grew gains gained profit profitable
+    improve improved improvement improves record best better benefit benefits beneficial positive
+    effective efficient reliable robust innovative promising optimistic confident progress achieve achieved
+    achievement opportunity opportunities advantage helpful valuable recommend recommended satisfied
+    easy smooth fast stable secure safe praise praised exceed exceeded exceeds boost boosted thrive
+    """.split(), 1.5),
+    **dict.fromkeys("""
+    bad poor terrible awful horrible disappointing disappointed disaster disastrous worst hate hated
+    angry furious unacceptable useless broken fail failed failure failures fraud scandal crisis catastrophic
+    """.split(), -2.5),
+    **dict.fromkeys("""
+    loss losses lost decline declined declining drop dropped fall fell weak weaker weakness risk risks risky
+    problem problems issue issues concern concerns concerned worry worried difficult difficulty negative
+    delay delayed delays slow unstable insecure unsafe error errors bug bugs defect defects complaint
+    complaints criticism criticized lawsuit debt deficit layoffs cut cuts shortage downturn recession
+    damage damaged threat threats uncertain uncertainty volatile pessimistic struggle struggled struggling
+    expensive costly warning warned penalty penalties decrease decreased missed miss unfortunately
+    """.split(), -1.5),
+}
+NEGATIONS = frozenset("not no never none nobody nothing neither nor without hardly barely isn't wasn't "
+                      "aren't weren't don't doesn't didn't can't cannot couldn't won't wouldn't shouldn't".split())
+INTENSIFIERS = frozenset("very extremely highly really incredibly exceptionally remarkably particularly "
+                         "deeply significantly substantially truly".split())
+# Words up to this many positions after a negation have their valence flipped (and damped)
+NEGATION_WINDOW = 3
+NEGATION_FACTOR = -0.75
+INTENSIFIER_FACTOR = 1.3
+# |balance| of positive vs negative valence needed to call a tone positive or negative
+TONE_THRESHOLD = 0.3
+# Sentiment-bearing words needed before confidence approaches 1
+SENTIMENT_EVIDENCE_WORDS = 2
+
+# Vocabulary -> index into _VALENCES; index 0 (unknown word) has valence 0
+_VOCABULARY = {word: index for index, word in enumerate(SENTIMENT_LEXICON, start=1)}
+_VALENCES = np.array([0.0] + list(SENTIMENT_LEXICON.values()))
+
+
+def _spans(pattern: re.Pattern, text: str, group: int = 0) -> List[Tuple[int, int, str]]:
+    return [(match.start(group), match.end(group), match.group(group)) for match in pattern.finditer(text)]
+
+
+def _unique(values) -> List[str]:
+    seen = set()
+    unique = []
+    for value in values:
+        value = " ".join(value.split()).strip(" .,;:")
+        if value and value.casefold() not in seen:
+            seen.add(value.casefold())
+            unique.append(value)
+    return unique
+
+
+def extract_entities_local(text: str) -> Tuple[Dict[str, List[str]], float]:
+    """Rule-based entities in the Entities shape, with the share of capitalized names the rules explain."""
+    dates = _spans(_DATE_PATTERN, text)
+    organizations = _spans(_ORGANIZATION_PATTERN, text) + _spans(_KNOWN_ORGANIZATION_PATTERN, text)
+    locations = _spans(_LOCATION_PATTERN, text)
+    people = _spans(_PERSON_PATTERN, text, group=1)
+    # A location inside an organization name ("Bank of America") belongs to the organization
+    organization_ranges = [(start, end) for start, end, _ in organizations]
+    locations = [span for span in locations
+                 if not any(start <= span[0] and span[1] <= end for start, end in organization_ranges)]
+
+    # Capitalized runs the rules do not account for are possible missed entities
+    covered = np.zeros(len(text) + 1, dtype=bool)
+    for start, end, _ in dates + organizations + locations + people:
+        covered[start:end] = True
+    candidates = explained = 0
+    for start, end, value in _spans(_CAPITALIZED_PATTERN, text):
+        words = [word for word in value.split() if word.strip(".'") not in COMMON_CAPITALIZED]
+        if not words:
+            continue
+        # Skip a lone sentence-initial word: it is capitalized because of its position
+        preceding = text[max(0, start - 2):start].strip()
+        if len(words) == 1 and (start == 0 or preceding.endswith((".", "!", "?", ":")) or text[start - 1] == "\n"):
+            continue
+        candidates += 1
+        if covered[start:end].any():
+            explained += 1
+    confidence = 1.0 if candidates == 0 else explained / candidates
+    entities = {
+        "people": _unique(value for _, _, value in people),
+        "organizations": _unique(value for _, _, value in organizations),
+        "dates": _unique(value for _, _, value in dates),
+        "locations": _unique(value for _, _, value in locations)
+    }
+    return entities, round(confidence, 3)
+
+
+def analyze_sentiment_local(text: str) -> Dict:
+    """Lexicon sentiment in the Sentiment shape, with negation and intensifier handling vectorized over words."""
+    words = _WORD_PATTERN.findall(text.lower())
+    if not words:
+        return {"tone": "neutral", "confidence": 0.0}
+    indices = np.fromiter((_VOCABULARY.get(word, 0) for word in words), dtype=np.int64, count=len(words))
+    valences = _VALENCES[indices]
+    positions = np.arange(len(words))
+    is_negation = np.fromiter((word in NEGATIONS for word in words), dtype=bool, count=len(words))
+    is_intensifier = np.fromiter((word in INTENSIFIERS for word in words), dtype=bool, count=len(words))
+    # Position of the closest preceding negation for every word
+    last_negation = np.maximum.accumulate(np.where(is_negation, positions, -len(words) - NEGATION_WINDOW))
+    previous_negation = np.concatenate(([-len(words) - NEGATION_WINDOW], last_negation[:-1]))
+    valences = np.where(positions - previous_negation <= NEGATION_WINDOW, valences * NEGATION_FACTOR, valences)
+    valences[1:] = np.where(is_intensifier[:-1], valences[1:] * INTENSIFIER_FACTOR, valences[1:])
+
+    positive = valences[valences > 0].sum()
+    negative = -valences[valences < 0].sum()
+    evidence = int(np.count_nonzero(valences))
+    if evidence == 0:
+        return {"tone": "neutral", "confidence": 0.5}
+    balance = (positive - negative) / (positive + negative)
+    coverage = evidence / (evidence + SENTIMENT_EVIDENCE_WORDS)
+    if abs(balance) < TONE_THRESHOLD:
+        # Mixed or weak signals: neutral, but never confident enough to stand in for the LLM
+        return {"tone": "neutral", "confidence": round(0.5 * (1 - abs(balance)), 3)}
+    return {"tone": "positive" if balance > 0 else "negative", "confidence": round(float(abs(balance) * coverage), 3)}
+
+
+def summarize_local(text: str, sentences: int = LOCAL_SUMMARY_SENTENCES) -> str:
+    # Extractive summary: the sentences closest to the document centroid, in document order
+    candidates = split_sentences(text)
+    if len(candidates) <= sentences:
+        return " ".join(" ".join(candidate.split()) for candidate in candidates)
+    scores = centroid_scores(candidates)
+    chosen = sorted(np.argsort(-scores, kind="stable")[:sentences])
+    return " ".join(" ".join(candidates[index].split()) for index in chosen)
+
+
+def _analyze(text: str) -> list:
+    entities, _ = extract_entities_local(text)
+    return [{"summary": summarize_local(text)}, entities, analyze_sentiment_local(text)]
+
+
+async def run_local_analysis(text: str, usage: Dict = None, on_result=None) -> list:
+    # Same contract as the LLM pipelines; makes no network calls
+    if needs_chunking(text):
+        # Long documents take tens of milliseconds; keep them off the event loop
+        results = await asyncio.to_thread(_analyze, text)
+    else:
+        results = _analyze(text)
+    if usage is not None:
+        usage["local_agents"] = list(ANALYSIS_AGENTS)
+    if on_result is not None:
+        for agent, result in zip(ANALYSIS_AGENTS, results):
+            on_result(agent, result)
+    return results
+
+
+def local_prepass(text: str, threshold: float = LOCAL_CONFIDENCE_THRESHOLD, usage: Dict = None) -> Dict[str, Dict]:
+    # Local entities/sentiment results confident enough to replace the LLM agents; keyed by agent
+    entities, entity_confidence = extract_entities_local(text)
+    sentiment = analyze_sentiment_local(text)
+    confident = {}
+    if entity_confidence >= threshold:
+        confident["entities"] = entities
+    if sentiment["confidence"] >= threshold:
+        confident["sentiment"] = sentiment
+    if usage is not None:
+        usage["local_agents"] = list(confident)
+    logger.info(f"Local pre-pass: entity confidence {entity_confidence}, sentiment confidence "
+                f"{sentiment['confidence']}; answered locally: {list(confident) or 'none'}")
+    return confident
+
+
+def analysis_config() -> Dict:
+    # Everything that influences the "local" mode output; used to key the result cache
+    return {"pipeline": "local", "mode": "local", "version": LOCAL_ANALYZER_VERSION,
+            "summary_sentences": LOCAL_SUMMARY_SENTENCES}
+
+
+def prepass_config() -> Dict:
+    return {"version": LOCAL_ANALYZER_VERSION, "threshold": LOCAL_CONFIDENCE_THRESHOLD}
@@ -3,6 +3,12 @@ from fastapi import FastAPI
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
 from routes import router as api_router
+from utils import shutdown_extraction_pool
+from job_store import job_store, run_ttl_sweeper
+from scheduler import analysis_scheduler, ANALYSIS_EXECUTION
+from events import job_events
+from analysis import warm_up_pipeline, PIPELINE_WARM_UP
+import asyncio
 import os
 
 # Configure logging
@@ -31,6 +37,26 @@ app.add_middleware(
 app.include_router(api_router)
 logger.info("API router included.")
 
+
+@app.on_event("startup")
+async def startup():
+    job_events.bind(asyncio.get_running_loop())
+    app.state.ttl_sweeper = asyncio.create_task(run_ttl_sweeper(job_store))
+    logger.info("Job TTL sweeper started.")
+    if ANALYSIS_EXECUTION == "inline":
+        await analysis_scheduler.start()
+        # Runs in the background so /health answers while CrewAI and the provider SDK load
+        if PIPELINE_WARM_UP:
+            app.state.warm_up = asyncio.create_task(warm_up_pipeline())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    app.state.ttl_sweeper.cancel()
+    await analysis_scheduler.stop()
+    shutdown_extraction_pool()
+    logger.info("PDF extraction pool shut down.")
+
 if __name__ == "__main__":
     logger.info("Starting Uvicorn server on port 8000...")
     uvicorn.run(app, port=8000)
@@ -0,0 +1,224 @@
+import bisect
+import contextvars
+import threading
+import time
+from typing import Awaitable, Dict, Optional, Tuple
+
+# Configure logging
+import logging
+logger = logging.getLogger(__name__)
+
+
+class AnalysisMetrics:
+    """Per-mode totals of LLM calls, token usage and latency, for comparing analysis modes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._modes: Dict[str, Dict] = {}
+
+    def record(self, mode: str, latency_seconds: float, usage: Dict):
+        with self._lock:
+            totals = self._modes.setdefault(mode, {
+                "jobs": 0, "fallbacks": 0, "llm_calls": 0, "prompt_tokens": 0,
+                "completion_tokens": 0, "total_tokens": 0, "retries": 0,
+                "rate_limit_wait_seconds": 0.0, "latency_seconds": 0.0, "local_results": 0,
+                "chunks": 0, "chunks_reused": 0, "summary_reduce_fallbacks": 0
+            })
+            totals["jobs"] += 1
+            totals["fallbacks"] += 1 if usage.get("fallback") else 0
+            totals["latency_seconds"] += latency_seconds
+            # Agent results produced by the local analyzers instead of an LLM call
+            totals["local_results"] += len(usage.get("local_agents", ()))
+            for key in ("llm_calls", "prompt_tokens", "completion_tokens", "total_tokens",
+                        "retries", "rate_limit_wait_seconds", "chunks", "chunks_reused", "summary_reduce_fallbacks"):
+                totals[key] += usage.get(key, 0)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            snapshot = {}
+            for mode, totals in self._modes.items():
+                jobs = totals["jobs"]
+                snapshot[mode] = {
+                    **totals,
+                    "latency_seconds": round(totals["latency_seconds"], 3),
+                    "rate_limit_wait_seconds": round(totals["rate_limit_wait_seconds"], 3),
+                    "avg_latency_seconds": round(totals["latency_seconds"] / jobs, 3),
+                    "avg_llm_calls": round(totals["llm_calls"] / jobs, 2),
+                    "avg_total_tokens": round(totals["total_tokens"] / jobs, 1)
+                }
+            return snapshot
+
+
+analysis_metrics = AnalysisMetrics()
+
+
+# Prometheus text exposition format, served by GET /metrics
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Seconds; spans sub-millisecond uploads to multi-minute long-document analyses
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_registry = []
+
+
+def _label_text(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Monotonic Prometheus counter, one series per combination of label values."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, float] = {}
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def lines(self):
+        with self._lock:
+            return [f"{self.name}{_label_text(self.labels, key)} {_number(value)}"
+                    for key, value in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    """Prometheus gauge; set() for values sampled at scrape time, inc()/dec() for live counts."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    """Prometheus histogram with fixed buckets, one series per combination of label values."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._values: Dict[tuple, list] = {}
+        _registry.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def lines(self):
+        lines = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = 'le="+Inf"' if bound == float("inf") else f'le="{_number(bound)}"'
+                    lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {_number(round(total, 6))}")
+                lines.append(f"{self.name}_count{_label_text(self.labels, key)} {cumulative}")
+        return lines
+
+
+def render_prometheus() -> str:
+    output = []
+    for metric in _registry:
+        output.append(f"# HELP {metric.name} {metric.documentation}")
+        output.append(f"# TYPE {metric.name} {metric.kind}")
+        output.extend(metric.lines())
+    return "\n".join(output) + "\n"
+
+
+stage_seconds = Histogram("document_analysis_stage_seconds",
+                          "Time per job stage: upload_read, extraction, queue_wait, local_prepass, analysis, "
+                          "post_processing", ("stage",))
+agent_seconds = Histogram("document_analysis_agent_seconds",
+                          "Wall time of one agent run, including prompt building and output parsing", ("agent",))
+llm_request_seconds = Histogram("document_analysis_llm_request_seconds",
+                                "LLM request latency including rate-limit waits and retries", ("provider",))
+jobs_total = Counter("document_analysis_jobs_total", "Finished analysis jobs", ("mode", "status"))
+llm_calls_total = Counter("document_analysis_llm_calls_total", "LLM calls made by each agent", ("agent",))
+llm_tokens_total = Counter("document_analysis_llm_tokens_total", "LLM tokens used by each agent", ("agent", "kind"))
+llm_retries_total = Counter("document_analysis_llm_retries_total", "Retried LLM calls per agent", ("agent",))
+results_responses_total = Counter("document_analysis_results_responses_total",
+                                  "/results responses: not_modified, memoized body or freshly serialized", ("outcome",))
+jobs_in_flight = Gauge("document_analysis_jobs_in_flight", "Analyses running in this process")
+queue_depth = Gauge("document_analysis_queue_depth", "Jobs waiting in the analysis queue")
+queue_in_progress = Gauge("document_analysis_queue_in_progress", "Jobs being analyzed by any worker")
+job_store_jobs = Gauge("document_analysis_job_store_jobs", "Job records in the job store")
+job_store_bytes = Gauge("document_analysis_job_store_bytes", "Bytes used by the job store (in-memory entries or SQLite file)")
+job_store_evictions_total = Counter("document_analysis_job_store_evictions_total",
+                                    "Jobs removed from the job store by this process: ttl sweep or lru byte ceiling",
+                                    ("reason",))
+llm_requests_in_flight = Gauge("document_analysis_llm_requests_in_flight", "LLM requests holding a provider concurrency slot",
+                               ("provider",))
+
+
+def observe_stage(stage: str, seconds: float):
+    stage_seconds.observe(seconds, stage=stage)
+
+
+# Counters of the agent running in the current task; provider calls add their latency and tokens here
+_current_agent: contextvars.ContextVar[Optional[Dict]] = contextvars.ContextVar("current_agent", default=None)
+AGENT_COUNTERS = ("llm_calls", "llm_seconds", "prompt_tokens", "completion_tokens", "retries",
+                  "rate_limit_wait_seconds")
+
+
+def add_to_agent(**amounts):
+    counters = _current_agent.get()
+    if counters is not None:
+        for key, amount in amounts.items():
+            counters[key] = counters.get(key, 0) + (amount or 0)
+
+
+async def timed_agent(agent: str, usage: Optional[Dict], coroutine: Awaitable):
+    # Awaits one agent run and adds its wall time and LLM counters to usage["stages"][agent].
+    # Chunked documents run each agent once per chunk; the runs accumulate.
+    counters = {}
+    token = _current_agent.set(counters)
+    started = time.perf_counter()
+    try:
+        return await coroutine
+    finally:
+        seconds = time.perf_counter() - started
+        _current_agent.reset(token)
+        agent_seconds.observe(seconds, agent=agent)
+        llm_calls_total.inc(counters.get("llm_calls", 0), agent=agent)
+        llm_retries_total.inc(counters.get("retries", 0), agent=agent)
+        for kind in ("prompt", "completion"):
+            llm_tokens_total.inc(counters.get(f"{kind}_tokens", 0), agent=agent, kind=kind)
+        if usage is not None:
+            stage = usage.setdefault("stages", {}).setdefault(agent, {"runs": 0, "seconds": 0.0})
+            stage["runs"] += 1
+            stage["seconds"] = round(stage["seconds"] + seconds, 4)
+            for key in AGENT_COUNTERS:
+                value = stage.get(key, 0) + counters.get(key, 0)
+                stage[key] = round(value, 4) if isinstance(value, float) else value
@@ -1,7 +1,37 @@
-from pydantic import BaseModel
-from typing import Dict, List, Optional
+from pydantic import BaseModel, Field
+from typing import Dict, List, Literal, Optional
+
+# Result slots every analysis pipeline fills, in this order
+ANALYSIS_AGENTS = ("summary", "entities", "sentiment")
 
 class AnalysisRequest(BaseModel):
     job_id: str
+    # Skip the result cache lookup and force a fresh analysis
+    bypass_cache: bool = False
+    # "multi" runs one agent per analysis; "fused" gets all three from a single structured LLM call;
+    # "local" uses only the rule-based analyzers (no LLM calls, works while providers are down)
+    mode: Literal["multi", "fused", "local"] = "multi"
+    # Queue priority; high-priority jobs are picked up before normal and low ones
+    priority: Literal["high", "normal", "low"] = "normal"
+    # Analyses to run now; the others are computed when /results first asks for them
+    analyses: List[Literal["summary", "entities", "sentiment"]] = Field(default=list(ANALYSIS_AGENTS), min_length=1)
+
+
+# Define Pydantic models for structured output
+class Summary(BaseModel):
+    summary: str
+
+class Entities(BaseModel):
+    people: list[str] = []
+    organizations: list[str] = []
+    dates: list[str] = []
+    locations: list[str] = []
 
+class Sentiment(BaseModel):
+    tone: str = "neutral"
+    confidence: float = 0.0
 
+class AnalysisResults(BaseModel):
+    summary: Summary
+    entities: Entities
+    sentiment: Sentiment
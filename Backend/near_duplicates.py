@@ -0,0 +1,210 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from cache import RESULT_CACHE_TTL_SECONDS
+
+# Configure logging
+import logging
+logger = logging.getLogger(__name__)
+
+NEAR_DUPLICATE_INDEX_PATH = os.getenv("NEAR_DUPLICATE_INDEX_PATH", "cache/near_duplicates.db")
+NEAR_DUPLICATE_DETECTION = os.getenv("NEAR_DUPLICATE_DETECTION", "true").lower() == "true"
+# Estimated Jaccard similarity at which an upload is reported as a near-duplicate
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8"))
+# Reuse a near-duplicate's results instead of analyzing (off unless enabled), and the similarity required
+NEAR_DUPLICATE_REUSE = os.getenv("NEAR_DUPLICATE_REUSE", "false").lower() == "true"
+NEAR_DUPLICATE_REUSE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_REUSE_THRESHOLD", "0.95"))
+# MinHash signature length and LSH banding (permutations must be divisible by bands). With 128
+# permutations in 16 bands of 8 rows, pairs above ~0.7 similarity almost always share a bucket.
+MINHASH_PERMUTATIONS = int(os.getenv("MINHASH_PERMUTATIONS", "128"))
+LSH_BANDS = int(os.getenv("LSH_BANDS", "16"))
+SHINGLE_WORDS = 5
+# Candidates (those sharing the most bands) compared per lookup, however large the index grows
+MAX_CANDIDATES = 50
+SWEEP_EVERY_ADDS = 1000
+
+# Smallest prime above 2**32: hash values and coefficients stay below 2**32, so a * x + b fits in uint64
+_PRIME = np.uint64(4294967311)
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def _permutations(count: int):
+    # Fixed seed: every process must hash with the same permutations
+    rng = np.random.default_rng(1234567)
+    a = rng.integers(1, 2 ** 32, size=count, dtype=np.uint64)
+    b = rng.integers(0, 2 ** 32, size=count, dtype=np.uint64)
+    return a, b
+
+
+_PERM_A, _PERM_B = _permutations(MINHASH_PERMUTATIONS)
+
+
+def shingle_hashes(text: str, shingle_words: int = SHINGLE_WORDS) -> np.ndarray:
+    # 32-bit hashes of overlapping word n-grams; case and punctuation are ignored
+    words = _WORD_PATTERN.findall(text.lower())
+    if not words:
+        return np.zeros(0, dtype=np.uint64)
+    word_hashes = np.fromiter((zlib.crc32(word.encode("utf-8")) for word in words), dtype=np.uint64, count=len(words))
+    if len(words) < shingle_words:
+        shingle_words = len(words)
+    count = len(words) - shingle_words + 1
+    # Polynomial rolling combination of the word hashes, vectorized over all shingles
+    hashes = np.zeros(count, dtype=np.uint64)
+    for offset in range(shingle_words):
+        hashes = (hashes * np.uint64(1000003) + word_hashes[offset:offset + count]) & np.uint64(0xFFFFFFFF)
+    return np.unique(hashes)
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    hashes = shingle_hashes(text)
+    if len(hashes) == 0:
+        return np.full(MINHASH_PERMUTATIONS, int(_PRIME), dtype=np.uint64)
+    signature = np.empty(MINHASH_PERMUTATIONS, dtype=np.uint64)
+    # Process shingles in blocks so a long document never materializes a permutations x shingles matrix at once
+    signature.fill(np.iinfo(np.uint64).max)
+    for start in range(0, len(hashes), 8192):
+        block = hashes[start:start + 8192]
+        permuted = (np.outer(_PERM_A, block) + _PERM_B[:, None]) % _PRIME
+        np.minimum(signature, permuted.min(axis=1), out=signature)
+    return signature
+
+
+def band_buckets(signature: np.ndarray, bands: int = LSH_BANDS) -> List[int]:
+    # One signed 64-bit bucket id per band; the band number is part of the hash so bands never collide
+    rows = len(signature) // bands
+    buckets = []
+    for band in range(bands):
+        digest = hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(), digest_size=8,
+                                 person=band.to_bytes(2, "little")).digest()
+        buckets.append(int.from_bytes(digest, "little", signed=True))
+    return buckets
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    # Share of equal MinHash values estimates the Jaccard similarity of the shingle sets
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+class NearDuplicateIndex:
+    """MinHash LSH index over the text of analyzed documents, stored in SQLite.
+
+    Each entry points at the result cache key of its analysis, so a near-duplicate can reuse
+    that result while it is still cached. Lookups touch only rows sharing an LSH bucket.
+    """
+
+    def __init__(self, path: str = NEAR_DUPLICATE_INDEX_PATH, ttl_seconds: int = RESULT_CACHE_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.lookups = 0
+        self.matches = 0
+        self._adds = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " id INTEGER PRIMARY KEY,"
+            " cache_key TEXT NOT NULL UNIQUE,"
+            " config_key TEXT NOT NULL,"
+            " job_id TEXT,"
+            " document_name TEXT,"
+            " signature BLOB NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_created ON documents(created_at)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            " bucket INTEGER NOT NULL,"
+            " document_id INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_buckets_bucket ON buckets(bucket)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_buckets_document ON buckets(document_id)")
+        self._conn.commit()
+        logger.info(f"Near-duplicate index opened at {path}")
+
+    def add(self, signature: np.ndarray, cache_key: str, config_key: str, job_id: str = None,
+            document_name: str = None):
+        now = time.time()
+        with self._lock:
+            existing = self._conn.execute("SELECT id FROM documents WHERE cache_key = ?", (cache_key,)).fetchone()
+            if existing is not None:
+                self._conn.execute("DELETE FROM buckets WHERE document_id = ?", (existing[0],))
+                self._conn.execute("DELETE FROM documents WHERE id = ?", (existing[0],))
+            document_id = self._conn.execute(
+                "INSERT INTO documents (cache_key, config_key, job_id, document_name, signature, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (cache_key, config_key, job_id, document_name, signature.tobytes(), now)
+            ).lastrowid
+            self._conn.executemany(
+                "INSERT INTO buckets (bucket, document_id) VALUES (?, ?)",
+                [(bucket, document_id) for bucket in band_buckets(signature)]
+            )
+            self._adds += 1
+            if self._adds % SWEEP_EVERY_ADDS == 0:
+                self._sweep(now)
+            self._conn.commit()
+
+    def _sweep(self, now: float):
+        cutoff = now - self.ttl_seconds
+        self._conn.execute(
+            "DELETE FROM buckets WHERE document_id IN (SELECT id FROM documents WHERE created_at < ?)", (cutoff,)
+        )
+        removed = self._conn.execute("DELETE FROM documents WHERE created_at < ?", (cutoff,)).rowcount
+        if removed:
+            logger.info(f"Near-duplicate index dropped {removed} expired entries.")
+
+    def find(self, signature: np.ndarray, threshold: float = NEAR_DUPLICATE_THRESHOLD,
+             config_key: Optional[str] = None) -> Optional[Dict]:
+        # Most similar indexed document at or above threshold, optionally limited to one pipeline config
+        buckets = band_buckets(signature)
+        placeholders = ",".join("?" for _ in buckets)
+        query = (
+            "SELECT d.cache_key, d.job_id, d.document_name, d.signature FROM documents d"
+            f" JOIN (SELECT document_id, COUNT(*) AS shared FROM buckets WHERE bucket IN ({placeholders})"
+            "       GROUP BY document_id ORDER BY shared DESC LIMIT ?) c ON c.document_id = d.id"
+            " WHERE d.created_at >= ?"
+        )
+        params = [*buckets, MAX_CANDIDATES, time.time() - self.ttl_seconds]
+        if config_key is not None:
+            query += " AND d.config_key = ?"
+            params.append(config_key)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+            self.lookups += 1
+        best = None
+        for cache_key, job_id, document_name, blob in rows:
+            score = similarity(signature, np.frombuffer(blob, dtype=np.uint64))
+            if score >= threshold and (best is None or score > best["similarity"]):
+                best = {"cache_key": cache_key, "job_id": job_id, "document_name": document_name,
+                        "similarity": round(score, 3)}
+        if best is not None:
+            with self._lock:
+                self.matches += 1
+        return best
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        return {
+            "entries": entries,
+            "lookups": self.lookups,
+            "matches": self.matches,
+            "threshold": NEAR_DUPLICATE_THRESHOLD,
+            "reuse": NEAR_DUPLICATE_REUSE,
+            "reuse_threshold": NEAR_DUPLICATE_REUSE_THRESHOLD,
+            "permutations": MINHASH_PERMUTATIONS,
+            "bands": LSH_BANDS
+        }
+
+
+near_duplicate_index = NearDuplicateIndex()
@@ -0,0 +1,103 @@
+import hashlib
+import json
+from typing import Dict
+
+from models import Summary, Entities, Sentiment, AnalysisResults, ANALYSIS_AGENTS
+from llm_providers import GEMINI_MODEL, GROQ_MODEL
+
+# Prompts and LLM settings of both pipelines. Kept apart from agents.py and creaw_code.py so the
+# cache configuration can be computed without importing a pipeline (CrewAI, provider SDKs).
+
+# Gemini agent prompts; {document} is the agent's budgeted selection of the text
+SUMMARY_PROMPT = """Create a concise summary of the following document in maximum 150 words. \nFocus on key points and main ideas.\n\nDocument:\n{document}"""
+ENTITY_PROMPT = """Extract the following entities from the text:\n- People (names of individuals)\n- Organizations (companies, institutions)\n- Dates (specific dates mentioned)\n- Locations (cities, countries, places)\n\nReturn ONLY a JSON object with these exact keys: people, organizations, dates, locations. \nEach value should be a list of strings. If no entities found for a category, return an empty list.\n\nDocument:\n{document}\n\nResponse (JSON only):"""
+SENTIMENT_PROMPT = """Analyze the sentiment/tone of the following document and determine if it's positive, negative, or neutral. \nAlso provide a confidence score between 0 and 1.\n\nReturn ONLY a JSON object with these exact keys:\n- tone: one of \"positive\", \"negative\", or \"neutral\"\n- confidence: a float between 0 and 1\n\nDocument:\n{document}\n\nResponse (JSON only):"""
+FUSED_PROMPT = """Analyze the following document and return ONLY a JSON object with exactly these keys:\n- summary: an object with key "summary" holding a concise summary in maximum 150 words\n- entities: an object with keys people, organizations, dates, locations; each value a list of strings\n- sentiment: an object with keys tone (one of \"positive\", \"negative\", \"neutral\") and confidence (a float between 0 and 1)\n\nDocument:\n{document}\n\nResponse (JSON only):"""
+
+# Agent -> (prompt, generation settings passed to the provider)
+GEMINI_AGENTS = {
+    "summary": (SUMMARY_PROMPT, {"temperature": 0.3, "max_output_tokens": 2000}),
+    "entities": (ENTITY_PROMPT, {"temperature": 0.1}),
+    "sentiment": (SENTIMENT_PROMPT, {"temperature": 0.1}),
+    "fused": (FUSED_PROMPT, {"temperature": 0.1, "json_mode": True})
+}
+
+CREW_MODEL = f"groq/{GROQ_MODEL}"
+CREW_TEMPERATURE = 0.7
+
+# Crew task prompts; CrewAI fills in {text} at kickoff
+SUMMARY_TASK_PROMPT = 'Summarize the following document:\n\n{text}'
+ENTITY_TASK_PROMPT = 'Extract all entities (people, organizations, dates, locations) from the following document and return a JSON object with keys: people, organizations, dates, locations.\n\n{text}'
+SENTIMENT_TASK_PROMPT = 'Analyze the sentiment of the following document and return a JSON object with keys: tone and confidence.\n\n{text}'
+FUSED_TASK_PROMPT = 'Analyze the following document and return a single JSON object with exactly these keys:\n- summary: an object with key summary holding a concise summary of the document\n- entities: an object with keys people, organizations, dates, locations, each a list of strings\n- sentiment: an object with keys tone (one of "positive", "negative", "neutral") and confidence (a float between 0 and 1)\n\n{text}'
+
+AGENT_CONFIGS = {
+    "summarizer": {
+        "role": 'Summarizer',
+        "goal": 'Summarize the given document text and return only the summary as a string.',
+        "backstory": 'Expert at condensing information into concise summaries.'
+    },
+    "entity_extractor": {
+        "role": 'Entity Extractor',
+        "goal": 'Extract entities (people, organizations, dates, locations) from the document text and return a JSON object with keys: people, organizations, dates, locations.',
+        "backstory": 'Skilled at identifying and categorizing entities in text.'
+    },
+    "sentiment_analyzer": {
+        "role": 'Sentiment Analyzer',
+        "goal": 'Analyze the sentiment of the document text and return a JSON object with keys: tone and confidence.',
+        "backstory": 'Specialist in detecting tone and sentiment in written content.'
+    },
+    "document_analyst": {
+        "role": 'Document Analyst',
+        "goal": 'Summarize the document, extract its entities and assess its sentiment in a single structured JSON response.',
+        "backstory": 'Generalist analyst who produces complete structured document reports in one pass.'
+    }
+}
+
+# Template -> (agent config, task prompt, expected output, output model)
+CREW_TEMPLATES = {
+    "summary": ("summarizer", SUMMARY_TASK_PROMPT, "A concise summary of the document.", Summary),
+    "entities": ("entity_extractor", ENTITY_TASK_PROMPT, "A JSON object of entities found in the document.", Entities),
+    "sentiment": ("sentiment_analyzer", SENTIMENT_TASK_PROMPT,
+                  "A JSON object with the overall sentiment and tone of the document.", Sentiment),
+    "fused": ("document_analyst", FUSED_TASK_PROMPT,
+              "A JSON object with summary, entities and sentiment of the document.", AnalysisResults)
+}
+
+
+def _digest(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _agents_for(mode: str) -> tuple:
+    # Fused runs fall back to the separate agents, so their prompts can shape a fused result too
+    return ("fused", *ANALYSIS_AGENTS) if mode == "fused" else ANALYSIS_AGENTS
+
+
+def analysis_config(pipeline: str, mode: str = "multi") -> Dict:
+    # Everything that influences a pipeline's output, used to key the result cache. The prompts,
+    # expected outputs, agent settings and output schemas are hashed, so editing any of them
+    # invalidates earlier results without a manual version bump.
+    agents = _agents_for(mode)
+    if pipeline == "gemini":
+        return {
+            "pipeline": "gemini",
+            "mode": mode,
+            "model": GEMINI_MODEL,
+            "llm": {name: GEMINI_AGENTS[name][1] for name in agents},
+            "prompts": _digest({name: GEMINI_AGENTS[name][0] for name in agents})
+        }
+    if pipeline == "crew":
+        tasks = {}
+        for name in agents:
+            agent_config, prompt, expected_output, output_model = CREW_TEMPLATES[name]
+            tasks[name] = {"agent": AGENT_CONFIGS[agent_config], "prompt": prompt,
+                           "expected_output": expected_output, "output_schema": output_model.model_json_schema()}
+        return {
+            "pipeline": "crew",
+            "mode": mode,
+            "model": CREW_MODEL,
+            "llm": {"temperature": CREW_TEMPERATURE},
+            "prompts": _digest(tasks)
+        }
+    raise ValueError(f"Unknown analysis pipeline: {pipeline}")
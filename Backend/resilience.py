@@ -0,0 +1,186 @@
+import asyncio
+import os
+import random
+import re
+import time
+from typing import Dict, Optional
+
+# Configure logging
+import logging
+logger = logging.getLogger(__name__)
+
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_RETRY_BASE_DELAY_SECONDS = float(os.getenv("LLM_RETRY_BASE_DELAY_SECONDS", "1.0"))
+LLM_RETRY_MAX_DELAY_SECONDS = float(os.getenv("LLM_RETRY_MAX_DELAY_SECONDS", "30"))
+# Consecutive provider failures that open the circuit, and how long it stays open
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+# After a 429 the rate is multiplied by this factor; each success adds back a share of the configured rate
+RATE_DECREASE_FACTOR = 0.5
+RATE_RECOVERY_STEP = 0.05
+MIN_RATE_FRACTION = 0.1
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, provider: str, retry_after_seconds: float):
+        super().__init__(f"{provider} circuit is open; failing fast")
+        self.retry_after_seconds = retry_after_seconds
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    # Accepts plain seconds ("1.5") or Groq-style durations ("2m59.56s", "120ms")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total = 0.0
+    matched = False
+    for amount, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value):
+        matched = True
+        total += float(amount) * {"h": 3600, "m": 60, "s": 1, "ms": 0.001}[unit]
+    return total if matched else None
+
+
+class TokenBucket:
+    """Requests-per-minute limiter that backs off on 429s and recovers gradually on success.
+
+    A rate of 0 (or less) means unlimited: only Retry-After / reset pauses hold requests back.
+    Not thread-safe: used only from the provider event loop.
+    """
+
+    def __init__(self, requests_per_minute: float):
+        self.configured_rate = max(0.0, requests_per_minute) / 60.0
+        self.rate = self.configured_rate
+        self.capacity = max(1.0, self.configured_rate)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        # Nothing is admitted before this time (set from Retry-After / reset headers)
+        self._paused_until = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> float:
+        # Waits for a token and returns the time spent waiting
+        started = time.monotonic()
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            if not self.configured_rate:
+                return time.monotonic() - started
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return time.monotonic() - started
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def on_rate_limited(self, retry_after: Optional[float]):
+        self.rate = max(self.configured_rate * MIN_RATE_FRACTION, self.rate * RATE_DECREASE_FACTOR)
+        self.tokens = 0
+        if retry_after:
+            self.pause(retry_after)
+
+    def on_success(self):
+        self.rate = min(self.configured_rate, self.rate + self.configured_rate * RATE_RECOVERY_STEP)
+
+    def update_from_headers(self, remaining: Optional[str], reset: Optional[str]):
+        # Provider says the window is used up: hold new requests until it resets
+        if remaining is not None and remaining.isdigit() and int(remaining) == 0:
+            reset_seconds = parse_duration(reset)
+            if reset_seconds:
+                self.pause(reset_seconds)
+
+    def stats(self) -> Dict:
+        return {
+            "configured_rpm": round(self.configured_rate * 60, 2),
+            "current_rpm": round(self.rate * 60, 2),
+            "paused_seconds": round(max(0.0, self._paused_until - time.monotonic()), 2)
+        }
+
+
+class CircuitBreaker:
+    """Opens after consecutive provider failures; after reset_seconds lets one probe call through."""
+
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_seconds: float = CIRCUIT_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._probe_in_flight = False
+
+    def retry_after_seconds(self) -> float:
+        return max(0.0, self.opened_at + self.reset_seconds - time.monotonic())
+
+    def is_open(self) -> bool:
+        return self.state == "open" and self.retry_after_seconds() > 0
+
+    def check(self):
+        # Fails fast while open, without taking the half-open probe slot
+        if self.is_open():
+            self.rejected += 1
+            raise CircuitOpenError(self.name, self.retry_after_seconds())
+
+    def before_call(self) -> bool:
+        # Returns True when this call is the half-open probe; its outcome must be recorded or released
+        if self.state == "open":
+            if self.retry_after_seconds() > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, self.retry_after_seconds())
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probe_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, self.reset_seconds)
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        if self.state != "closed":
+            logger.info(f"Circuit for {self.name} closed again.")
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self._probe_in_flight = False
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+                logger.warning(f"Circuit for {self.name} opened after {self.consecutive_failures} failures.")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        # A call that ended without telling us anything about provider health (e.g. a 400)
+        self._probe_in_flight = False
+
+    def stats(self) -> Dict:
+        return {
+            "state": "open" if self.is_open() else ("half_open" if self.state != "closed" else "closed"),
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected
+        }
+
+
+def backoff_delay(attempt: int, base: float = LLM_RETRY_BASE_DELAY_SECONDS,
+                  cap: float = LLM_RETRY_MAX_DELAY_SECONDS) -> float:
+    # Exponential backoff with full jitter, so retrying callers do not synchronize
+    return random.uniform(0, min(cap, base * 2 ** attempt))
@@ -1,152 +1,696 @@
 import asyncio
-from fastapi import APIRouter, File, UploadFile, BackgroundTasks, HTTPException
-from fastapi.responses import JSONResponse
+import io
+import json
+import math
+import zipfile
+from typing import List, Optional
+from fastapi import APIRouter, Query, Request, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from datetime import datetime
 import uuid
 import time
-from models import AnalysisRequest
-from utils import extract_text_from_pdf
-from agents import summarizer_agent, entity_extractor_agent, sentiment_analyzer_agent
-from creaw_code import agents_and_run_crew
+import os
+from models import AnalysisRequest, ANALYSIS_AGENTS
+from utils import extract_text_from_pdf_async, extract_text_from_txt
+from uploads import (receive_upload, receive_form, spool_stream, SpooledUpload, UploadTooLargeError,
+                     UnsupportedFileTypeError, UPLOAD_SIZE_LIMIT)
+from analysis import (run_multi_agent_analysis, run_on_demand, missing_analyses, cache_config, pipeline_provider, crew_pool_stats,
+                      CARRIED_FIELDS)
+from cache import result_cache, make_cache_key, config_fingerprint
+from metrics import (analysis_metrics, observe_stage, render_prometheus, PROMETHEUS_CONTENT_TYPE, queue_depth,
+                     queue_in_progress, job_store_jobs, job_store_bytes, llm_requests_in_flight, results_responses_total)
+from job_store import job_store, JOB_STORE_BACKEND, JOB_TTL_SECONDS
+from http_cache import dumps, encode_body, job_etag, etag_matches, accepts_gzip, serialized_results
+from scheduler import analysis_scheduler, QueueFullError, ANALYSIS_EXECUTION, ANALYSIS_WORKERS, PRIORITIES
+from job_queue import SqliteJobQueue
+from chunking import needs_chunking
+from events import job_events, TERMINAL_STATUSES
+from llm_providers import get_provider, provider_stats
+from resilience import CircuitOpenError
+from near_duplicates import (near_duplicate_index, minhash_signature, NEAR_DUPLICATE_DETECTION, NEAR_DUPLICATE_REUSE,
+                             NEAR_DUPLICATE_THRESHOLD, NEAR_DUPLICATE_REUSE_THRESHOLD)
 
 # Configure logging
 import logging
 logger = logging.getLogger(__name__)
 
-# In-memory storage for job tracking
-jobs_store = {}
+# Upper bound on extracted characters kept per document (0 = keep everything).
+# Extraction stops reading pages once this budget is full.
+ANALYSIS_CHAR_BUDGET = int(os.getenv("ANALYSIS_CHAR_BUDGET", "0")) or None
+
+# Batch limits: documents per request, documents extracted at once, and analyses a single
+# batch may have queued or running at once (so one batch cannot monopolize the LLM provider)
+BATCH_MAX_DOCUMENTS = int(os.getenv("BATCH_MAX_DOCUMENTS", "100"))
+BATCH_EXTRACTION_CONCURRENCY = int(os.getenv("BATCH_EXTRACTION_CONCURRENCY", "4"))
+# Whole /batch request body limit, enforced while it streams in; each document is also held to UPLOAD_MAX_MB
+BATCH_UPLOAD_LIMIT = int(os.getenv("BATCH_UPLOAD_MAX_MB", "1024")) * 1024 * 1024
+BATCH_MAX_IN_FLIGHT = int(os.getenv("BATCH_MAX_IN_FLIGHT", str(ANALYSIS_WORKERS)))
+BATCH_POLL_INTERVAL_SECONDS = 1.0
+BATCH_PAGE_LIMIT = 100
+
+# Result streams re-check the job store at this interval (status changes made by worker
+# processes are not published in this process) and send a keep-alive comment when idle
+STREAM_POLL_INTERVAL_SECONDS = float(os.getenv("STREAM_POLL_INTERVAL_SECONDS", "1.0"))
+STREAM_KEEPALIVE_SECONDS = 15
+
+# Final, fully analyzed results never change, so browsers and proxies may keep them until the job expires
+IMMUTABLE_CACHE_CONTROL = f"public, max-age={JOB_TTL_SECONDS}, immutable"
+
+if ANALYSIS_EXECUTION == "worker":
+    if JOB_STORE_BACKEND != "sqlite":
+        raise ValueError("ANALYSIS_EXECUTION=worker requires JOB_STORE_BACKEND=sqlite")
+    # Analyses run in separate worker.py processes; this process only enqueues
+    analysis_queue = SqliteJobQueue()
+else:
+    analysis_queue = analysis_scheduler
 
 router = APIRouter()
 
-@router.post("/upload")
-async def upload_document(file: UploadFile = File(...)):
-    if not file.filename.endswith((".pdf", ".txt")):
-        logger.warning(f"Upload failed: unsupported file type {file.filename}")
-        raise HTTPException(status_code=400, detail="Only PDF and TXT files are supported")
-    # Check file size (limit: 5MB)
-    file_size_limit = 5 * 1024 * 1024  # 5MB in bytes
-    if file.size is not None and file.size > file_size_limit:
-        logger.warning(f"Upload failed: file {file.filename} exceeds 5MB size limit.")
-        raise HTTPException(status_code=400, detail="File size exceeds 5MB limit")
+# Running batch feeder tasks; referenced here so they are not garbage collected mid-batch
+_batch_feeders = set()
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt")
+# Documented request body of /upload, which parses the multipart stream itself
+UPLOAD_REQUEST_BODY = {
+    "required": True,
+    "content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "required": ["file"],
+        "properties": {"file": {"type": "string", "format": "binary"}}
+    }}}
+}
+
+
+BATCH_REQUEST_BODY = {
+    "required": True,
+    "content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "required": ["files"],
+        "properties": {
+            "files": {"type": "array", "items": {"type": "string", "format": "binary"}},
+            "mode": {"type": "string", "default": "multi"},
+            "priority": {"type": "string", "default": "low"},
+            "bypass_cache": {"type": "boolean", "default": False}
+        }
+    }}}
+}
+
+
+def _upload_timings(upload_read: float, extraction: float) -> dict:
+    observe_stage("upload_read", upload_read)
+    observe_stage("extraction", extraction)
+    return {"upload_read_seconds": round(upload_read, 4), "extraction_seconds": round(extraction, 4)}
+
+
+async def _extract_document_text(upload: SpooledUpload) -> str:
+    if upload.filename.endswith('.pdf'):
+        text = await extract_text_from_pdf_async(upload.source, max_chars=ANALYSIS_CHAR_BUDGET)
+    else:
+        text = await asyncio.to_thread(extract_text_from_txt, upload.source, ANALYSIS_CHAR_BUDGET)
+    if not text or len(text.strip()) < 10:
+        raise ValueError("Document appears to be empty or too short")
+    return text
+
+
+def _find_near_duplicate(text: str, threshold: float, config: dict = None):
+    signature = minhash_signature(text)
+    return near_duplicate_index.find(signature, threshold, config_fingerprint(config) if config is not None else None)
+
+
+async def _complete_from_cache(job_id: str, job: dict, results: dict, **fields):
+    completed = {
+        "job_id": job_id,
+        "status": "completed",
+        "document_name": job.get("document_name"),
+        "results": results,
+        "agents": {agent: {"status": "completed"} for agent in ANALYSIS_AGENTS},
+        "cached": True,
+        "processing_time_seconds": 0.0,
+        **fields
+    }
+    for key in CARRIED_FIELDS:
+        if job.get(key):
+            completed[key] = job[key]
+    if job.get("timings"):
+        completed["timings"] = job["timings"]
+    await job_store.areplace(job_id, completed)
+
+
+async def _start_analysis(job_id: str, job: dict, text: str, mode: str, priority: str, bypass_cache: bool,
+                          analyses=ANALYSIS_AGENTS) -> str:
+    # Serves the job from the result cache (or a near-duplicate's cached result) or queues it; returns the new
+    # job status. Raises QueueFullError when the queue has no room and CircuitOpenError while the provider is down.
+    document_name = job.get("document_name")
+    config = cache_config(text, mode)
+    cache_key = make_cache_key(text, config)
+    if not bypass_cache:
+        cached = await result_cache.aget(cache_key)
+        if cached is not None:
+            await _complete_from_cache(job_id, job, cached)
+            logger.info(f"Cache hit for job_id {job_id}")
+            return "completed"
+        if NEAR_DUPLICATE_REUSE and not job.get("previous_job_id"):
+            # A document this similar, analyzed with the same configuration, gets the same result
+            match = await asyncio.to_thread(_find_near_duplicate, text, NEAR_DUPLICATE_REUSE_THRESHOLD, config)
+            cached = await result_cache.aget(match["cache_key"]) if match else None
+            if cached is not None:
+                await _complete_from_cache(job_id, job, cached, near_duplicate_of={
+                    "job_id": match["job_id"],
+                    "document_name": match["document_name"],
+                    "similarity": match["similarity"]
+                })
+                logger.info(f"Near-duplicate hit for job_id {job_id} (similarity {match['similarity']})")
+                return "completed"
+    # Shed load while the provider's circuit is open instead of queueing work that would fail;
+    # the local mode makes no LLM calls and keeps working. In worker mode the provider lives in the workers.
+    if mode != "local" and ANALYSIS_EXECUTION != "worker":
+        circuit = get_provider(pipeline_provider()).circuit
+        if circuit.is_open():
+            raise CircuitOpenError(circuit.name, circuit.retry_after_seconds())
+    # Mark the job queued first so a fast worker never sees it in its previous state
+    await job_store.aupdate(job_id, status="queued", queued_at=time.time(), priority=priority)
     try:
-        content = await file.read()
-        if len(content) > file_size_limit:
-            logger.warning(f"Upload failed: file {file.filename} exceeds 5MB size limit (checked after read).")
-            raise HTTPException(status_code=400, detail="File size exceeds 5MB limit")
-        if file.filename.endswith('.pdf'):
-            text = extract_text_from_pdf(content)
+        if ANALYSIS_EXECUTION == "worker":
+            analysis_queue.enqueue(job_id, {"cache_key": cache_key, "mode": mode, "reuse_chunks": not bypass_cache,
+                                            "analyses": list(analyses)}, priority)
         else:
-            text = content.decode('utf-8')
-        if not text or len(text.strip()) < 10:
-            logger.warning(f"Upload failed: file {file.filename} is empty or too short.")
-            raise HTTPException(status_code=400, detail="Document appears to be empty or too short")
+            analysis_scheduler.submit(job_id, run_multi_agent_analysis, job_id, text, document_name, cache_key,
+                                      mode, not bypass_cache, tuple(analyses), priority=priority)
+    except QueueFullError:
+        await job_store.aupdate(job_id, status=job["status"])
+        raise
+    logger.info(f"Analysis queued for job_id {job_id} (mode={mode}, priority={priority})")
+    return "queued"
+
+
+async def _accept_upload(request: Request, previous: dict = None) -> JSONResponse:
+    # The file is streamed into a SpooledUpload (hashed and size-checked per chunk) instead of read whole.
+    # With `previous`, the upload is recorded as the next version of that job's document.
+    upload = None
+    try:
+        started = time.perf_counter()
+        upload = await receive_upload(request, "file", SUPPORTED_EXTENSIONS)
+        upload_read = time.perf_counter() - started
+        started = time.perf_counter()
+        text = await _extract_document_text(upload)
+        extraction = time.perf_counter() - started
         job_id = str(uuid.uuid4())
-        jobs_store[job_id] = {
+        job = {
             "job_id": job_id,
             "status": "uploaded",
-            "document_name": file.filename,
-            "text": text,
-            "uploaded_at": datetime.now().isoformat()
+            "document_name": upload.filename,
+            "uploaded_at": datetime.now().isoformat(),
+            "size_bytes": upload.size,
+            "content_sha256": upload.sha256,
+            "timings": _upload_timings(upload_read, extraction)
         }
-        logger.info(f"Document uploaded: {file.filename} (job_id={job_id})")
-        return JSONResponse(content={
+        if previous is not None:
+            job["previous_job_id"] = previous["job_id"]
+            job["version"] = previous.get("version", 1) + 1
+        if NEAR_DUPLICATE_DETECTION:
+            match = await asyncio.to_thread(_find_near_duplicate, text, NEAR_DUPLICATE_THRESHOLD)
+            if match is not None:
+                job["near_duplicate"] = {key: match[key] for key in ("job_id", "document_name", "similarity")}
+        await job_store.acreate(job, text)
+        logger.info(f"Document uploaded: {upload.filename} ({upload.size} bytes, job_id={job_id})")
+        response = {
             "job_id": job_id,
             "message": "Document uploaded successfully",
-            "document_name": file.filename,
-            "status": "uploaded"
-        })
+            "document_name": upload.filename,
+            "status": "uploaded",
+            "content_sha256": upload.sha256
+        }
+        for key in ("previous_job_id", "version", "near_duplicate"):
+            if key in job:
+                response[key] = job[key]
+        if previous is not None:
+            # Only documents analyzed chunk by chunk reuse the previous version's chunks
+            response["incremental"] = needs_chunking(text)
+        return JSONResponse(content=response)
+    except HTTPException:
+        raise
     except ValueError as e:
         logger.error(f"Upload failed: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Upload failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to process upload: {str(e)}")
+    finally:
+        if upload is not None:
+            upload.close()
+
+
+@router.post("/upload", openapi_extra={"requestBody": UPLOAD_REQUEST_BODY})
+async def upload_document(request: Request):
+    return await _accept_upload(request)
+
+@router.post("/documents/{job_id}/versions", openapi_extra={"requestBody": UPLOAD_REQUEST_BODY})
+async def upload_document_version(job_id: str, request: Request):
+    # A revised document: analyzing the new job re-runs the agents only on the chunks that changed
+    previous = await job_store.aget(job_id)
+    if previous is None:
+        logger.warning(f"Version upload failed: job_id {job_id} not found.")
+        raise HTTPException(status_code=404, detail="Job ID not found")
+    return await _accept_upload(request, previous)
 
 @router.post("/analyze")
-async def analyze_document(request: AnalysisRequest, background_tasks: BackgroundTasks):
+async def analyze_document(request: AnalysisRequest):
     job_id = request.job_id
-    if job_id not in jobs_store:
+    job = await job_store.aget(job_id)
+    if job is None:
         logger.warning(f"Analyze failed: job_id {job_id} not found.")
         raise HTTPException(status_code=404, detail="Job ID not found")
-    job = jobs_store[job_id]
-    if job["status"] in ["processing", "completed"]:
+    if job["status"] in ["queued", "processing", "completed"]:
         logger.warning(f"Analyze failed: job_id {job_id} is already {job['status']}.")
         raise HTTPException(status_code=400, detail=f"Job is already {job['status']}")
-    text = job.get("text")
-    document_name = job.get("document_name")
+    text = await job_store.aget_text(job_id)
     if not text:
         logger.warning(f"Analyze failed: job_id {job_id} has no text.")
         raise HTTPException(status_code=400, detail="Document text not found")
-    background_tasks.add_task(run_multi_agent_analysis, job_id, text, document_name)
-    logger.info(f"Analysis started for job_id {job_id}")
+    try:
+        status = await _start_analysis(job_id, job, text, request.mode, request.priority, request.bypass_cache,
+                                       request.analyses)
+    except QueueFullError as e:
+        logger.warning(f"Analyze rejected: queue full for job_id {job_id}.")
+        raise HTTPException(status_code=429, detail="Analysis queue is full, retry later",
+                            headers={"Retry-After": str(e.retry_after_seconds)})
+    except CircuitOpenError as e:
+        logger.warning(f"Analyze rejected: LLM provider unavailable for job_id {job_id}.")
+        raise HTTPException(status_code=503, detail="LLM provider is temporarily unavailable, retry later",
+                            headers={"Retry-After": str(math.ceil(e.retry_after_seconds))})
+    if status == "completed":
+        return JSONResponse(content={
+            "job_id": job_id,
+            "message": "Analysis served from cache",
+            "status": "completed"
+        })
     return JSONResponse(content={
         "job_id": job_id,
-        "message": "Analysis started",
-        "status": "processing"
+        "message": "Analysis queued",
+        "status": "queued",
+        "queue_position": analysis_queue.position(job_id)
     })
 
-async def run_multi_agent_analysis(job_id: str, text: str, document_name: str):
-    start_time = time.time()
+def _collect_batch_entries(uploads: List[SpooledUpload]):
+    # Returns ([(document_name, source)], rejected) where source is the spooled upload itself, or for a zip
+    # entry a function returning the entry as a binary stream. Zip archives are read entry by entry from the
+    # spooled upload, never unpacked as a whole.
+    entries, rejected = [], []
+    for upload in uploads:
+        if not upload.filename.endswith(".zip"):
+            entries.append((upload.filename, upload))
+            continue
+        try:
+            archive = zipfile.ZipFile(upload.path or io.BytesIO(upload.source))
+        except zipfile.BadZipFile:
+            rejected.append({"document_name": upload.filename, "error": "Not a valid zip archive"})
+            continue
+        for info in archive.infolist():
+            if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                continue
+            if not info.filename.endswith(SUPPORTED_EXTENSIONS):
+                rejected.append({"document_name": info.filename,
+                                 "error": str(UnsupportedFileTypeError(SUPPORTED_EXTENSIONS))})
+            elif info.file_size > UPLOAD_SIZE_LIMIT:
+                rejected.append({"document_name": info.filename, "error": str(UploadTooLargeError())})
+            else:
+                entries.append((info.filename, lambda archive=archive, info=info: archive.open(info)))
+    return entries, rejected
+
+
+async def _feed_batch(batch_id: str, job_ids: List[str], mode: str, priority: str, bypass_cache: bool):
+    # Submit the batch's jobs a few at a time, backing off while the analysis queue is full
+    for job_id in job_ids:
+        while True:
+            counts = await job_store.abatch_status_counts(batch_id)
+            if counts.get("queued", 0) + counts.get("processing", 0) >= BATCH_MAX_IN_FLIGHT:
+                await asyncio.sleep(BATCH_POLL_INTERVAL_SECONDS)
+                continue
+            job = await job_store.aget(job_id)
+            text = await job_store.aget_text(job_id)
+            if job is None or not text:
+                # Removed by the TTL sweep or evicted; the batch status counts it as expired
+                logger.warning(f"Batch {batch_id}: job {job_id} is no longer stored, skipping it")
+                break
+            try:
+                await _start_analysis(job_id, job, text, mode, priority, bypass_cache)
+                break
+            except (QueueFullError, CircuitOpenError) as e:
+                logger.info(f"Batch {batch_id}: {str(e)}, retrying in {e.retry_after_seconds}s")
+                await asyncio.sleep(e.retry_after_seconds)
+    logger.info(f"Batch {batch_id}: all {len(job_ids)} jobs submitted")
+
+
+def _batch_part_limit(filename: str) -> int:
+    # Documents are held to the upload limit; archives to the whole request's, their entries being checked later
+    return BATCH_UPLOAD_LIMIT if filename.endswith(".zip") else UPLOAD_SIZE_LIMIT
+
+
+@router.post("/batch", openapi_extra={"requestBody": BATCH_REQUEST_BODY})
+async def upload_batch(request: Request):
+    # The body is streamed and size-checked like /upload; unsupported or oversized files are listed in
+    # `rejected` instead of failing the batch
+    started = time.perf_counter()
     try:
-        jobs_store[job_id]["status"] = "processing"
-        # results = await asyncio.gather(
-        #     summarizer_agent(text),
-        #     entity_extractor_agent(text),
-        #     sentiment_analyzer_agent(text),
-        #     return_exceptions=True
-        # )
-        
-        results = await asyncio.gather(
-            agents_and_run_crew(text),
-            return_exceptions=True)
-        print(results)
-
-        summary = results[0][0]["summary"] if not isinstance(results[0][0]["summary"], Exception) else "Summary unavailable due to agent failure"
-        entities = results[0][1] if not isinstance(results[0][1], Exception) else {
-            "people": [], "organizations": [], "dates": [], "locations": []
-        }
-        sentiment = results[0][2] if not isinstance(results[0][2], Exception) else {
-            "tone": "neutral", "confidence": 0.0
-        }
-        processing_time = time.time() - start_time
-        jobs_store[job_id] = {
-            "job_id": job_id,
-            "status": "completed",
-            "document_name": document_name,
-            "results": {
-                "summary": summary,
-                "entities": entities,
-                "sentiment": sentiment
-            },
-            "processing_time_seconds": round(processing_time, 2)
-        }
-        failures = []
-        if isinstance(summary, Exception):
-            failures.append(f"Summarizer: {str(summary)}")
-        if isinstance(entities, Exception):
-            failures.append(f"Entity Extractor: {str(entities)}")
-        if isinstance(sentiment, Exception):
-            failures.append(f"Sentiment Analyzer: {str(sentiment)}")
-        if failures:
-            jobs_store[job_id]["agent_failures"] = failures
-    except Exception as e:
-        jobs_store[job_id] = {
+        uploads, fields, rejected = await receive_form(
+            request, "files", _batch_part_limit, (*SUPPORTED_EXTENSIONS, ".zip"),
+            text_fields=("mode", "priority", "bypass_cache"), request_limit=BATCH_UPLOAD_LIMIT, lenient=True)
+    except ValueError as e:
+        logger.error(f"Batch upload failed: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    upload_read = time.perf_counter() - started
+    try:
+        return await _accept_batch(uploads, rejected, upload_read, fields.get("mode", "multi"),
+                                   fields.get("priority", "low"),
+                                   fields.get("bypass_cache", "false").lower() in ("true", "1", "yes", "on"))
+    finally:
+        for upload in uploads:
+            upload.close()
+
+
+async def _accept_batch(uploads: List[SpooledUpload], rejected: List[dict], upload_read: float, mode: str,
+                        priority: str, bypass_cache: bool) -> JSONResponse:
+    if mode not in ("multi", "fused", "local"):
+        raise HTTPException(status_code=400, detail="mode must be 'multi', 'fused' or 'local'")
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"priority must be one of {', '.join(PRIORITIES)}")
+    if not uploads and not rejected:
+        raise HTTPException(status_code=400, detail="No file found in form field 'files'")
+    entries, archive_rejected = await asyncio.to_thread(_collect_batch_entries, uploads)
+    rejected = rejected + archive_rejected
+    if len(entries) > BATCH_MAX_DOCUMENTS:
+        logger.warning(f"Batch upload failed: {len(entries)} documents exceeds limit of {BATCH_MAX_DOCUMENTS}.")
+        raise HTTPException(status_code=400, detail=f"Batch exceeds {BATCH_MAX_DOCUMENTS} documents")
+
+    semaphore = asyncio.Semaphore(BATCH_EXTRACTION_CONCURRENCY)
+
+    def spool(document_name, open_entry):
+        with open_entry() as stream:
+            return spool_stream(document_name, stream)
+
+    async def extract(document_name, source):
+        # Returns (text, job fields) or the exception that rejected the entry. Files sent directly were
+        # spooled while the request was read; zip entries are spooled here.
+        async with semaphore:
+            upload = source if isinstance(source, SpooledUpload) else None
+            try:
+                read = upload_read
+                if upload is None:
+                    started = time.perf_counter()
+                    upload = await asyncio.to_thread(spool, document_name, source)
+                    read = time.perf_counter() - started
+                started = time.perf_counter()
+                text = await _extract_document_text(upload)
+                return text, {"size_bytes": upload.size, "content_sha256": upload.sha256,
+                              "timings": _upload_timings(read, time.perf_counter() - started)}
+            except Exception as e:
+                logger.warning(f"Batch entry {document_name} rejected: {str(e)}")
+                return e
+            finally:
+                if upload is not None:
+                    upload.close()
+
+    extracted = await asyncio.gather(*[extract(document_name, source) for document_name, source in entries])
+    documents = []
+    for (document_name, _), outcome in zip(entries, extracted):
+        if isinstance(outcome, Exception):
+            rejected.append({"document_name": document_name, "error": str(outcome)})
+        else:
+            documents.append((document_name, *outcome))
+    if not documents:
+        raise HTTPException(status_code=400, detail={"message": "No valid documents in batch", "rejected": rejected})
+
+    batch_id = str(uuid.uuid4())
+    await job_store.acreate_batch({
+        "batch_id": batch_id,
+        "created_at": time.time(),
+        "total": len(documents),
+        "mode": mode,
+        "priority": priority,
+        "rejected": rejected
+    })
+    job_ids = []
+    for document_name, text, fields in documents:
+        job_id = str(uuid.uuid4())
+        await job_store.acreate({
             "job_id": job_id,
-            "status": "failed",
+            "status": "uploaded",
             "document_name": document_name,
-            "error": str(e),
-            "processing_time_seconds": round(time.time() - start_time, 2)
-        }
+            "uploaded_at": datetime.now().isoformat(),
+            "batch_id": batch_id,
+            **fields
+        }, text)
+        job_ids.append(job_id)
+
+    feeder = asyncio.create_task(_feed_batch(batch_id, job_ids, mode, priority, bypass_cache))
+    _batch_feeders.add(feeder)
+    feeder.add_done_callback(_batch_feeders.discard)
+    logger.info(f"Batch {batch_id} created with {len(job_ids)} documents ({len(rejected)} rejected)")
+    return JSONResponse(content={
+        "batch_id": batch_id,
+        "message": "Batch accepted",
+        "total": len(job_ids),
+        "job_ids": job_ids,
+        "rejected": rejected
+    })
+
+@router.get("/batch/{batch_id}")
+async def get_batch_status(batch_id: str, offset: int = 0, limit: int = 50):
+    batch = await job_store.aget_batch(batch_id)
+    if batch is None:
+        logger.warning(f"Get batch failed: batch_id {batch_id} not found.")
+        raise HTTPException(status_code=404, detail="Batch ID not found")
+    offset = max(0, offset)
+    limit = max(1, min(limit, BATCH_PAGE_LIMIT))
+    counts = await job_store.abatch_status_counts(batch_id)
+    total = batch["total"]
+    # Members no longer in the store (swept or evicted) will never finish; they count as expired
+    missing = total - sum(counts.values())
+    if missing > 0:
+        counts["expired"] = missing
+    finished = sum(counts.get(status, 0) for status in (*TERMINAL_STATUSES, "expired"))
+    if finished >= total:
+        status = "completed"
+    elif counts.get("uploaded", 0) == total:
+        status = "pending"
+    else:
+        status = "processing"
+    jobs = await job_store.abatch_jobs(batch_id, offset, limit)
+    return JSONResponse(content={
+        "batch_id": batch_id,
+        "status": status,
+        "total": total,
+        "status_counts": counts,
+        "progress": round(finished / total, 3) if total else 1.0,
+        "rejected": batch["rejected"],
+        "offset": offset,
+        "limit": limit,
+        "jobs": jobs,
+        "next_offset": offset + limit if offset + limit < total else None
+    })
+
+def _cache_control(job: dict) -> str:
+    # Completed jobs with every analysis present never change again; anything else must be revalidated
+    if job["status"] == "completed" and all(value is not None for value in (job.get("results") or {}).values()):
+        return IMMUTABLE_CACHE_CONTROL
+    return "no-cache"
+
+
+def _not_modified(etag: str, cache_control: str) -> Response:
+    results_responses_total.inc(outcome="not_modified")
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"})
+
+
+async def _queue_on_demand(job_id: str, requested: List[str]) -> Optional[dict]:
+    # Queues a run of the requested analyses a finished job lacks, like /analyze queues a job, so on-demand
+    # work is bounded by the same queue and runs in the workers in worker mode. Returns the job record
+    # while such a run is pending, or None when every requested analysis is present.
+    job = await job_store.aget(job_id)
+    if job is None:
+        return None
+    missing = missing_analyses(job, requested)
+    if not missing:
+        return None
+    if not job.get("pending_analyses"):
+        mode = job.get("mode", "multi")
+        if mode != "local" and ANALYSIS_EXECUTION != "worker":
+            circuit = get_provider(pipeline_provider()).circuit
+            if circuit.is_open():
+                raise CircuitOpenError(circuit.name, circuit.retry_after_seconds())
+        await job_store.aupdate(job_id, pending_analyses=list(missing))
+        try:
+            if ANALYSIS_EXECUTION == "worker":
+                analysis_queue.enqueue(job_id, {"on_demand": list(missing)})
+            else:
+                analysis_scheduler.submit(job_id, run_on_demand, job_id, missing)
+        except QueueFullError:
+            await job_store.areplace(job_id, job)
+            raise
+        job["pending_analyses"] = list(missing)
+        logger.info(f"On-demand analyses {', '.join(missing)} queued for job_id {job_id}")
+    job["queue_position"] = analysis_queue.position(job_id)
+    return job
+
 
 @router.get("/results/{job_id}")
-async def get_results(job_id: str):
-    if job_id not in jobs_store:
+async def get_results(job_id: str, request: Request, analyses: Optional[List[str]] = Query(None)):
+    # ?analyses=entities (repeatable or comma-separated) computes analyses the job did not run and memoizes them
+    requested = [name for value in analyses or [] for name in value.split(",") if name]
+    unknown = [name for name in requested if name not in ANALYSIS_AGENTS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown analyses: {', '.join(unknown)}")
+    # Revision and status come from the store without loading the record, so a repeat poll costs one lookup
+    revision = await job_store.aget_revision(job_id)
+    if revision is None:
         logger.warning(f"Get results failed: job_id {job_id} not found.")
         raise HTTPException(status_code=404, detail="Job ID not found")
-    job = jobs_store[job_id]
-    response = {k: v for k, v in job.items() if k != "text"}
+    if requested and revision[1] in ("completed", "partial"):
+        try:
+            pending = await _queue_on_demand(job_id, requested)
+        except QueueFullError as e:
+            logger.warning(f"On-demand analysis rejected: queue full for job_id {job_id}.")
+            raise HTTPException(status_code=429, detail="Analysis queue is full, retry later",
+                                headers={"Retry-After": str(e.retry_after_seconds)})
+        except CircuitOpenError as e:
+            logger.warning(f"On-demand analysis rejected: LLM provider unavailable for job_id {job_id}.")
+            raise HTTPException(status_code=503, detail="LLM provider is temporarily unavailable, retry later",
+                                headers={"Retry-After": str(math.ceil(e.retry_after_seconds))})
+        if pending is not None:
+            return JSONResponse(status_code=202, content=pending, headers={"Cache-Control": "no-cache"})
+    current, status = revision
+    if status == "queued":
+        # Queue position and wait change without a new revision, so queued jobs are neither tagged nor cached
+        job = await job_store.aget(job_id)
+        job["queue_position"] = analysis_queue.position(job_id)
+        job["queue_wait_seconds"] = round(time.time() - job["queued_at"], 3)
+        job["estimated_wait_seconds"] = analysis_queue.estimated_wait_seconds(job_id)
+        return Response(dumps(job), media_type="application/json", headers={"Cache-Control": "no-cache"})
+
+    etag = job_etag(job_id, current)
+    if_none_match = request.headers.get("if-none-match")
+    final = status in TERMINAL_STATUSES
+    entry = serialized_results.get(etag) if final else None
+    if entry is not None:
+        results_responses_total.inc(outcome="memoized")
+    elif not final and etag_matches(if_none_match, etag):
+        return _not_modified(etag, "no-cache")
+    else:
+        job = await job_store.aget(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job ID not found")
+        # Tag the revision actually read, which may be newer than the one looked up above
+        etag = job_etag(job_id, job.get("revision", current))
+        entry = (*encode_body(job), _cache_control(job))
+        if job["status"] in TERMINAL_STATUSES:
+            serialized_results.put(etag, entry)
+        results_responses_total.inc(outcome="serialized")
+    body, compressed, cache_control = entry
+    if etag_matches(if_none_match, etag):
+        return _not_modified(etag, cache_control)
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if compressed is not None and accepts_gzip(request.headers.get("accept-encoding")):
+        body = compressed
+        headers["Content-Encoding"] = "gzip"
     logger.info(f"Results retrieved for job_id {job_id}")
-    return JSONResponse(content=response)
+    return Response(body, media_type="application/json", headers=headers)
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.get("/results/{job_id}/stream")
+async def stream_results(job_id: str, request: Request):
+    if await job_store.aget(job_id) is None:
+        logger.warning(f"Stream results failed: job_id {job_id} not found.")
+        raise HTTPException(status_code=404, detail="Job ID not found")
+
+    async def event_stream():
+        # Subscribe before the first store read so no event between the two is missed
+        events = job_events.subscribe(job_id)
+        try:
+            last_status = None
+            refresh = True
+            idle = 0.0
+            while True:
+                if refresh:
+                    job = await job_store.aget(job_id)
+                    if job is None:
+                        yield _sse("failed", {"job_id": job_id, "error": "Job ID not found"})
+                        return
+                    if job["status"] in TERMINAL_STATUSES:
+                        # The final event carries the full job record, results included
+                        yield _sse(job["status"], job)
+                        return
+                    if job["status"] != last_status:
+                        last_status = job["status"]
+                        status = {"job_id": job_id, "status": last_status}
+                        if last_status == "queued":
+                            status["queue_position"] = analysis_queue.position(job_id)
+                        yield _sse("status", status)
+                    refresh = False
+                if await request.is_disconnected():
+                    return
+                try:
+                    event, data = await asyncio.wait_for(events.get(), timeout=STREAM_POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    refresh = True
+                    idle += STREAM_POLL_INTERVAL_SECONDS
+                    if idle >= STREAM_KEEPALIVE_SECONDS:
+                        idle = 0.0
+                        yield ": keep-alive\n\n"
+                    continue
+                idle = 0.0
+                if event == "status":
+                    refresh = True
+                else:
+                    yield _sse(event, data)
+        finally:
+            job_events.unsubscribe(job_id, events)
+
+    logger.info(f"Result stream opened for job_id {job_id}")
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/queue/stats")
+async def queue_stats():
+    return analysis_queue.stats()
+
+@router.get("/cache/stats")
+async def cache_stats():
+    return {**await asyncio.to_thread(result_cache.stats), "responses": serialized_results.stats()}
+
+@router.get("/jobs/stats")
+async def job_store_stats():
+    return await job_store.astats()
+
+@router.get("/analysis/metrics")
+async def analysis_mode_metrics():
+    return analysis_metrics.snapshot()
+
+@router.get("/near-duplicates/stats")
+async def near_duplicate_stats():
+    return near_duplicate_index.stats()
+
+@router.get("/providers/stats")
+async def llm_provider_stats():
+    return provider_stats()
+
+@router.get("/crews/stats")
+async def crew_stats():
+    return crew_pool_stats()
+
+@router.get("/metrics")
+async def prometheus_metrics():
+    # Histograms and counters cover analyses run in this process; gauges are sampled now
+    queue = analysis_queue.stats()
+    queue_depth.set(queue["queue_depth"])
+    queue_in_progress.set(queue.get("in_progress", queue["busy_workers"]))
+    store = await job_store.astats()
+    job_store_jobs.set(store["jobs"])
+    job_store_bytes.set(store["bytes"])
+    for name, stats in provider_stats().items():
+        llm_requests_in_flight.set(stats["in_flight"], provider=name)
+    return PlainTextResponse(render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
 
 @router.get("/")
 async def root():
@@ -156,8 +700,20 @@ async def root():
         "llm_provider": "Google Gemini",
         "endpoints": {
             "POST /upload": "Upload a document (PDF/TXT)",
+            "POST /documents/{job_id}/versions": "Upload a new version of a job's document for incremental re-analysis",
             "POST /analyze": "Start analysis on uploaded document",
-            "GET /results/{job_id}": "Get analysis results"
+            "POST /batch": "Upload several documents or a zip archive and analyze them all",
+            "GET /batch/{batch_id}": "Aggregate batch progress and paged results",
+            "GET /results/{job_id}": "Get analysis results; ?analyses=... computes analyses the job skipped",
+            "GET /results/{job_id}/stream": "Server-Sent Events: status changes, agent results and summary tokens",
+            "GET /queue/stats": "Analysis queue depth and worker utilization",
+            "GET /cache/stats": "Result cache hit/miss counters",
+            "GET /jobs/stats": "Job store size in jobs and bytes, and TTL/LRU eviction counts",
+            "GET /near-duplicates/stats": "Near-duplicate index size and match counters",
+            "GET /analysis/metrics": "Token use and latency per analysis mode",
+            "GET /providers/stats": "LLM provider concurrency and call counters",
+            "GET /crews/stats": "Pooled crew counts per task template (crew pipeline)",
+            "GET /metrics": "Prometheus metrics: stage and agent latency histograms, token counters, in-flight jobs"
         }
     }
 
@@ -0,0 +1,121 @@
+import asyncio
+import itertools
+import math
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+# Configure logging
+import logging
+logger = logging.getLogger(__name__)
+
+# "inline" runs analyses on this process's scheduler; "worker" hands them to worker.py processes
+ANALYSIS_EXECUTION = os.getenv("ANALYSIS_EXECUTION", "inline")
+ANALYSIS_QUEUE_SIZE = int(os.getenv("ANALYSIS_QUEUE_SIZE", "100"))
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "4"))
+
+# Lower value runs first
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+
+class QueueFullError(Exception):
+    def __init__(self, retry_after_seconds: int):
+        super().__init__("Analysis queue is full")
+        self.retry_after_seconds = retry_after_seconds
+
+
+class AnalysisScheduler:
+    """Bounded priority queue of analysis jobs drained by a fixed number of async workers."""
+
+    def __init__(self, max_queue_size: int = ANALYSIS_QUEUE_SIZE, workers: int = ANALYSIS_WORKERS):
+        self.max_queue_size = max_queue_size
+        self.workers = workers
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._worker_tasks = []
+        self._sequence = itertools.count()
+        # job_id -> (priority, sequence, enqueued_at) for jobs still waiting
+        self._pending: Dict[str, tuple] = {}
+        self._busy = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._total_wait = 0.0
+        self._total_service = 0.0
+
+    async def start(self):
+        self._queue = asyncio.PriorityQueue(maxsize=self.max_queue_size)
+        self._worker_tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Analysis scheduler started with {self.workers} workers (queue size {self.max_queue_size}).")
+
+    async def stop(self):
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def submit(self, job_id: str, handler: Callable[..., Awaitable], *args, priority: str = "normal"):
+        entry = (PRIORITIES[priority], next(self._sequence), time.time())
+        try:
+            self._queue.put_nowait((entry[0], entry[1], job_id, handler, args))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFullError(self.retry_after_seconds())
+        self._pending[job_id] = entry
+
+    def position(self, job_id: str) -> Optional[int]:
+        # 1-based position among waiting jobs, or None once the job has started
+        entry = self._pending.get(job_id)
+        if entry is None:
+            return None
+        return 1 + sum(1 for other in self._pending.values() if other[:2] < entry[:2])
+
+    def _avg_service_seconds(self) -> float:
+        return self._total_service / self.processed if self.processed else 30.0
+
+    def retry_after_seconds(self) -> int:
+        # Time for the workers to drain the current queue, at the observed service rate
+        depth = self._queue.qsize() if self._queue else 0
+        return max(1, math.ceil(depth * self._avg_service_seconds() / self.workers))
+
+    def estimated_wait_seconds(self, job_id: str) -> Optional[float]:
+        position = self.position(job_id)
+        if position is None:
+            return None
+        return round(math.ceil(position / self.workers) * self._avg_service_seconds(), 1)
+
+    async def _worker(self, index: int):
+        while True:
+            _, _, job_id, handler, args = await self._queue.get()
+            entry = self._pending.pop(job_id, None)
+            if entry is not None:
+                self._total_wait += time.time() - entry[2]
+            self._busy += 1
+            started = time.time()
+            try:
+                await handler(*args)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Scheduler worker {index}: job {job_id} raised: {str(e)}")
+            finally:
+                self._busy -= 1
+                self.processed += 1
+                self._total_service += time.time() - started
+                self._queue.task_done()
+
+    def stats(self) -> Dict:
+        return {
+            "execution": "inline",
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_capacity": self.max_queue_size,
+            "workers": self.workers,
+            "busy_workers": self._busy,
+            "worker_utilization": round(self._busy / self.workers, 3) if self.workers else 0.0,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_queue_wait_seconds": round(self._total_wait / self.processed, 3) if self.processed else 0.0,
+            "avg_service_seconds": round(self._total_service / self.processed, 3) if self.processed else 0.0
+        }
+
+
+analysis_scheduler = AnalysisScheduler()
@@ -0,0 +1,153 @@
+import os
+import re
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from utils import CHARS_PER_TOKEN
+
+# Configure logging
+import logging
+logger = logging.getLogger(__name__)
+
+# Input token budget per agent; text over budget is reduced to its most informative sentences
+TOKEN_BUDGETS = {
+    "summary": int(os.getenv("SUMMARY_TOKEN_BUDGET", "2000")),
+    "entities": int(os.getenv("ENTITY_TOKEN_BUDGET", "3000")),
+    "sentiment": int(os.getenv("SENTIMENT_TOKEN_BUDGET", "1000")),
+    "fused": int(os.getenv("FUSED_TOKEN_BUDGET", "3000")),
+}
+# Bump when the ranking changes, so cached results produced with the old selection are not reused
+SELECTION_VERSION = 1
+
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])|\n\s*\n|\n(?=\s*(?:[-*•]|\d+[.)])\s)")
+_TERM_PATTERN = re.compile(r"[a-z][a-z0-9'-]{2,}")
+_ENTITY_PATTERN = re.compile(r"\b[A-Z][a-zA-Z&.-]+|\b\d{1,4}[/-]\d{1,2}[/-]\d{1,4}\b|\b(?:19|20)\d{2}\b")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have having
+he her here hers herself him himself his how however i if in into is it its itself just me more most my
+myself no nor not now of off on once only or other our ours ourselves out over own same she should so
+some such than that the their theirs them themselves then there these they this those through to too
+under until up upon us very was we were what when where which while who whom why will with would you
+your yours yourself yourselves shall may might must one two also within without
+""".split())
+
+# Estimating, not encoding: no model tokenizer is available offline. BPE tokenizers used by
+# Llama 3 and Gemini spend about one token per common word, more on long words and numbers.
+LETTERS_PER_TOKEN = 6
+DIGITS_PER_TOKEN = 3
+
+
+def count_tokens(text: str) -> int:
+    tokens = 0
+    for piece in _TOKEN_PATTERN.findall(text):
+        if piece[0].isalpha():
+            tokens += 1 + (len(piece) - 1) // LETTERS_PER_TOKEN
+        elif piece[0].isdigit():
+            tokens += 1 + (len(piece) - 1) // DIGITS_PER_TOKEN
+        else:
+            tokens += 1
+    return tokens
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in _SENTENCE_BOUNDARY.split(text) if sentence and sentence.strip()]
+
+
+def _term_matrix(sentences: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    # Sparse sentence x term counts as parallel (sentence, term, count) arrays
+    vocabulary: Dict[str, int] = {}
+    sentence_ids, term_ids = [], []
+    for index, sentence in enumerate(sentences):
+        for term in _TERM_PATTERN.findall(sentence.lower()):
+            if term not in STOPWORDS:
+                sentence_ids.append(index)
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+    if not sentence_ids:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0), 0
+    pairs = np.array(sentence_ids, dtype=np.int64) * len(vocabulary) + np.array(term_ids, dtype=np.int64)
+    unique_pairs, counts = np.unique(pairs, return_counts=True)
+    return unique_pairs // len(vocabulary), unique_pairs % len(vocabulary), counts.astype(np.float64), len(vocabulary)
+
+
+def centroid_scores(sentences: List[str]) -> np.ndarray:
+    # Cosine similarity of each sentence's TF-IDF vector to the document's TF-IDF centroid
+    rows, cols, counts, vocabulary_size = _term_matrix(sentences)
+    scores = np.zeros(len(sentences))
+    if vocabulary_size == 0:
+        return scores
+    document_frequency = np.bincount(cols, minlength=vocabulary_size)
+    idf = np.log((1 + len(sentences)) / (1 + document_frequency)) + 1.0
+    weights = (1 + np.log(counts)) * idf[cols]
+    centroid = np.bincount(cols, weights=weights, minlength=vocabulary_size)
+    centroid_norm = np.linalg.norm(centroid)
+    dots = np.bincount(rows, weights=weights * centroid[cols], minlength=len(sentences))
+    norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=len(sentences)))
+    valid = norms > 0
+    scores[valid] = dots[valid] / (norms[valid] * centroid_norm)
+    return scores
+
+
+def entity_scores(sentences: List[str], token_counts: np.ndarray) -> np.ndarray:
+    # Density of capitalized names, years and dates; sentence-initial capitals count half
+    counts = np.array([len(_ENTITY_PATTERN.findall(sentence)) - 0.5 for sentence in sentences])
+    return np.clip(counts, 0, None) / np.maximum(token_counts, 1)
+
+
+def select_within_budget(text: str, budget: int, strategy: str = "centroid") -> Tuple[str, Dict]:
+    """Pack the highest-ranked sentences of text into budget tokens, kept in document order."""
+    input_tokens = count_tokens(text)
+    if input_tokens <= budget:
+        return text, {"budget": budget, "input_tokens": input_tokens, "selected_tokens": input_tokens}
+    sentences = split_sentences(text)
+    token_counts = np.array([count_tokens(sentence) for sentence in sentences])
+    scores = entity_scores(sentences, token_counts) if strategy == "entities" else centroid_scores(sentences)
+    # Opening sentences usually state what the document is about
+    scores = scores * (1 + 0.2 * (np.arange(len(sentences)) < 3))
+    chosen = np.zeros(len(sentences), dtype=bool)
+    used = 0
+    for index in np.argsort(-scores, kind="stable"):
+        if used + token_counts[index] <= budget:
+            chosen[index] = True
+            used += int(token_counts[index])
+        if used >= budget:
+            break
+    if used == 0:
+        # Not one sentence fits (e.g. text without punctuation): fall back to a plain cut
+        selected = text[:budget * CHARS_PER_TOKEN]
+        return selected, {"budget": budget, "input_tokens": input_tokens, "selected_tokens": count_tokens(selected)}
+    selected = "\n".join(sentence for sentence, keep in zip(sentences, chosen) if keep)
+    return selected, {
+        "budget": budget,
+        "input_tokens": input_tokens,
+        "selected_tokens": used,
+        "sentences": int(chosen.sum()),
+        "total_sentences": len(sentences)
+    }
+
+
+def select_for_agent(text: str, agent: str, usage: Dict = None) -> str:
+    # Reduces text to the agent's budget and records the budget and token counts in usage
+    strategy = "entities" if agent == "entities" else "centroid"
+    selected, stats = select_within_budget(text, TOKEN_BUDGETS[agent], strategy)
+    if usage is not None:
+        selection = usage.setdefault("input_selection", {})
+        if agent in selection:
+            # Chunked documents call each agent several times; keep totals
+            previous = selection[agent]
+            stats = {
+                "budget": stats["budget"],
+                "calls": previous.get("calls", 1) + 1,
+                "input_tokens": previous["input_tokens"] + stats["input_tokens"],
+                "selected_tokens": previous["selected_tokens"] + stats["selected_tokens"]
+            }
+        selection[agent] = stats
+    return selected
+
+
+def selection_config() -> Dict:
+    return {"token_budgets": dict(TOKEN_BUDGETS), "version": SELECTION_VERSION}
@@ -0,0 +1,20 @@
+import os
+import sys
+import tempfile
+
+# Modules read their configuration at import: point every on-disk store at a scratch directory
+# and give the providers placeholder keys, so the suite runs offline and leaves the tree clean
+_scratch = tempfile.mkdtemp(prefix="document-analysis-tests-")
+os.environ.update({
+    "RESULT_CACHE_PATH": os.path.join(_scratch, "results.db"),
+    "CHUNK_CACHE_PATH": os.path.join(_scratch, "chunks.db"),
+    "NEAR_DUPLICATE_INDEX_PATH": os.path.join(_scratch, "near_duplicates.db"),
+    "JOB_STORE_PATH": os.path.join(_scratch, "jobs.db"),
+    "GROQ_API_KEY": os.environ.get("GROQ_API_KEY", "test"),
+    "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY", "test"),
+    "LITELLM_LOCAL_MODEL_COST_MAP": "True",
+    "CREWAI_DISABLE_TELEMETRY": "true",
+    "OTEL_SDK_DISABLED": "true"
+})
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
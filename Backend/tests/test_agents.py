@@ -0,0 +1,31 @@
+import asyncio
+
+import agents
+
+
+class FakeProvider:
+    def __init__(self, response: str):
+        self.response = response
+
+    async def generate(self, prompt, usage=None, **settings):
+        return self.response
+
+
+def _run_with_response(monkeypatch, agent, response):
+    monkeypatch.setattr(agents, "get_provider", lambda name: FakeProvider(response))
+    return asyncio.run(agent("Acme Corp hired John Smith in London."))
+
+
+def test_strip_code_fence():
+    assert agents._strip_code_fence('```json\n{"a": 1}\n```') == '{"a": 1}'
+    assert agents._strip_code_fence('```\n{"a": 1}```') == '{"a": 1}'
+    assert agents._strip_code_fence(' {"a": 1} ') == '{"a": 1}'
+
+
+def test_entity_and_sentiment_agents_accept_fenced_json(monkeypatch):
+    entities = _run_with_response(monkeypatch, agents.entity_extractor_agent,
+                                  '```json\n{"people": ["John Smith"], "organizations": ["Acme Corp"]}\n```')
+    assert entities == {"people": ["John Smith"], "organizations": ["Acme Corp"], "dates": [], "locations": []}
+    sentiment = _run_with_response(monkeypatch, agents.sentiment_analyzer_agent,
+                                   '```\n{"tone": "positive", "confidence": 0.8}\n```')
+    assert sentiment == {"tone": "positive", "confidence": 0.8}
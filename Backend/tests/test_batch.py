@@ -0,0 +1,58 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+import routes
+from job_store import InMemoryJobStore
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = InMemoryJobStore()
+    monkeypatch.setattr(routes, "job_store", store)
+    return store
+
+
+def _batch(store, statuses):
+    store.create_batch({"batch_id": "b", "created_at": time.time(), "total": len(statuses), "rejected": []})
+    for i, status in enumerate(statuses):
+        store.create({"job_id": f"j{i}", "status": status, "batch_id": "b"}, "text")
+
+
+def _expire(store, *job_ids):
+    # Age the jobs past the TTL and sweep them, as the TTL sweeper would
+    for job_id in job_ids:
+        store._entries[job_id].updated_at = 0
+    store.sweep(ttl_seconds=3600)
+
+
+def _status(batch_id="b"):
+    return json.loads(asyncio.run(routes.get_batch_status(batch_id)).body)
+
+
+def test_batch_with_swept_members_completes(store):
+    _batch(store, ["completed", "failed", "uploaded"])
+    assert _status()["status"] == "processing"
+    _expire(store, "j1", "j2")
+    body = _status()
+    assert body["status"] == "completed"
+    assert body["status_counts"] == {"completed": 1, "expired": 2}
+    assert body["progress"] == 1.0
+
+
+def test_feeder_skips_missing_members(store, monkeypatch):
+    _batch(store, ["uploaded", "uploaded", "uploaded"])
+    _expire(store, "j1")
+    started = []
+
+    async def start(job_id, job, text, *args):
+        started.append(job_id)
+        store.update(job_id, status="completed")
+        return "completed"
+
+    monkeypatch.setattr(routes, "_start_analysis", start)
+    asyncio.run(routes._feed_batch("b", ["j0", "j1", "j2"], "multi", "low", False))
+    assert started == ["j0", "j2"]
+    assert _status()["status"] == "completed"
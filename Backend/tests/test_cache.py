@@ -0,0 +1,58 @@
+import asyncio
+
+import prompts
+from cache import ResultCache, make_cache_key
+
+
+def test_size_total_tracks_inserts_replacements_and_eviction(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.db"), max_bytes=200)
+    cache.set("a", {"value": "x" * 50})
+    cache.set("a", {"value": "x" * 60})
+    assert cache.stats()["size_bytes"] == cache._count_bytes()
+    cache.set("b", {"value": "y" * 60})
+    cache.get("a")
+    cache.set("c", {"value": "z" * 60})
+    # "b" was the least recently used entry when the ceiling was crossed
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["size_bytes"] == cache._count_bytes() <= 200
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.db"), ttl_seconds=-1)
+    cache.set("a", {"value": 1})
+    assert cache.get("a") is None
+    assert cache.stats()["size_bytes"] == 0
+
+
+def test_async_access_runs_off_the_event_loop(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.db"))
+
+    async def roundtrip():
+        await cache.aset("a", {"value": 1})
+        return await cache.aget("a")
+
+    assert asyncio.run(roundtrip()) == {"value": 1}
+
+
+def test_prompt_edits_change_the_cache_key(monkeypatch):
+    for pipeline in ("gemini", "crew"):
+        before = make_cache_key("text", prompts.analysis_config(pipeline, "multi"))
+        if pipeline == "gemini":
+            template, settings = prompts.GEMINI_AGENTS["sentiment"]
+            monkeypatch.setitem(prompts.GEMINI_AGENTS, "sentiment", (template + " Be brief.", settings))
+        else:
+            agent, prompt, expected_output, model = prompts.CREW_TEMPLATES["entities"]
+            monkeypatch.setitem(prompts.CREW_TEMPLATES, "entities", (agent, prompt, expected_output + ".", model))
+        assert make_cache_key("text", prompts.analysis_config(pipeline, "multi")) != before
+
+
+def test_llm_settings_change_the_cache_key(monkeypatch):
+    before = prompts.analysis_config("crew", "multi")
+    monkeypatch.setattr(prompts, "CREW_TEMPERATURE", 0.2)
+    assert prompts.analysis_config("crew", "multi") != before
+    template, settings = prompts.GEMINI_AGENTS["summary"]
+    before = prompts.analysis_config("gemini", "fused")
+    monkeypatch.setitem(prompts.GEMINI_AGENTS, "summary", (template, {**settings, "max_output_tokens": 500}))
+    # Fused runs can fall back to the summarizer, so its settings are part of the fused configuration too
+    assert prompts.analysis_config("gemini", "fused") != before
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+import analysis
+from chunking import reduce_summaries, map_reduce_analysis, split_into_spans, align_chunks
+from job_store import InMemoryJobStore
+
+
+async def _join(text: str) -> str:
+    return " + ".join(part.strip() for part in text.split("\n\n"))
+
+
+@pytest.mark.parametrize("fanout", [-1, 0, 1, 2])
+def test_reduce_converges_for_any_fanout(fanout):
+    summary = asyncio.run(asyncio.wait_for(reduce_summaries(["a", "b", "c", "d", "e"], _join, fanout=fanout), 5))
+    assert all(part in summary for part in "abcde")
+
+
+def test_failed_reduce_group_is_recorded():
+    async def flaky(text):
+        if "c" in text:
+            raise RuntimeError("provider down")
+        return await _join(text)
+
+    usage = {}
+    summary = asyncio.run(reduce_summaries(["a", "b", "c", "d"], flaky, fanout=2, usage=usage))
+    # The failed group's partial summaries are kept, and the fallback is counted
+    assert "c" in summary and "d" in summary
+    assert usage["summary_reduce_fallbacks"] >= 1
+
+
+def test_reduce_fallback_makes_the_summary_a_partial_result():
+    async def analyze_chunk(chunk):
+        return [{"summary": chunk[:10]}, {"people": []}, {"tone": "neutral", "confidence": 0.5}]
+
+    async def summarize(text):
+        raise RuntimeError("provider down")
+
+    usage = {}
+    results = asyncio.run(map_reduce_analysis("", analyze_chunk, summarize, usage, chunks=["one", "two", "three"]))
+    statuses = analysis._agent_statuses(results, {}, usage)
+    assert statuses["summary"]["status"] == "completed" and "warning" in statuses["summary"]
+    assert analysis._agent_failures(statuses) == [f"Summarizer: {statuses['summary']['warning']}"]
+
+
+def _document(edit: str = "") -> str:
+    paragraphs = [f"Paragraph {n}: Acme Corp signed the agreement with John Smith in London. " * 12
+                  for n in range(60)]
+    paragraphs[30] += edit
+    return "\n".join(paragraphs)
+
+
+def test_align_chunks_keeps_the_unchanged_chunks_of_a_new_version():
+    previous = _document()
+    spans = split_into_spans(previous)
+    text = _document(edit="A new closing sentence.")
+    aligned = align_chunks(previous, spans, text)
+    old_chunks = {previous[start:end] for start, end in spans}
+    new_chunks = [text[start:end] for start, end in aligned]
+    changed = [chunk for chunk in new_chunks if chunk not in old_chunks]
+    assert 1 <= len(changed) <= 2 and "A new closing sentence." in "".join(changed)
+    # Together the chunks still cover the whole new text
+    covered = 0
+    for start, end in aligned:
+        assert start < end and not text[covered:start].strip()
+        covered = max(covered, end)
+    assert covered == len(text)
+
+
+class Pipeline:
+    def __init__(self):
+        self.chunks = []
+
+    async def run(self, text, usage, on_result=None, on_token=None):
+        self.chunks.append(text)
+        return [{"summary": text[:20]}, {"people": ["John Smith"]}, {"tone": "neutral", "confidence": 0.9}]
+
+    async def summarize(self, text, usage):
+        return text[:40]
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    pipeline = Pipeline()
+    store = InMemoryJobStore()
+    monkeypatch.setattr(analysis, "job_store", store)
+    monkeypatch.setattr(analysis, "_pipeline", lambda mode, selected: (pipeline.run, pipeline.summarize))
+    monkeypatch.setattr(analysis, "pipeline_config", lambda mode: {"test": "incremental"})
+    return pipeline, store
+
+
+def test_new_version_sends_only_changed_chunks_to_the_agents(pipeline):
+    pipeline, store = pipeline
+    previous = _document(edit="First version.")
+    usage = {}
+    _, spans = asyncio.run(analysis._run_agents("v1", previous, "multi", analysis.ANALYSIS_AGENTS, usage))
+    store.create({"job_id": "v1", "status": "completed", "chunk_spans": spans}, previous)
+    analyzed = len(pipeline.chunks)
+    assert usage["chunks_reused"] == 0 and analyzed == len(spans)
+
+    usage = {}
+    text = _document(edit="Second version.")
+    asyncio.run(analysis._run_agents("v2", text, "multi", analysis.ANALYSIS_AGENTS, usage, "v1"))
+    assert 1 <= len(pipeline.chunks) - analyzed <= 2
+    assert usage["chunks_reused"] == usage["chunks"] - (len(pipeline.chunks) - analyzed)
+
+
+def test_short_version_is_analyzed_in_full_and_reports_no_reuse(pipeline):
+    pipeline, store = pipeline
+    store.create({"job_id": "v1", "status": "completed"}, "A short first version.")
+    usage = {}
+    asyncio.run(analysis._run_agents("v2", "A short second version.", "multi", analysis.ANALYSIS_AGENTS, usage, "v1"))
+    assert pipeline.chunks == ["A short second version."]
+    assert usage["chunks_reused"] == 0
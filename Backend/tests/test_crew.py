@@ -0,0 +1,47 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import creaw_code
+
+
+class FakeProvider:
+    async def generate(self, messages, temperature=None, stop=None, usage=None):
+        usage.update(prompt_tokens=3, completion_tokens=2, total_tokens=5)
+        return "Final Answer: done"
+
+
+class FakePool:
+    def __init__(self, crew):
+        self.crew = crew
+        self.released = []
+
+    def acquire(self):
+        return self.crew
+
+    def release(self, crew):
+        self.released.append(crew)
+
+
+def test_sync_call_works_inside_a_running_loop():
+    llm = creaw_code.ProviderLLM(model="groq/test", temperature=0.1, llm_provider=FakeProvider())
+
+    async def call():
+        return llm.call([{"role": "user", "content": "hi"}])
+
+    assert asyncio.run(call()) == "Final Answer: done"
+
+
+def test_crew_without_output_fails_instead_of_returning_empty(monkeypatch):
+    async def akickoff(inputs):
+        return SimpleNamespace(token_usage=None)
+
+    llm = SimpleNamespace(bind_job=lambda usage: None)
+    crew = SimpleNamespace(agents=[SimpleNamespace(llm=llm)], tasks=[SimpleNamespace(output=None)], akickoff=akickoff)
+    pool = FakePool(crew)
+    monkeypatch.setitem(creaw_code.crew_pools, "summary", pool)
+    results = asyncio.run(creaw_code.agents_and_run_crew("Some text.", {}, agents=("summary",)))
+    assert isinstance(results[0], ValueError)
+    assert results[1:] == [None, None]
+    assert pool.released == []
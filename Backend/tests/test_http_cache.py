@@ -0,0 +1,100 @@
+import gzip
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routes
+from http_cache import SerializedResponses, accepts_gzip, etag_matches, job_etag
+from job_store import InMemoryJobStore
+
+RESULTS = {"summary": "A summary. " * 200, "entities": {"people": ["Ann"]}, "sentiment": {"tone": "neutral"}}
+
+
+@pytest.mark.parametrize("header, matches", [
+    (None, False),
+    ("", False),
+    ('W/"a-2"', True),
+    ('"a-2"', True),
+    ('W/"a-1", W/"a-2"', True),
+    ('W/"a-1"', False),
+    ("*", True)
+])
+def test_etag_matching_is_weak(header, matches):
+    assert etag_matches(header, job_etag("a", 2)) is matches
+
+
+@pytest.mark.parametrize("header, accepted", [
+    (None, False),
+    ("gzip, deflate, br", True),
+    ("GZIP;q=0.5", True),
+    ("gzip;q=0", False),
+    ("br, identity", False)
+])
+def test_accepts_gzip(header, accepted):
+    assert accepts_gzip(header) is accepted
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = InMemoryJobStore()
+    monkeypatch.setattr(routes, "job_store", store)
+    monkeypatch.setattr(routes, "serialized_results", SerializedResponses())
+    return store
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(routes.router)
+    return TestClient(app)
+
+
+def test_unchanged_job_is_answered_with_304(store, client):
+    store.create({"job_id": "a", "status": "processing"}, "text")
+    first = client.get("/results/a")
+    assert first.status_code == 200
+    assert first.headers["Cache-Control"] == "no-cache"
+    etag = first.headers["ETag"]
+
+    repeat = client.get("/results/a", headers={"If-None-Match": etag})
+    assert repeat.status_code == 304 and repeat.content == b""
+    assert repeat.headers["ETag"] == etag
+
+    # A new revision invalidates the tag
+    store.update("a", status="partial", results=RESULTS)
+    changed = client.get("/results/a", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_completed_job_is_immutable_and_served_compressed(store, client):
+    store.create({"job_id": "a", "status": "completed", "results": RESULTS}, "text")
+    response = client.get("/results/a", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Cache-Control"].endswith("immutable")
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.json()["results"] == RESULTS
+
+    plain = client.get("/results/a", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in plain.headers
+    assert json.loads(plain.content)["results"] == RESULTS
+    # The final body was encoded once and memoized for later reads
+    assert routes.serialized_results.stats()["hits"] == 1
+    assert client.get("/results/a", headers={"If-None-Match": plain.headers["ETag"]}).status_code == 304
+
+
+def test_small_bodies_are_not_compressed(store, client):
+    store.create({"job_id": "a", "status": "failed", "error": "boom"}, "text")
+    response = client.get("/results/a", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["Cache-Control"] == "no-cache"
+
+
+def test_compressed_body_matches_the_plain_body(store, client):
+    store.create({"job_id": "a", "status": "completed", "results": RESULTS}, "text")
+    client.get("/results/a")
+    _, compressed, _ = routes.serialized_results.get(job_etag("a", 1))
+    assert json.loads(gzip.decompress(compressed))["results"] == RESULTS
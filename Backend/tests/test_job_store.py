@@ -0,0 +1,103 @@
+import asyncio
+import threading
+
+import pytest
+
+from job_store import InMemoryJobStore, SqliteJobStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryJobStore()
+    return SqliteJobStore(str(tmp_path / "jobs.db"))
+
+
+def test_update_merges_fields_and_bumps_revision(store):
+    store.create({"job_id": "a", "status": "uploaded", "document_name": "a.txt"}, "text")
+    store.update("a", status="processing", queue_wait_seconds=0.5)
+    assert store.get("a") == {"job_id": "a", "status": "processing", "document_name": "a.txt",
+                              "queue_wait_seconds": 0.5, "revision": 2}
+    assert store.get_revision("a") == (2, "processing")
+    assert store.get_text("a") == "text"
+
+
+def test_update_stores_none_as_null_on_every_backend(store):
+    store.create({"job_id": "a", "status": "uploaded", "error": "boom", "results": {"summary": "x"}}, "text")
+    store.update("a", error=None, results={"summary": None, "entities": {"people": ["Ann"]}})
+    job = store.get("a")
+    assert "error" in job and job["error"] is None
+    assert job["results"] == {"summary": None, "entities": {"people": ["Ann"]}}
+
+
+def test_replace_keeps_the_text(store):
+    store.create({"job_id": "a", "status": "uploaded"}, "text")
+    store.replace("a", {"job_id": "a", "status": "completed", "results": {}})
+    assert store.get("a") == {"job_id": "a", "status": "completed", "results": {}, "revision": 2}
+    assert store.get_text("a") == "text"
+
+
+def test_batch_listing_and_counts(store):
+    store.create_batch({"batch_id": "b", "total": 3, "created_at": 0})
+    for i, status in enumerate(("uploaded", "queued", "completed")):
+        store.create({"job_id": f"j{i}", "status": status, "batch_id": "b"}, "text")
+    assert [job["job_id"] for job in store.batch_jobs("b", offset=1, limit=5)] == ["j1", "j2"]
+    assert store.batch_status_counts("b") == {"uploaded": 1, "queued": 1, "completed": 1}
+
+
+def _sized(max_jobs: int) -> InMemoryJobStore:
+    # A ceiling that holds about max_jobs of the jobs created below
+    probe = InMemoryJobStore(max_bytes=0, text_compression_level=0)
+    probe.create({"job_id": "probe", "status": "completed"}, "x" * 1000)
+    return InMemoryJobStore(max_bytes=probe.stats()["bytes"] * max_jobs + 100, text_compression_level=0)
+
+
+def test_lru_eviction_skips_pinned_jobs():
+    store = _sized(3)
+    store.create({"job_id": "queued", "status": "queued"}, "x" * 1000)
+    store.create({"job_id": "upload", "status": "uploaded"}, "x" * 1000)
+    store.create({"job_id": "done", "status": "completed"}, "x" * 1000)
+    store.get("queued")
+    store.create({"job_id": "new", "status": "completed"}, "x" * 1000)
+    assert "done" not in store
+    assert all(job_id in store for job_id in ("queued", "upload", "new"))
+    assert store.evictions["lru"] == 1
+
+
+def test_abandoned_uploads_are_evicted():
+    store = _sized(2)
+    store.upload_pin_seconds = 0
+    store.create({"job_id": "upload", "status": "uploaded"}, "x" * 1000)
+    store.create({"job_id": "a", "status": "completed"}, "x" * 1000)
+    store.create({"job_id": "b", "status": "completed"}, "x" * 1000)
+    assert "upload" not in store
+
+
+def test_unsubmitted_batch_members_are_never_evicted():
+    store = _sized(2)
+    store.upload_pin_seconds = 0
+    store.create_batch({"batch_id": "b", "total": 2, "created_at": 0})
+    store.create({"job_id": "m0", "status": "uploaded", "batch_id": "b"}, "x" * 1000)
+    store.create({"job_id": "m1", "status": "uploaded", "batch_id": "b"}, "x" * 1000)
+    store.create({"job_id": "other", "status": "completed"}, "x" * 1000)
+    assert "m0" in store and "m1" in store
+
+
+def test_async_calls_run_sqlite_off_the_loop(store):
+    store.create({"job_id": "a", "status": "uploaded"}, "text")
+    threads = []
+    original = store.get
+
+    def get(job_id):
+        threads.append(threading.get_ident())
+        return original(job_id)
+
+    store.get = get
+
+    async def read():
+        job = await store.aget("a")
+        return job, threading.get_ident()
+
+    job, loop_thread = asyncio.run(read())
+    assert job["status"] == "uploaded"
+    assert (threads[0] != loop_thread) == isinstance(store, SqliteJobStore)
@@ -0,0 +1,88 @@
+import time
+
+import numpy as np
+import pytest
+
+from near_duplicates import NearDuplicateIndex, minhash_signature, shingle_hashes, similarity, band_buckets
+
+WORDS = ("contract", "supplier", "delivery", "invoice", "penalty", "warranty", "clause", "payment", "notice",
+         "termination", "liability", "schedule", "price", "quantity", "inspection", "dispute")
+
+
+def _document(seed: int, words: int = 600) -> str:
+    rng = np.random.default_rng(seed)
+    return " ".join(WORDS[i] for i in rng.integers(0, len(WORDS), size=words))
+
+
+def _edited(text: str, every: int) -> str:
+    # Replaces one word in `every` with a word that appears nowhere else
+    words = text.split()
+    return " ".join(f"edit{i}" if i % every == 0 else word for i, word in enumerate(words))
+
+
+def _jaccard(a: str, b: str) -> float:
+    first, second = set(shingle_hashes(a).tolist()), set(shingle_hashes(b).tolist())
+    return len(first & second) / len(first | second)
+
+
+@pytest.fixture
+def index(tmp_path):
+    return NearDuplicateIndex(str(tmp_path / "near_duplicates.db"), ttl_seconds=3600)
+
+
+def test_shingles_ignore_case_and_punctuation():
+    assert np.array_equal(shingle_hashes("The supplier, shall DELIVER goods!"),
+                          shingle_hashes("the supplier shall deliver goods"))
+    assert np.array_equal(minhash_signature("Short."), minhash_signature("short"))
+
+
+@pytest.mark.parametrize("every", [100, 20, 8])
+def test_signature_similarity_estimates_the_jaccard_similarity(every):
+    text = _document(1)
+    edited = _edited(text, every)
+    estimate = similarity(minhash_signature(text), minhash_signature(edited))
+    # 128 permutations: the standard error is at most ~0.045
+    assert abs(estimate - _jaccard(text, edited)) < 0.15
+
+
+def test_identical_text_shares_every_band():
+    signature = minhash_signature(_document(2))
+    assert band_buckets(signature) == band_buckets(minhash_signature(_document(2)))
+    assert len(set(band_buckets(signature))) == len(band_buckets(signature))
+
+
+def test_find_returns_the_closest_document_above_the_threshold(index):
+    original = _document(3)
+    index.add(minhash_signature(original), "key-original", "config", "job-1", "original.txt")
+    index.add(minhash_signature(_document(4)), "key-other", "config", "job-2", "other.txt")
+
+    match = index.find(minhash_signature(_edited(original, 100)), threshold=0.8)
+    assert match["cache_key"] == "key-original" and match["job_id"] == "job-1"
+    assert match["similarity"] >= 0.8
+    assert index.find(minhash_signature(_document(5)), threshold=0.8) is None
+    assert index.stats()["lookups"] == 2 and index.stats()["matches"] == 1
+
+
+def test_find_can_be_limited_to_one_configuration(index):
+    text = _document(6)
+    index.add(minhash_signature(text), "key-a", "config-a")
+    assert index.find(minhash_signature(text), 0.9, config_key="config-b") is None
+    assert index.find(minhash_signature(text), 0.9, config_key="config-a")["cache_key"] == "key-a"
+
+
+def test_re_adding_a_cache_key_replaces_the_entry(index):
+    text = _document(7)
+    index.add(minhash_signature(text), "key", "config", "job-1")
+    index.add(minhash_signature(text), "key", "config", "job-2")
+    assert index.stats()["entries"] == 1
+    assert index.find(minhash_signature(text), 0.9)["job_id"] == "job-2"
+
+
+def test_expired_entries_are_not_returned(index):
+    text = _document(8)
+    index.add(minhash_signature(text), "key", "config")
+    index._conn.execute("UPDATE documents SET created_at = ?", (time.time() - 7200,))
+    assert index.find(minhash_signature(text), 0.9) is None
+    index._sweep(time.time())
+    assert index.stats()["entries"] == 0
+    assert index._conn.execute("SELECT COUNT(*) FROM buckets").fetchone()[0] == 0
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import analysis
+import routes
+from events import job_events
+from job_queue import SqliteJobQueue
+from job_store import InMemoryJobStore
+
+SUMMARY = {"summary": "A short summary."}
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = InMemoryJobStore()
+    monkeypatch.setattr(routes, "job_store", store)
+    monkeypatch.setattr(analysis, "job_store", store)
+    store.create({"job_id": "a", "status": "completed", "mode": "multi",
+                  "results": {"summary": None, "entities": {"people": ["Ann"]}, "sentiment": None},
+                  "agents": {"summary": {"status": "not_requested"}, "entities": {"status": "completed"},
+                             "sentiment": {"status": "not_requested"}}}, "Ann wrote a short text.")
+    return store
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(routes.router)
+    return TestClient(app)
+
+
+class Scheduler:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, job_id, handler, *args, priority="normal"):
+        self.submitted.append((job_id, handler, args))
+
+    def position(self, job_id):
+        return 1
+
+
+def test_missing_analyses_are_queued_not_run_inline(store, client, monkeypatch):
+    scheduler = Scheduler()
+    monkeypatch.setattr(routes, "analysis_scheduler", scheduler)
+    monkeypatch.setattr(routes, "analysis_queue", scheduler)
+    response = client.get("/results/a?analyses=summary,entities")
+    assert response.status_code == 202
+    assert response.json()["pending_analyses"] == ["summary"]
+    assert scheduler.submitted == [("a", analysis.run_on_demand, ("a", ("summary",)))]
+    # A second request shares the pending run
+    assert client.get("/results/a?analyses=summary").status_code == 202
+    assert len(scheduler.submitted) == 1
+
+
+def test_worker_mode_enqueues_for_the_workers(store, client, monkeypatch, tmp_path):
+    queue = SqliteJobQueue(str(tmp_path / "jobs.db"))
+    monkeypatch.setattr(routes, "ANALYSIS_EXECUTION", "worker")
+    monkeypatch.setattr(routes, "analysis_queue", queue)
+    monkeypatch.setattr(routes, "get_provider", lambda name: pytest.fail("the API must not load a provider"))
+    assert client.get("/results/a?analyses=sentiment").status_code == 202
+    assert queue.claim("w1") == {"job_id": "a", "on_demand": ["sentiment"]}
+
+
+def test_on_demand_run_stores_results_and_closes_its_events(store, monkeypatch):
+    async def run_agents(job_id, text, mode, selected, usage, previous_job_id=None, reuse_chunks=True):
+        job_events.publish(job_id, "agent_result", {"agent": "summary", "result": SUMMARY["summary"]})
+        return [SUMMARY if "summary" in selected else None, None, None], None
+
+    async def load_pipeline(name=None):
+        return None
+
+    monkeypatch.setattr(analysis, "_run_agents", run_agents)
+    monkeypatch.setattr(analysis, "load_pipeline", load_pipeline)
+    store.update("a", pending_analyses=["summary"])
+    # Unbound again after the test
+    monkeypatch.setattr(job_events, "_loop", None)
+    monkeypatch.setattr(job_events, "_loop_thread", None)
+
+    async def run():
+        job_events.bind(asyncio.get_running_loop())
+        return await analysis.run_on_demand("a", ("summary",))
+
+    job = asyncio.run(run())
+    assert job["results"]["summary"] == SUMMARY["summary"]
+    assert job["agents"]["summary"]["status"] == "completed"
+    assert "pending_analyses" not in store.get("a")
+    assert "a" not in job_events._history
+
+
+def test_failed_on_demand_run_is_reported_on_the_job(store, monkeypatch):
+    async def run_agents(*args, **kwargs):
+        raise RuntimeError("provider down")
+
+    async def load_pipeline(name=None):
+        return None
+
+    monkeypatch.setattr(analysis, "_run_agents", run_agents)
+    monkeypatch.setattr(analysis, "load_pipeline", load_pipeline)
+    store.update("a", pending_analyses=["summary"])
+    job = asyncio.run(analysis.run_on_demand("a", ("summary",)))
+    assert job["status"] == "partial"
+    assert job["agents"]["summary"] == {"status": "failed", "error": "provider down"}
+    assert "pending_analyses" not in store.get("a")
@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import pytest
+
+import utils
+from bench_extraction import make_synthetic_pdf
+
+
+@pytest.fixture(autouse=True)
+def fresh_pool():
+    yield
+    utils.shutdown_extraction_pool()
+
+
+def test_parallel_ranges_match_inline_extraction(monkeypatch):
+    monkeypatch.setattr(utils, "PARALLEL_PAGE_THRESHOLD", 4)
+    monkeypatch.setattr(utils, "PAGES_PER_CHUNK", 3)
+    pdf = make_synthetic_pdf(11, lines_per_page=3)
+    expected = utils.extract_text_from_pdf(pdf)
+    assert asyncio.run(utils.extract_text_from_pdf_async(pdf)) == expected
+    assert asyncio.run(utils.extract_text_from_pdf_async(pdf, start_page=2, end_page=9)) == \
+        utils.extract_text_from_pdf(pdf, start_page=2, end_page=9)
+
+
+def test_pages_by_reference_match_the_page_tree():
+    pdf = make_synthetic_pdf(5, lines_per_page=2)
+    refs = utils._pdf_page_refs(pdf)
+    assert list(utils.iter_pdf_pages_by_ref(pdf, refs[1:4])) == list(utils.iter_pdf_pages(pdf, 1, 4))
+
+
+def _stuck(*args):
+    time.sleep(60)
+
+
+def test_timeout_recycles_the_pool_and_frees_its_workers(monkeypatch):
+    # A fresh pool forks after the patch, so its workers block in _stuck
+    utils.shutdown_extraction_pool()
+    monkeypatch.setattr(utils, "_pdf_page_refs", _stuck)
+    recycle = utils._recycle_extraction_pool
+    stuck_workers = []
+
+    def recycle_and_record(pool):
+        stuck_workers.extend(pool._processes.values())
+        recycle(pool)
+
+    monkeypatch.setattr(utils, "_recycle_extraction_pool", recycle_and_record)
+    stuck_pool = utils.get_extraction_pool()
+    with pytest.raises(ValueError, match="timed out"):
+        asyncio.run(utils.extract_text_from_pdf_async(b"%PDF", timeout=0.05))
+    assert utils._extraction_pool is not stuck_pool
+    assert stuck_workers
+    for process in stuck_workers:
+        process.join(5)
+        assert not process.is_alive()
+    # Later extractions get a working pool
+    monkeypatch.undo()
+    small = make_synthetic_pdf(2, lines_per_page=1)
+    assert asyncio.run(utils.extract_text_from_pdf_async(small)) == utils.extract_text_from_pdf(small)
@@ -0,0 +1,125 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import resilience
+from llm_providers import LLMProvider
+from resilience import CircuitBreaker, CircuitOpenError, TokenBucket
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    # Only resilience's clock: the event loop keeps using the real one
+    monkeypatch.setattr(resilience, "time", SimpleNamespace(monotonic=clock, time=time.time))
+    return clock
+
+
+class FakeProvider(LLMProvider):
+    name = "fake"
+
+    def __init__(self, requests_per_minute: float = 0):
+        super().__init__("model", max_concurrency=2, requests_per_minute=requests_per_minute)
+        self.max_retries = 0
+
+    def _create_client(self):
+        return object()
+
+
+def _open(circuit: CircuitBreaker):
+    for _ in range(circuit.failure_threshold):
+        circuit.before_call()
+        circuit.record_failure()
+    assert circuit.is_open()
+
+
+def test_circuit_opens_and_lets_one_probe_through(clock):
+    circuit = CircuitBreaker("test", failure_threshold=2, reset_seconds=10)
+    _open(circuit)
+    with pytest.raises(CircuitOpenError):
+        circuit.before_call()
+    clock.now += 11
+    assert circuit.before_call() is True
+    with pytest.raises(CircuitOpenError):
+        circuit.before_call()
+    circuit.record_success()
+    assert circuit.stats()["state"] == "closed"
+    assert circuit.before_call() is False
+
+
+def test_cancelled_probe_releases_the_circuit(clock):
+    provider = FakeProvider()
+    _open(provider.circuit)
+    clock.now += provider.circuit.reset_seconds + 1
+
+    async def hang(client):
+        await asyncio.sleep(60)
+
+    async def succeed(client):
+        return "ok"
+
+    async def run():
+        probe = asyncio.create_task(provider._run(hang, {"retries": 0, "limiter_wait": 0.0}))
+        await asyncio.sleep(0.05)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        return await provider._run(succeed, {"retries": 0, "limiter_wait": 0.0})
+
+    assert asyncio.run(run()) == "ok"
+    assert provider.circuit.stats()["state"] == "closed"
+
+
+def test_open_circuit_fails_before_the_limiter(clock):
+    provider = FakeProvider(requests_per_minute=1)
+    provider.limiter.tokens = 0
+    _open(provider.circuit)
+
+    async def succeed(client):
+        return "ok"
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(asyncio.wait_for(provider._run(succeed, {"retries": 0, "limiter_wait": 0.0}), 1))
+
+
+def test_zero_rate_means_unlimited():
+    bucket = TokenBucket(0)
+
+    async def acquire_many():
+        return [await bucket.acquire() for _ in range(100)]
+
+    assert max(asyncio.run(acquire_many())) < 0.1
+    assert bucket.stats()["configured_rpm"] == 0
+
+
+def test_gemini_errors_are_retried_by_the_provider_not_the_sdk(monkeypatch):
+    from google.api_core import exceptions
+    import llm_providers
+
+    class Model:
+        def __init__(self):
+            self.calls = []
+
+        async def generate_content_async(self, contents, generation_config=None, request_options=None):
+            self.calls.append(request_options)
+            if len(self.calls) == 1:
+                raise exceptions.ServiceUnavailable("overloaded")
+            return SimpleNamespace(text="ok", usage_metadata=None)
+
+    monkeypatch.setattr(llm_providers, "backoff_delay", lambda attempt: 0)
+    provider = llm_providers.GeminiProvider(requests_per_minute=0)
+    provider._client = model = Model()
+    provider._semaphore = asyncio.Semaphore(1)
+    assert asyncio.run(provider.generate("prompt")) == "ok"
+    assert provider.retries == 1
+    assert all(options["retry"] is None for options in model.calls)
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routes
+from job_store import InMemoryJobStore
+from scheduler import AnalysisScheduler, QueueFullError
+
+
+def test_higher_priority_jobs_run_first():
+    async def scenario():
+        scheduler = AnalysisScheduler(max_queue_size=10, workers=1)
+        await scheduler.start()
+        order = []
+        gate = asyncio.Event()
+
+        async def handler(name):
+            await gate.wait()
+            order.append(name)
+
+        # "first" occupies the only worker, the others wait in the queue
+        scheduler.submit("first", handler, "first", priority="low")
+        while scheduler.position("first") is not None:
+            await asyncio.sleep(0.001)
+        for name, priority in (("low", "low"), ("normal", "normal"), ("high", "high"), ("high-2", "high")):
+            scheduler.submit(name, handler, name, priority=priority)
+        assert [scheduler.position(name) for name in ("high", "high-2", "normal", "low")] == [1, 2, 3, 4]
+        gate.set()
+        await scheduler._queue.join()
+        await scheduler.stop()
+        return order
+
+    assert asyncio.run(scenario()) == ["first", "high", "high-2", "normal", "low"]
+
+
+def test_full_queue_rejects_with_a_retry_hint():
+    async def scenario():
+        scheduler = AnalysisScheduler(max_queue_size=2, workers=1)
+        scheduler._queue = asyncio.PriorityQueue(maxsize=2)
+
+        async def handler():
+            pass
+
+        scheduler.submit("a", handler)
+        scheduler.submit("b", handler)
+        with pytest.raises(QueueFullError) as error:
+            scheduler.submit("c", handler)
+        return scheduler, error.value
+
+    scheduler, error = asyncio.run(scenario())
+    # Two queued jobs at the default 30s per job on one worker
+    assert error.retry_after_seconds == 60
+    assert scheduler.stats()["rejected"] == 1
+    assert scheduler.position("c") is None
+
+
+def test_a_failing_job_does_not_stop_the_worker():
+    async def scenario():
+        scheduler = AnalysisScheduler(max_queue_size=10, workers=1)
+        await scheduler.start()
+        done = []
+
+        async def fail():
+            raise RuntimeError("boom")
+
+        async def succeed():
+            done.append(True)
+
+        scheduler.submit("a", fail)
+        scheduler.submit("b", succeed)
+        await scheduler._queue.join()
+        await scheduler.stop()
+        return scheduler.stats(), done
+
+    stats, done = asyncio.run(scenario())
+    assert done == [True]
+    assert (stats["processed"], stats["failed"], stats["busy_workers"]) == (2, 1, 0)
+
+
+def test_analyze_returns_429_and_restores_the_job_when_the_queue_is_full(monkeypatch):
+    store = InMemoryJobStore()
+    monkeypatch.setattr(routes, "job_store", store)
+    store.create({"job_id": "a", "status": "uploaded", "document_name": "a.txt"}, "Some text to analyze.")
+
+    class FullScheduler:
+        def submit(self, *args, **kwargs):
+            raise QueueFullError(7)
+
+    monkeypatch.setattr(routes, "analysis_scheduler", FullScheduler())
+    monkeypatch.setattr(routes, "analysis_queue", FullScheduler())
+    app = FastAPI()
+    app.include_router(routes.router)
+    response = TestClient(app).post("/analyze", json={"job_id": "a", "mode": "local", "bypass_cache": True})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "7"
+    assert store.get("a")["status"] == "uploaded"
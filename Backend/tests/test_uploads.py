@@ -0,0 +1,97 @@
+import asyncio
+import io
+import json
+import threading
+import zipfile
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routes
+import uploads
+from job_store import InMemoryJobStore
+from uploads import receive_upload, UploadTooLargeError, UnsupportedFileTypeError
+
+
+class FakeRequest:
+    """Just enough of a Starlette request for the multipart receivers: headers and a chunked body stream."""
+
+    def __init__(self, body: bytes, boundary: str, chunk: int = 4096):
+        self.headers = {"content-type": f"multipart/form-data; boundary={boundary}"}
+        self._body = body
+        self._chunk = chunk
+
+    async def stream(self):
+        for start in range(0, len(self._body), self._chunk):
+            yield self._body[start:start + self._chunk]
+
+
+def _multipart(parts, boundary="testboundary") -> bytes:
+    body = b""
+    for name, filename, content in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+        body += f"--{boundary}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + content + b"\r\n"
+    return body + f"--{boundary}--\r\n".encode()
+
+
+def test_upload_is_spooled_off_the_event_loop(monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_SPOOL_MEMORY_BYTES", 1024)
+    writers = set()
+    write = uploads.SpooledUpload.write
+
+    def record(self, chunk):
+        writers.add(threading.get_ident())
+        write(self, chunk)
+
+    monkeypatch.setattr(uploads.SpooledUpload, "write", record)
+    content = b"line of text\n" * 200_000
+    request = FakeRequest(_multipart([("file", "doc.txt", content)]), "testboundary", chunk=65536)
+
+    async def receive():
+        return threading.get_ident(), await receive_upload(request, "file", (".pdf", ".txt"))
+
+    loop_thread, upload = asyncio.run(receive())
+    try:
+        assert upload.size == len(content)
+        assert upload.path is not None
+        with open(upload.path, "rb") as spooled:
+            assert spooled.read() == content
+        assert writers and loop_thread not in writers
+    finally:
+        upload.close()
+
+
+def test_upload_errors_keep_their_messages():
+    request = FakeRequest(_multipart([("file", "doc.docx", b"x")]), "testboundary")
+    with pytest.raises(UnsupportedFileTypeError, match="^Only PDF and TXT files are supported$"):
+        asyncio.run(receive_upload(request, "file", (".pdf", ".txt")))
+    request = FakeRequest(_multipart([("file", "doc.txt", b"x" * 2048)]), "testboundary")
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(receive_upload(request, "file", (".pdf", ".txt"), limit=1024))
+
+
+def test_batch_rejects_oversized_files_while_streaming(monkeypatch):
+    monkeypatch.setattr(routes, "job_store", InMemoryJobStore())
+    monkeypatch.setattr(routes, "UPLOAD_SIZE_LIMIT", 1024)
+    monkeypatch.setattr(routes, "_feed_batch", lambda *args: asyncio.sleep(0))
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zipped:
+        zipped.writestr("inner.txt", "Zipped document text.")
+    app = FastAPI()
+    app.include_router(routes.router)
+    response = TestClient(app).post("/batch", data={"mode": "local"}, files=[
+        ("files", ("small.txt", b"A small document.", "text/plain")),
+        ("files", ("big.txt", b"x" * 4096, "text/plain")),
+        ("files", ("notes.docx", b"x", "application/octet-stream")),
+        ("files", ("docs.zip", archive.getvalue(), "application/zip"))
+    ])
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["total"] == 2
+    assert {entry["document_name"]: entry["error"] for entry in body["rejected"]} == {
+        "big.txt": str(UploadTooLargeError(1024)),
+        "notes.docx": "Only PDF, TXT and ZIP files are supported"
+    }
+    batch = routes.job_store.get_batch(body["batch_id"])
+    assert batch["mode"] == "local"
@@ -0,0 +1,66 @@
+import asyncio
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from job_queue import SqliteJobQueue
+import worker
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return SqliteJobQueue(str(tmp_path / "jobs.db"), max_size=10, lease_seconds=1)
+
+
+def test_expired_lease_is_claimed_again(queue, monkeypatch):
+    queue.enqueue("a", {"mode": "multi"})
+    assert queue.claim("w1")["job_id"] == "a"
+    assert queue.claim("w2") is None
+    monkeypatch.setattr("job_queue.time.time", lambda: 10 ** 10)
+    assert queue.claim("w2")["job_id"] == "a"
+    # w1 lost the job: it can neither renew nor complete w2's claim
+    assert not queue.renew("a", "w1")
+    queue.complete("a", "w1")
+    assert queue.stats()["in_progress"] == 1
+    queue.complete("a", "w2")
+    assert queue.stats()["in_progress"] == 0
+
+
+def test_heartbeat_keeps_a_long_job_leased(queue):
+    queue.enqueue("a", {"mode": "multi"})
+    queue.claim("w1")
+
+    async def run():
+        heartbeat = asyncio.create_task(worker.renew_lease(queue, "a", "w1", interval=0.2))
+        await asyncio.sleep(1.5)
+        claimed = queue.claim("w2")
+        heartbeat.cancel()
+        return claimed
+
+    assert asyncio.run(run()) is None
+
+
+def test_worker_mode_api_does_not_import_a_pipeline(tmp_path):
+    # The API only computes cache keys and enqueues; CrewAI and the provider SDKs belong to the workers
+    script = textwrap.dedent("""
+        import sys
+        import analysis
+        from cache import make_cache_key
+        for pipeline in ("crew", "gemini"):
+            analysis.ANALYSIS_PIPELINE = pipeline
+            make_cache_key("text", analysis.cache_config("text", "multi"))
+            make_cache_key("text", analysis.cache_config("text", "fused"))
+        import routes
+        loaded = [name for name in ("crewai", "google.generativeai", "groq", "creaw_code", "agents")
+                  if name in sys.modules]
+        print("loaded:" + ",".join(loaded))
+    """)
+    env = dict(os.environ, ANALYSIS_EXECUTION="worker", JOB_STORE_BACKEND="sqlite",
+               JOB_STORE_PATH=str(tmp_path / "jobs.db"), PIPELINE_WARM_UP="false")
+    result = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(os.path.dirname(__file__)),
+                            env=env, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert "loaded:" in result.stdout.splitlines()
@@ -0,0 +1,239 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple, Union
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Configure logging
+import logging
+logger = logging.getLogger(__name__)
+
+# Per-document size limit, enforced while the upload streams in
+UPLOAD_MAX_MB = int(os.getenv("UPLOAD_MAX_MB", "200"))
+UPLOAD_SIZE_LIMIT = UPLOAD_MAX_MB * 1024 * 1024
+# Uploads up to this size stay in memory; larger ones roll over to a temp file in UPLOAD_SPOOL_DIR
+# (default: the system temp dir), which PDF extraction memory-maps
+UPLOAD_SPOOL_MEMORY_BYTES = int(os.getenv("UPLOAD_SPOOL_MEMORY_BYTES", str(1024 * 1024)))
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# Multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+# Largest plain (non-file) form field value
+FORM_FIELD_MAX_BYTES = 64 * 1024
+
+# Extracted text sources: document bytes, or the path of a spooled upload
+DocumentSource = Union[bytes, str]
+
+
+class UploadTooLargeError(ValueError):
+    def __init__(self, limit: int = UPLOAD_SIZE_LIMIT):
+        super().__init__(f"File size exceeds {limit // (1024 * 1024)}MB limit")
+
+
+class UnsupportedFileTypeError(ValueError):
+    def __init__(self, allowed_extensions: tuple):
+        names = [extension.lstrip(".").upper() for extension in allowed_extensions]
+        listed = names[0] if len(names) == 1 else f"{', '.join(names[:-1])} and {names[-1]}"
+        super().__init__(f"Only {listed} files are supported")
+
+
+class SpooledUpload:
+    """One uploaded document, size-checked and SHA-256 hashed chunk by chunk as it arrives.
+
+    Small documents stay in memory; past UPLOAD_SPOOL_MEMORY_BYTES the content rolls over to a
+    named temp file, so memory per upload stays roughly constant whatever the document size.
+    """
+
+    def __init__(self, filename: str, limit: int = UPLOAD_SIZE_LIMIT):
+        self.filename = filename
+        self.limit = limit
+        self.size = 0
+        self.path: Optional[str] = None
+        self._hash = hashlib.sha256()
+        self._buffer = bytearray()
+        self._file = None
+
+    def write(self, chunk: bytes):
+        if self.size + len(chunk) > self.limit:
+            raise UploadTooLargeError(self.limit)
+        self.size += len(chunk)
+        self._hash.update(chunk)
+        if self._file is None and len(self._buffer) + len(chunk) > UPLOAD_SPOOL_MEMORY_BYTES:
+            self._file = tempfile.NamedTemporaryFile(prefix="upload-", dir=UPLOAD_SPOOL_DIR, delete=False)
+            self.path = self._file.name
+            self._file.write(self._buffer)
+            self._buffer = bytearray()
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._buffer.extend(chunk)
+
+    def finish(self):
+        if self._file is not None:
+            self._file.close()
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    @property
+    def source(self) -> DocumentSource:
+        return self.path if self.path is not None else bytes(self._buffer)
+
+    def close(self):
+        # Removes the spooled file; call once the text has been extracted
+        self.finish()
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+        self._buffer = bytearray()
+
+
+def spool_stream(filename: str, stream: BinaryIO, limit: int = UPLOAD_SIZE_LIMIT) -> SpooledUpload:
+    # Copies a file-like object (e.g. a zip entry) into a SpooledUpload without reading it whole
+    upload = SpooledUpload(filename, limit)
+    try:
+        for chunk in iter(lambda: stream.read(UPLOAD_CHUNK_BYTES), b""):
+            upload.write(chunk)
+    except Exception:
+        upload.close()
+        raise
+    upload.finish()
+    return upload
+
+
+async def receive_form(request, file_field: str, part_limit: Callable[[str], int], allowed_extensions: tuple = None,
+                       text_fields: tuple = (), max_files: int = None, request_limit: int = None,
+                       lenient: bool = False) -> Tuple[List[SpooledUpload], Dict[str, str], List[Dict]]:
+    # Parses a multipart/form-data request body as it streams in. Files in `file_field` are spooled, each
+    # checked against part_limit(filename); `text_fields` are returned as strings. Returns
+    # (uploads, fields, rejected). The parser and the spool writes run in a thread, a buffered
+    # UPLOAD_CHUNK_BYTES at a time, so large uploads do not block the event loop.
+    # With `lenient`, a file of an unsupported type or over its limit is skipped and listed in `rejected`;
+    # otherwise it fails the request. A body over request_limit always does, checked from Content-Length
+    # before reading and again as the body arrives.
+    _, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise ValueError("Expected a multipart/form-data upload")
+    content_length = request.headers.get("content-length")
+    if (request_limit and content_length and content_length.isdigit()
+            and int(content_length) > request_limit + MULTIPART_OVERHEAD_BYTES):
+        raise UploadTooLargeError(request_limit)
+
+    uploads, fields, rejected = [], {}, []
+    state = {"header_field": b"", "header_value": b"", "disposition": b"", "target": None, "field": None,
+             "value": bytearray()}
+
+    def reject(upload: SpooledUpload, error: Exception):
+        if not lenient:
+            raise error
+        upload.close()
+        uploads.remove(upload)
+        rejected.append({"document_name": upload.filename, "error": str(error)})
+        state["target"] = None
+
+    def on_part_begin():
+        state["disposition"] = b""
+        state["target"] = state["field"] = None
+
+    def on_header_field(data, start, end):
+        state["header_field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["header_value"] += data[start:end]
+
+    def on_header_end():
+        if state["header_field"].lower() == b"content-disposition":
+            state["disposition"] = state["header_value"]
+        state["header_field"] = state["header_value"] = b""
+
+    def on_headers_finished():
+        _, options = parse_options_header(state["disposition"])
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        if b"filename" not in options:
+            if name in text_fields:
+                state["field"] = name
+                state["value"] = bytearray()
+            return
+        if name != file_field:
+            return
+        if max_files is not None and len(uploads) >= max_files:
+            raise ValueError("Upload one file per request" if max_files == 1 else f"Upload at most {max_files} files")
+        filename = options[b"filename"].decode("utf-8", "replace")
+        upload = SpooledUpload(filename, part_limit(filename))
+        uploads.append(upload)
+        state["target"] = upload
+        if allowed_extensions and not filename.endswith(allowed_extensions):
+            reject(upload, UnsupportedFileTypeError(allowed_extensions))
+
+    def on_part_data(data, start, end):
+        if state["target"] is not None:
+            try:
+                state["target"].write(data[start:end])
+            except UploadTooLargeError as e:
+                reject(state["target"], e)
+        elif state["field"] is not None:
+            state["value"] += data[start:end]
+            if len(state["value"]) > FORM_FIELD_MAX_BYTES:
+                raise ValueError(f"Form field '{state['field']}' is too long")
+
+    def on_part_end():
+        if state["target"] is not None:
+            state["target"].finish()
+        elif state["field"] is not None:
+            fields[state["field"]] = state["value"].decode("utf-8", "replace")
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end
+    })
+
+    def write(data: bytes, final: bool = False):
+        parser.write(data)
+        if final:
+            parser.finalize()
+
+    received = 0
+    pending = bytearray()
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if request_limit and received > request_limit + MULTIPART_OVERHEAD_BYTES:
+                raise UploadTooLargeError(request_limit)
+            pending += chunk
+            if len(pending) >= UPLOAD_CHUNK_BYTES:
+                await asyncio.to_thread(write, bytes(pending))
+                pending = bytearray()
+        await asyncio.to_thread(write, bytes(pending), True)
+    except Exception:
+        for upload in uploads:
+            upload.close()
+        raise
+    for upload in uploads:
+        upload.finish()
+    return uploads, fields, rejected
+
+
+async def receive_upload(request, field: str = "file", allowed_extensions: tuple = None,
+                         limit: int = UPLOAD_SIZE_LIMIT) -> SpooledUpload:
+    # Streams the single file in `field` of a multipart/form-data request into a SpooledUpload.
+    # Oversized uploads are rejected from Content-Length before reading, or as soon as the limit is crossed.
+    uploads, _, _ = await receive_form(request, field, lambda filename: limit, allowed_extensions,
+                                       max_files=1, request_limit=limit)
+    if not uploads:
+        raise ValueError(f"No file found in form field '{field}'")
+    return uploads[0]
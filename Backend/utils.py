@@ -1,19 +1,233 @@
 import PyPDF2
+import asyncio
 import io
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from PyPDF2 import PageObject
+from PyPDF2.generic import IndirectObject, NameObject
+
+from uploads import DocumentSource
 
 # Configure logging
 import logging
 logger = logging.getLogger(__name__)
 
-def extract_text_from_pdf(file_content: bytes) -> str:
+# Worker pool settings for PDF extraction
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(os.cpu_count() or 1)))
+EXTRACTION_TIMEOUT_SECONDS = float(os.getenv("EXTRACTION_TIMEOUT_SECONDS", "120"))
+# PDFs with more pages than this are split into page ranges and extracted in parallel
+PARALLEL_PAGE_THRESHOLD = int(os.getenv("PARALLEL_PAGE_THRESHOLD", "40"))
+PAGES_PER_CHUNK = int(os.getenv("PAGES_PER_CHUNK", "20"))
+# Rough characters-per-token ratio used to turn token budgets into character budgets
+CHARS_PER_TOKEN = 4
+# Page attributes a page may inherit from its ancestors in the page tree
+INHERITABLE_PAGE_ATTRIBUTES = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+
+# (object number, generation) of a page object
+PageRef = Tuple[int, int]
+
+_extraction_pool = None
+
+
+@contextmanager
+def open_pdf_stream(source: DocumentSource):
+    # A spooled upload (a path) is memory-mapped: the parser reads pages straight from the
+    # OS page cache instead of a private copy of the whole file
+    if isinstance(source, (bytes, bytearray)):
+        yield io.BytesIO(source)
+        return
+    with open(source, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        yield mapped
+
+
+def iter_pdf_pages(source: DocumentSource, start_page: int = 0, end_page: Optional[int] = None) -> Iterator[str]:
+    # Pages are parsed lazily, so callers that stop early never touch the rest of the file
+    with open_pdf_stream(source) as stream:
+        pdf_reader = PyPDF2.PdfReader(stream)
+        page_count = len(pdf_reader.pages)
+        end_page = page_count if end_page is None else min(end_page, page_count)
+        for i in range(start_page, end_page):
+            yield pdf_reader.pages[i].extract_text() or ""
+
+
+def _page_at(pdf_reader: PyPDF2.PdfReader, page_ref: PageRef) -> PageObject:
+    # Loads one page by object reference, without flattening the whole page tree as reader.pages does
+    reference = IndirectObject(page_ref[0], page_ref[1], pdf_reader)
+    page = PageObject(pdf_reader, reference)
+    page.update(reference.get_object())
+    parent = page.get("/Parent")
+    while parent is not None:
+        node = parent.get_object()
+        for key in INHERITABLE_PAGE_ATTRIBUTES:
+            if key not in page and key in node:
+                page[NameObject(key)] = node[key]
+        parent = node.get("/Parent")
+    return page
+
+
+def iter_pdf_pages_by_ref(source: DocumentSource, page_refs: List[PageRef]) -> Iterator[str]:
+    with open_pdf_stream(source) as stream:
+        pdf_reader = PyPDF2.PdfReader(stream)
+        for page_ref in page_refs:
+            yield _page_at(pdf_reader, page_ref).extract_text() or ""
+
+
+def extract_text_from_txt(source: DocumentSource, max_chars: Optional[int] = None) -> str:
+    # Reads at most max_chars characters, so a budgeted read of a large spooled file stops early
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source).decode("utf-8")[:max_chars]
+    with open(source, encoding="utf-8", newline="") as file:
+        return file.read(max_chars if max_chars is not None else -1)
+
+
+def char_budget(max_chars: Optional[int] = None, max_tokens: Optional[int] = None) -> Optional[int]:
+    # Token budgets are approximated in characters until a model tokenizer is involved
+    budgets = [b for b in (max_chars, max_tokens * CHARS_PER_TOKEN if max_tokens else None) if b]
+    return min(budgets) if budgets else None
+
+
+def join_within_budget(parts: Iterable[str], budget: Optional[int] = None) -> str:
+    # Collects parts into a list and joins once (linear), stopping as soon as the budget is full
+    collected = []
+    size = 0
+    for part in parts:
+        collected.append(part)
+        size += len(part)
+        if budget is not None and size >= budget:
+            break
+    text = "".join(collected)
+    return text[:budget] if budget is not None else text
+
+
+def extract_text_from_pdf(file_content: DocumentSource, max_chars: Optional[int] = None, max_tokens: Optional[int] = None,
+                          start_page: int = 0, end_page: Optional[int] = None) -> str:
     try:
         logger.info("Extracting text from PDF.")
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text()
+        text = join_within_budget(iter_pdf_pages(file_content, start_page, end_page),
+                                  char_budget(max_chars, max_tokens))
         logger.info("Text extraction from PDF completed.")
         return text
     except Exception as e:
         logger.error(f"Failed to extract text from PDF: {str(e)}")
         raise ValueError(f"Failed to extract text from PDF: {str(e)}")
+
+
+def _pdf_page_refs(file_content: DocumentSource) -> List[PageRef]:
+    # Walks the page tree once, so range workers can load their pages directly
+    with open_pdf_stream(file_content) as stream:
+        return [(page.indirect_reference.idnum, page.indirect_reference.generation)
+                for page in PyPDF2.PdfReader(stream).pages]
+
+
+def _extract_page_range(file_content: DocumentSource, start: int, end: int, budget: Optional[int] = None,
+                        page_refs: Optional[List[PageRef]] = None) -> str:
+    # Runs inside a worker process; each worker opens its own reader. Given a path, workers
+    # map the file themselves and only the path is sent to them, not the document bytes.
+    # Opening a reader only reads the cross-reference table; with the refs of pages start..end
+    # the worker also skips walking the page tree, which otherwise costs about as much as
+    # extracting a 20-page range of a large PDF.
+    if page_refs is not None:
+        try:
+            return join_within_budget(iter_pdf_pages_by_ref(file_content, page_refs), budget)
+        except Exception as e:
+            logger.warning(f"Loading pages {start}-{end} by reference failed ({str(e)}); walking the page tree.")
+    return join_within_budget(iter_pdf_pages(file_content, start, end), budget)
+
+
+def get_extraction_pool() -> ProcessPoolExecutor:
+    global _extraction_pool
+    if _extraction_pool is None:
+        logger.info(f"Starting PDF extraction pool with {EXTRACTION_WORKERS} workers.")
+        _extraction_pool = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS)
+    return _extraction_pool
+
+
+def _recycle_extraction_pool(pool: ProcessPoolExecutor):
+    # A worker stuck in a pathological PDF cannot be interrupted: the pool is replaced and its
+    # processes killed. Extractions still running on it fail with BrokenProcessPool and are retried.
+    global _extraction_pool
+    if _extraction_pool is pool:
+        _extraction_pool = None
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+    logger.warning(f"PDF extraction pool recycled; terminated {len(processes)} worker processes.")
+
+
+def shutdown_extraction_pool():
+    global _extraction_pool
+    if _extraction_pool is not None:
+        _extraction_pool.shutdown(wait=False, cancel_futures=True)
+        _extraction_pool = None
+
+
+async def extract_text_from_pdf_async(file_content: DocumentSource, timeout: float = EXTRACTION_TIMEOUT_SECONDS,
+                                      max_chars: Optional[int] = None, max_tokens: Optional[int] = None,
+                                      start_page: int = 0, end_page: Optional[int] = None) -> str:
+    budget = char_budget(max_chars, max_tokens)
+
+    async def _extract(pool: ProcessPoolExecutor, submitted: list) -> str:
+        def run(function, *args):
+            future = pool.submit(function, *args)
+            submitted.append(future)
+            return asyncio.wrap_future(future)
+
+        page_refs = await run(_pdf_page_refs, file_content)
+        last_page = len(page_refs) if end_page is None else min(end_page, len(page_refs))
+        if last_page - start_page <= PARALLEL_PAGE_THRESHOLD:
+            return await run(_extract_page_range, file_content, start_page, last_page, budget,
+                             page_refs[start_page:last_page])
+        ranges = [(start, min(start + PAGES_PER_CHUNK, last_page))
+                  for start in range(start_page, last_page, PAGES_PER_CHUNK)]
+        logger.info(f"Extracting {last_page - start_page} pages in {len(ranges)} parallel ranges.")
+        # Without a budget every range runs at once; with one, ranges are dispatched
+        # one pool-width at a time so extraction stops once the budget is full
+        wave_size = len(ranges) if budget is None else EXTRACTION_WORKERS
+        parts = []
+        extracted = 0
+        for i in range(0, len(ranges), wave_size):
+            wave = await asyncio.gather(*[
+                run(_extract_page_range, file_content, start, end, budget, page_refs[start:end])
+                for start, end in ranges[i:i + wave_size]
+            ])
+            # gather preserves submission order, so pages are reassembled in order
+            parts.extend(wave)
+            extracted += sum(len(part) for part in wave)
+            if budget is not None and extracted >= budget:
+                break
+        return join_within_budget(parts, budget)
+
+    for attempt in range(2):
+        pool = get_extraction_pool()
+        submitted = []
+        try:
+            logger.info("Extracting text from PDF in worker pool.")
+            text = await asyncio.wait_for(_extract(pool, submitted), timeout=timeout)
+            logger.info("Text extraction from PDF completed.")
+            return text
+        except asyncio.TimeoutError:
+            # Ranges not yet started are dropped; ranges still running hold their workers, so the pool is recycled
+            for future in submitted:
+                future.cancel()
+            if not all(future.done() for future in submitted):
+                _recycle_extraction_pool(pool)
+            logger.error(f"PDF extraction timed out after {timeout}s.")
+            raise ValueError(f"PDF extraction timed out after {timeout} seconds")
+        except BrokenProcessPool as e:
+            # Another extraction's timeout recycled the pool under this one, or a worker died
+            if _extraction_pool is pool:
+                _recycle_extraction_pool(pool)
+            if attempt == 0:
+                logger.warning("PDF extraction pool was recycled mid-extraction; retrying on a fresh pool.")
+                continue
+            logger.error(f"Failed to extract text from PDF: {str(e)}")
+            raise ValueError(f"Failed to extract text from PDF: {str(e)}")
+        except Exception as e:
+            logger.error(f"Failed to extract text from PDF: {str(e)}")
+            raise ValueError(f"Failed to extract text from PDF: {str(e)}")
@@ -0,0 +1,131 @@
+"""Standalone analysis worker.
+
+Claims queued jobs from the shared SQLite queue, runs the analysis pipeline and
+writes results back to the SQLite job store. Run next to API processes started
+with ANALYSIS_EXECUTION=worker and JOB_STORE_BACKEND=sqlite:
+
+    python worker.py --concurrency 4 --metrics-port 9101
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from job_store import job_store, JOB_STORE_BACKEND
+from job_queue import SqliteJobQueue, WORKER_LEASE_SECONDS
+from models import ANALYSIS_AGENTS
+from analysis import run_multi_agent_analysis, run_on_demand, warm_up_pipeline
+from metrics import render_prometheus, PROMETHEUS_CONTENT_TYPE
+
+# Configure logging
+import logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s %(message)s')
+logger = logging.getLogger(__name__)
+
+WORKER_POLL_INTERVAL_SECONDS = float(os.getenv("WORKER_POLL_INTERVAL_SECONDS", "0.5"))
+# How often a running job's lease is renewed; a few beats fit in one lease
+WORKER_HEARTBEAT_SECONDS = float(os.getenv("WORKER_HEARTBEAT_SECONDS", str(max(1, WORKER_LEASE_SECONDS // 3))))
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serves this worker's Prometheus metrics (stage and agent timings of the jobs it ran) on GET /metrics."""
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port: int):
+    server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"Worker metrics on http://0.0.0.0:{port}/metrics")
+
+
+async def renew_lease(queue: SqliteJobQueue, job_id: str, worker_id: str, interval: float = WORKER_HEARTBEAT_SECONDS):
+    # Keeps the job's lease alive while it runs, so a long analysis is not handed to a second worker
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            renewed = await asyncio.to_thread(queue.renew, job_id, worker_id)
+        except Exception as e:
+            logger.error(f"{worker_id}: lease renewal for job {job_id} failed: {str(e)}")
+            continue
+        if not renewed:
+            logger.warning(f"{worker_id}: lost the lease on job {job_id}; another worker has claimed it.")
+            return
+
+
+async def worker_slot(queue: SqliteJobQueue, worker_id: str, stop: asyncio.Event):
+    while not stop.is_set():
+        job = await asyncio.to_thread(queue.claim, worker_id)
+        if job is None:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=WORKER_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        job_id = job["job_id"]
+        record = await job_store.aget(job_id)
+        text = await job_store.aget_text(job_id)
+        if record is None or not text:
+            logger.warning(f"{worker_id}: job {job_id} has no record or text, dropping it.")
+        else:
+            heartbeat = asyncio.create_task(renew_lease(queue, job_id, worker_id))
+            try:
+                if job.get("on_demand"):
+                    # Analyses a finished job was asked for later through /results
+                    logger.info(f"{worker_id}: running on-demand analyses {', '.join(job['on_demand'])} "
+                                f"for job {job_id}")
+                    await run_on_demand(job_id, tuple(job["on_demand"]))
+                else:
+                    logger.info(f"{worker_id}: running job {job_id} (mode={job['mode']})")
+                    await run_multi_agent_analysis(job_id, text, record.get("document_name"), job["cache_key"],
+                                                   job["mode"], job.get("reuse_chunks", True),
+                                                   tuple(job.get("analyses", ANALYSIS_AGENTS)))
+            except Exception as e:
+                logger.error(f"{worker_id}: job {job_id} raised: {str(e)}")
+            finally:
+                heartbeat.cancel()
+        await asyncio.to_thread(queue.complete, job_id, worker_id)
+
+
+async def main(concurrency: int):
+    if JOB_STORE_BACKEND != "sqlite":
+        raise SystemExit("worker.py requires JOB_STORE_BACKEND=sqlite so results are visible to the API")
+    queue = SqliteJobQueue()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    # Load the pipeline before claiming jobs, so the first job's lease is not spent importing it
+    await warm_up_pipeline()
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info(f"Worker {prefix} started with {concurrency} concurrent slots.")
+    # Each slot finishes its current job before exiting on SIGINT/SIGTERM
+    await asyncio.gather(*[worker_slot(queue, f"{prefix}:{i}", stop) for i in range(concurrency)])
+    logger.info(f"Worker {prefix} stopped.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("ANALYSIS_WORKERS", "4")),
+                        help="Jobs processed concurrently by this worker process")
+    parser.add_argument("--metrics-port", type=int, default=int(os.getenv("WORKER_METRICS_PORT", "0")),
+                        help="Serve Prometheus metrics on this port (0 = off)")
+    args = parser.parse_args()
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+    asyncio.run(main(args.concurrency))